@@ -1,24 +1,36 @@
+import io
 import os
 import re
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk, scrolledtext
 import threading
 import time
 import queue
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
+import multiprocessing
 import ctypes
 import zipfile
+import tarfile
 import tempfile
 import shutil
 import subprocess
 import atexit
+import hashlib
+import heapq
+import json
+import pickle
+from contextlib import contextmanager
 from copy import copy
-import xlwings as xw
+from itertools import chain, islice
 import configparser
-import pandas as pd
-from openpyxl import load_workbook
+from collections import OrderedDict, deque
+
+# pandas/openpyxl/xlwings/pdfplumber 在用到的地方再导入（比对时才需要pandas，填充时才需要xlwings），
+# 界面启动和提取工作进程都不再加载这些重量级依赖
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk, scrolledtext
+except ImportError:  # 没有Tk的环境（如Linux批处理主机）只能使用命令行功能
+    tk = None
 
 # 如果是Windows系统且被打包成exe，彻底隐藏控制台窗口
 if sys.platform == "win32" and hasattr(sys, 'frozen'):
@@ -31,30 +43,2200 @@ else:
     startupinfo = None
 
 
-class PDFExcelTool:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("PDF信息提取与比对工具")
+class WordIndex:
+    """标题栏文字的空间索引（网格分桶），支持按标签查找同一单元格、右侧或下方单元格中的值"""
+
+    def __init__(self, words, cells=None, label_words=(), bucket_size=40):
+        self.words = words
+        self.cells = list(cells or [])
+        self.label_words = set(label_words)
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        for i, word in enumerate(words):
+            for key in self._bucket_keys((word["x0"], word["top"], word["x1"], word["bottom"])):
+                self.buckets.setdefault(key, []).append(i)
+
+    def _bucket_keys(self, bbox):
+        x0, top, x1, bottom = bbox
+        size = self.bucket_size
+        for bx in range(int(x0 // size), int(x1 // size) + 1):
+            for by in range(int(top // size), int(bottom // size) + 1):
+                yield bx, by
+
+    def query(self, bbox):
+        """返回中心点落在区域内的文字（按行、列排序）"""
+        x0, top, x1, bottom = bbox
+        seen = set()
+        found = []
+        for key in self._bucket_keys(bbox):
+            for i in self.buckets.get(key, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                word = self.words[i]
+                cx = (word["x0"] + word["x1"]) / 2
+                cy = (word["top"] + word["bottom"]) / 2
+                if x0 <= cx <= x1 and top <= cy <= bottom:
+                    found.append(word)
+        found.sort(key=lambda w: (round(w["top"]), w["x0"]))
+        return found
+
+    def join_words(self, words):
+        """按行拼接文字（行内用空格，行间用换行）"""
+        lines = []
+        for word in sorted(words, key=lambda w: (round(w["top"]), w["x0"])):
+            if lines and abs(word["top"] - lines[-1][0]) <= 3:
+                lines[-1][1].append(word["text"])
+            else:
+                lines.append((word["top"], [word["text"]]))
+        return "\n".join(" ".join(texts) for _, texts in lines).strip()
+
+    def text(self, bbox):
+        """区域内的文字"""
+        return self.join_words(self.query(bbox))
+
+    def cell_at(self, x, y):
+        """包含该点的最小单元格"""
+        containing = [cell for cell in self.cells if cell[0] <= x <= cell[2] and cell[1] <= y <= cell[3]]
+        if not containing:
+            return None
+        return min(containing, key=lambda cell: (cell[2] - cell[0]) * (cell[3] - cell[1]))
+
+    def label_hits(self, keywords):
+        """查找与关键字匹配的标签（单个词或同一行相邻的两个词，如"DWG NO."）"""
+        normalized = [re.sub(r'[\s:：]+', '', keyword).lower() for keyword in keywords]
+        ordered = sorted(self.words, key=lambda w: (round(w["top"]), w["x0"]))
+        hits = []
+        for i, word in enumerate(ordered):
+            candidates = [([word], word["text"])]
+            if i + 1 < len(ordered):
+                nxt = ordered[i + 1]
+                if abs(nxt["top"] - word["top"]) <= 3 and nxt["x0"] - word["x1"] <= (word["bottom"] - word["top"]):
+                    candidates.append(([word, nxt], word["text"] + nxt["text"]))
+            for parts, text in candidates:
+                clean = re.sub(r'\s+', '', text).lower()
+                for keyword in normalized:
+                    # 标签须完整匹配，或以"标签:"开头（如"名称:支架"）
+                    if clean.rstrip(':：') == keyword or re.match(re.escape(keyword) + r'[:：]', clean):
+                        hits.append((parts, text))
+                        break
+        return hits
+
+    def find_value(self, keywords, ignore_values=()):
+        """查找标签对应的值：依次检查标签所在单元格、右侧单元格、下方单元格（优先取最下方的标签）"""
+        ignore = {value.lower() for value in ignore_values}
+
+        def valid(value):
+            clean = re.sub(r'[\s:：]+', '', value).lower()
+            return value and value.lower() not in ignore and clean not in self.label_words
+
+        for parts, text in sorted(self.label_hits(keywords), key=lambda hit: hit[0][0]["top"], reverse=True):
+            label_box = (min(w["x0"] for w in parts), min(w["top"] for w in parts),
+                         max(w["x1"] for w in parts), max(w["bottom"] for w in parts))
+            height = label_box[3] - label_box[1]
+
+            # 1. 标签与值在同一个词中（如"名称:支架"）
+            inline = re.split(r'[:：]', text, maxsplit=1)
+            if len(inline) == 2 and valid(inline[1].strip()):
+                return inline[1].strip()
+
+            cell = self.cell_at((label_box[0] + label_box[2]) / 2, (label_box[1] + label_box[3]) / 2)
+            if cell:
+                # 2. 同一单元格中标签右侧的文字
+                same_cell = [w for w in self.query(cell) if w["x0"] >= label_box[2] - 0.5 and w not in parts]
+                value = self.join_words(same_cell)
+                if valid(value):
+                    return value
+
+                # 3. 右侧相邻单元格 / 4. 下方相邻单元格
+                right = [c for c in self.cells if c[0] >= cell[2] - 1
+                         and min(c[3], cell[3]) - max(c[1], cell[1]) > (cell[3] - cell[1]) / 2]
+                below = [c for c in self.cells if c[1] >= cell[3] - 1
+                         and min(c[2], cell[2]) - max(c[0], cell[0]) > (cell[2] - cell[0]) / 2]
+                for neighbours, distance in ((right, lambda c: c[0]), (below, lambda c: c[1])):
+                    if neighbours:
+                        value = self.text(min(neighbours, key=distance))
+                        if valid(value):
+                            return value
+            else:
+                # 没有表格线信息时：同一行右侧最近的一组文字，其次为正下方的文字
+                row_words = self.query((label_box[2], label_box[1] - 2, label_box[2] + height * 20, label_box[3] + 2))
+                row_words = [w for w in row_words if w["x0"] >= label_box[2] - 0.5 and w not in parts]
+                group = []
+                for word in sorted(row_words, key=lambda w: w["x0"]):
+                    if group and word["x0"] - group[-1]["x1"] > height * 2:
+                        break
+                    group.append(word)
+                value = self.join_words(group)
+                if valid(value):
+                    return value
+
+                below_words = self.query((label_box[0] - height, label_box[3], label_box[2] + height * 10,
+                                          label_box[3] + height * 2.5))
+                value = self.join_words([w for w in below_words if w not in parts])
+                if valid(value):
+                    return value
+        return ""
+
+
+class TitleBlock:
+    """图纸标题栏记录：用__slots__存储固定字段，字段值为驻留字符串（大量记录时节省内存，字段名写错会直接报错）"""
+
+    __slots__ = ("name", "drawing_no", "processing", "material", "color", "surface", "version", "title",
+                 "page_count", "page_no", "source")
+
+    # 文字字段与标题栏标签（报告中显示的名称）的对应关系
+    FIELD_LABELS = (
+        ("name", "名称"),
+        ("drawing_no", "图号"),
+        ("processing", "加工"),
+        ("material", "材料"),
+        ("color", "颜色"),
+        ("surface", "表面处理"),
+        ("version", "版本"),
+        ("title", "title"),
+    )
+
+    def __init__(self, name="", drawing_no="", processing="", material="", color="", surface="", version="",
+                 title="", page_count=0, page_no=1, source=""):
+        self.name = sys.intern(name)
+        self.drawing_no = sys.intern(drawing_no)
+        self.processing = sys.intern(processing)
+        self.material = sys.intern(material)
+        self.color = sys.intern(color)
+        self.surface = sys.intern(surface)
+        self.version = sys.intern(version)
+        self.title = sys.intern(title)
+        self.page_count = page_count
+        self.page_no = page_no
+        self.source = sys.intern(source)  # 提取方式（空为矢量文字，"OCR"为扫描识别）
+
+    @classmethod
+    def from_fields(cls, fields, page_count=0, page_no=1, source=""):
+        """由按标题栏标签命名的字段字典（如 {"名称": ..., "图号": ...}）创建记录"""
+        values = {attr: str(fields.get(label) or "") for attr, label in cls.FIELD_LABELS}
+        return cls(page_count=page_count, page_no=page_no, source=source, **values)
+
+    def field_items(self):
+        """按标签返回各文字字段（用于报告）"""
+        return [(label, getattr(self, attr)) for attr, label in self.FIELD_LABELS]
+
+    def as_dict(self):
+        """按字段名返回全部字段（用于JSON输出）"""
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def key(self):
+        """文字字段组成的键（用于判断两页标题栏是否相同）"""
+        return tuple(getattr(self, attr) for attr, _ in self.FIELD_LABELS)
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        for attr, value in zip(self.__slots__, state):
+            setattr(self, attr, sys.intern(value) if isinstance(value, str) else value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr in self.__slots__)
+        return f"TitleBlock({fields})"
+
+
+class PDFResourceCache:
+    """pdfminer字体/CMap资源缓存：CMap每个进程只加载一次，字体按内容哈希在不同PDF之间共用
+    （同一CAD软件导出的图纸通常嵌入相同的字体，无需每个文件重新解析）"""
+
+    def __init__(self, max_fonts=512):
+        self.max_fonts = max_fonts
+        self.fonts = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.cmaps_loaded = False
+
+    def preload_cmaps(self, cmap_names, unicode_maps=()):
+        """预先加载CMap（pdfminer按类缓存，进程内各线程共用；提前加载避免多个线程同时重复加载）"""
+        with self.lock:
+            if self.cmaps_loaded:
+                return
+            from pdfminer.cmapdb import CMapDB
+            for name in cmap_names:
+                try:
+                    CMapDB.get_cmap(name)
+                except CMapDB.CMapNotFound:
+                    pass
+            for name in unicode_maps:
+                try:
+                    CMapDB.get_unicode_map(name)
+                except CMapDB.CMapNotFound:
+                    pass
+            self.cmaps_loaded = True
 
-        # 设置DPI感知（仅Windows）
-        if sys.platform == "win32":
+    def attach(self, rsrcmgr):
+        """让PDF的资源管理器先从共享缓存中取字体（同一文档中已取过的字体按对象号直接返回，不再计算内容哈希）"""
+        create_font = rsrcmgr.get_font
+        document_fonts = {}  # 本文档的 对象号 -> 字体
+
+        def get_font(objid, spec):
+            font = document_fonts.get(objid) if objid else None
+            if font is None:
+                font = self.get_font(create_font, objid, spec)
+                if objid:
+                    document_fonts[objid] = font
+            return font
+
+        rsrcmgr.get_font = get_font
+
+    def get_font(self, create_font, objid, spec):
+        from pdfminer.psparser import literal_name
+
+        # Type3字体引用页面资源，不跨文件共用
+        if literal_name(spec.get("Subtype", "")) == "Type3":
+            return create_font(objid, spec)
+        try:
+            key = self.font_key(spec)
+        except Exception:
+            return create_font(objid, spec)
+
+        font = self.fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            return font
+
+        self.misses += 1
+        font = create_font(objid, spec)
+        # 字体初始化后不再需要原始描述对象，去掉引用以免缓存的字体让旧文档一直留在内存中
+        font.descriptor = {}
+        if hasattr(font, "fontfile"):
+            font.fontfile = None
+        with self.lock:
+            if len(self.fonts) < self.max_fonts:
+                self.fonts[key] = font
+        return font
+
+    def font_key(self, spec):
+        """按字体字典的内容（包括嵌入字体和ToUnicode数据）计算哈希"""
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        from pdfminer.psparser import PSLiteral
+
+        digest = hashlib.sha1()
+        seen = set()
+
+        def feed(obj, depth):
+            if depth > 10:
+                return
+            if isinstance(obj, PDFObjRef):
+                if obj.objid in seen:
+                    digest.update(b"@")
+                    return
+                seen.add(obj.objid)
+                obj = obj.resolve()
+            if isinstance(obj, PDFStream):
+                digest.update(b"S")
+                feed({k: v for k, v in obj.attrs.items() if k != "Length"}, depth + 1)
+                data = obj.get_rawdata()
+                digest.update(data if data is not None else obj.get_data())
+            elif isinstance(obj, dict):
+                digest.update(b"{")
+                for k in sorted(obj):
+                    digest.update(str(k).encode("utf-8"))
+                    feed(obj[k], depth + 1)
+                digest.update(b"}")
+            elif isinstance(obj, (list, tuple)):
+                digest.update(b"[")
+                for item in obj:
+                    feed(item, depth + 1)
+                digest.update(b"]")
+            elif isinstance(obj, PSLiteral):
+                digest.update(b"/" + str(obj.name).encode("utf-8"))
+            else:
+                digest.update(repr(obj).encode("utf-8"))
+
+        feed(spec, 0)
+        return digest.hexdigest()
+
+
+class LRUCache:
+    """线程安全的LRU缓存，超过容量时淘汰最久未使用的项"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+
+
+def chain_future(future, fn):
+    """future完成后用fn处理其结果，返回新的Future；fn返回Future时等该Future完成"""
+    chained = Future()
+
+    def on_done(done):
+        try:
+            result = fn(done.result())
+        except Exception as e:
+            chained.set_exception(e)
+            return
+        if isinstance(result, Future):
+            result.add_done_callback(lambda inner: copy_future(inner, chained))
+        else:
+            chained.set_result(result)
+
+    future.add_done_callback(on_done)
+    return chained
+
+
+def copy_future(source, target):
+    """把已完成的source的结果或异常复制到target"""
+    try:
+        target.set_result(source.result())
+    except Exception as e:
+        target.set_exception(e)
+
+
+def gather_futures(futures):
+    """全部完成后按顺序返回结果列表的Future（任一出错时为第一个异常）"""
+    gathered = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            gathered.set_result([future.result() for future in futures])
+        except Exception as e:
+            gathered.set_exception(e)
+
+    if not futures:
+        gathered.set_result([])
+    for future in futures:
+        future.add_done_callback(on_done)
+    return gathered
+
+
+def completed_future(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class TitleBlockExtractor:
+    """PDF图纸标题栏提取（不依赖界面，可在工作进程中单独创建）"""
+
+    # 标题栏字段的标签关键字及向右搜索的单元格数
+    TITLE_FIELD_KEYWORDS = [
+        ("名称", ["名称", "name"], 5),
+        ("图号", ["图号", "图名", "drawing", "DWG NO."], 5),
+        ("材料", ["材料", "material"], 5),
+        ("颜色", ["颜色", "color"], 5),
+        ("表面处理", ["表面处理", "表面", "surface", "SURFACE\nFINISHING"], 5),
+        ("加工", ["加工", "processing", "processes", "MANUFACTUIING\nPROCESSES"], 5),
+        ("版本", ["版本", "版 本", "version", "rev"], 6),  # 扩大搜索范围，覆盖更多拆分场景
+        ("title", ["title", "TITLE"], 5),
+    ]
+
+    # 标题栏中视为空值的内容
+    TITLE_IGNORE_VALUES = ["none", "无", "空白", "/", ""]
+
+    # 标题栏标签文字（小写、去空白和冒号后完整匹配），用于计算模板指纹
+    TITLE_BLOCK_LABELS = {
+        "名称", "name", "图号", "图名", "drawing", "dwg", "dwgno.", "材料", "material", "颜色", "color",
+        "表面处理", "surface", "加工", "processing", "processes", "版本", "version", "rev", "title",
+    }
+
+    # 多页PDF的提取方式
+    PAGE_MODES = ("first", "all", "distinct")
+
+    # 启动时预加载的中文CMap（简体中文字体常用的编码）
+    PRELOAD_CMAPS = ("UniGB-UCS2-H", "UniGB-UTF16-H", "GBK-EUC-H", "GB-EUC-H")
+    PRELOAD_UNICODE_MAPS = ("Adobe-GB1",)
+    OCR_CACHE_SIZE = 512  # 内存中保留的OCR结果数（更早的结果仍在磁盘缓存中）
+    OCR_PENDING_PER_WORKER = 4  # 每个OCR线程最多排队的标题栏图片数（超过时渲染线程等待）
+
+    # 可传给工作进程的提取设置
+    SETTING_NAMES = ("cache_dir", "page_mode", "page_workers", "ocr_enabled", "ocr_tesseract_cmd", "ocr_lang",
+                     "ocr_dpi", "ocr_workers")
+
+    def __init__(self, settings=None):
+        self.cache_dir = "cache"  # 磁盘缓存目录
+        self.title_block_templates = None  # 已学习的标题栏模板（首次使用时加载）
+        self._template_lock = threading.Lock()
+        self.page_mode = "first"  # 多页PDF提取方式
+        self.page_workers = 4  # 页面并行线程数
+        self._page_executor = None  # 多页PDF的页面线程池（按需创建）
+        self._page_executor_lock = threading.Lock()
+        self.ocr_enabled = False  # 扫描图纸OCR（默认关闭）
+        self.ocr_tesseract_cmd = ""  # Tesseract程序路径（留空时从PATH查找）
+        self.ocr_lang = "chi_sim+eng"  # OCR语言
+        self.ocr_dpi = 300  # 标题栏区域的渲染分辨率
+        self.ocr_workers = 2  # OCR线程数
+        self._ocr_executor = None  # OCR线程池（按需创建，与提取线程分开）
+        self._ocr_slots = None  # 限制排队等待OCR的图片数
+        self._ocr_cache = LRUCache(self.OCR_CACHE_SIZE)  # OCR结果（按内容哈希缓存）
+        self.resource_cache = PDFResourceCache()  # 字体/CMap资源缓存（各PDF共用）
+        for name, value in (settings or {}).items():
+            setattr(self, name, value)
+
+    def extractor_settings(self):
+        """当前的提取设置（用于创建工作进程中的提取器）"""
+        return {name: getattr(self, name) for name in self.SETTING_NAMES}
+
+    # ======================== 标题栏提取函数 ========================
+
+    def extract_pdf_title_block(self, pdf_path, page_no=1, data=None):
+        """从PDF文件的指定页（默认首页）中提取标题块信息，优化加工字段提取逻辑（保留中英文），返回TitleBlock记录。
+        data为预读到内存的文件内容时直接从内存解析"""
+        return self.start_pdf_title_block(pdf_path, page_no, data)[1].result()
+
+    def start_pdf_title_block(self, pdf_path, page_no=1, data=None):
+        """开始提取指定页的标题块，返回 (页数, TitleBlock的Future)。
+        文字图纸在当前线程提取完成；扫描图纸在当前线程渲染标题栏区域，OCR完成后Future才完成"""
+        import pdfplumber
+
+        fields = {}
+        page_count = 0
+        ocr_future = None
+
+        try:
+            with pdfplumber.open(io.BytesIO(data) if data is not None else pdf_path) as pdf:
+                self.resource_cache.attach(pdf.rsrcmgr)
+                page_count = len(pdf.pages)
+                if page_count < page_no:
+                    return page_count, completed_future(TitleBlock(page_count=page_count, page_no=page_no))
+
+                page = pdf.pages[page_no - 1]
+                try:
+                    if self.ocr_enabled and not page.chars:
+                        # 扫描图纸（页面没有文字）：只对标题栏区域进行OCR
+                        ocr_future = self.ocr_page_title_block(pdf_path, page, page_no, data)
+                    else:
+                        fields = self.extract_page_title_block(page)
+                finally:
+                    # 提取完立即释放页面缓存的字符和版面对象
+                    page.close()
+
+        except Exception as e:
+            print(f"提取PDF {os.path.basename(pdf_path)} 时出错: {str(e)}")
+
+        if ocr_future is None:
+            return page_count, completed_future(
+                TitleBlock.from_fields(fields, page_count=page_count, page_no=page_no))
+
+        sheet_future = Future()
+
+        def on_ocr_done(future):
             try:
-                # 启用DPI感知
-                ctypes.windll.shcore.SetProcessDpiAwareness(1)
-            except (AttributeError, OSError):
-                pass  # 如果API不可用则忽略
+                fields, source = future.result(), "OCR"
+            except Exception as e:
+                print(f"提取PDF {os.path.basename(pdf_path)} 时出错: {str(e)}")
+                fields, source = {}, ""
+            sheet_future.set_result(TitleBlock.from_fields(fields, page_count=page_count, page_no=page_no,
+                                                           source=source))
+
+        ocr_future.add_done_callback(on_ocr_done)
+        return page_count, sheet_future
+
+    def warm_up_extractor(self):
+        """提取开始前预加载中文CMap（每个进程只加载一次）"""
+        self.resource_cache.preload_cmaps(self.PRELOAD_CMAPS, self.PRELOAD_UNICODE_MAPS)
+
+    def shutdown_executors(self):
+        """关闭页面线程池和OCR线程池"""
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=False, cancel_futures=True)
+            self._page_executor = None
+        if self._ocr_executor is not None:
+            self._ocr_executor.shutdown(wait=False, cancel_futures=True)
+            self._ocr_executor = None
+
+    def extract_pdf_task(self, pdf_path, data=None):
+        """提取一个PDF文件的全部图纸页（等待OCR完成），返回 (图纸页列表, 错误信息, 耗时秒数)"""
+        done = Future()
+        self.start_pdf_task(pdf_path, data, lambda *result: done.set_result(result))
+        return done.result()
+
+    def start_pdf_task(self, pdf_path, data, callback):
+        """开始提取一个PDF文件的全部图纸页，完成时调用 callback(图纸页列表, 错误信息, 耗时秒数)。
+        文字图纸提取完立即在当前线程回调；有扫描页时在OCR线程中回调，当前线程不等待OCR"""
+        start_time = time.perf_counter()
+
+        def on_done(future):
+            try:
+                sheets, error = future.result(), None
+            except Exception as e:
+                sheets, error = [], f"处理错误: {str(e)}"
+            callback(sheets, error, time.perf_counter() - start_time)
 
-        # 计算相对尺寸
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        width = int(min(1000, screen_width * 0.8))
-        height = int(min(900, screen_height * 0.8))
-        self.root.geometry(f"{width}x{height}")
-        self.root.minsize(800, 700)  # 最小尺寸
-        self.root.resizable(True, True)  # 允许调整大小
+        try:
+            future = self.start_pdf_title_blocks(pdf_path, data)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(on_done)
+
+    def get_page_executor(self):
+        """获取多页PDF的页面线程池（与文件线程池分开，避免相互等待）"""
+        with self._page_executor_lock:
+            if self._page_executor is None:
+                self._page_executor = ThreadPoolExecutor(max_workers=self.page_workers,
+                                                         thread_name_prefix="pdf_page")
+            return self._page_executor
+
+    def extract_pdf_title_blocks(self, pdf_path, data=None):
+        """按多页提取方式返回PDF各图纸页的标题块（first=仅首页, all=每一页, distinct=标题块不同的页）"""
+        return self.start_pdf_title_blocks(pdf_path, data).result()
+
+    def start_pdf_title_blocks(self, pdf_path, data=None):
+        """开始按多页提取方式提取各图纸页，返回图纸页列表的Future"""
+        page_count, first_future = self.start_pdf_title_block(pdf_path, data=data)
+        if self.page_mode == "first" or page_count <= 1:
+            return chain_future(first_future, lambda sheet: [sheet])
+
+        # 其余页面分发到页面线程池并行提取（每个任务独立打开PDF，避免共享解析器；预读的内容各页共用）
+        executor = self.get_page_executor()
+        futures = [first_future] + [
+            chain_future(executor.submit(self.start_pdf_title_block, pdf_path, page_no, data), lambda result: result[1])
+            for page_no in range(2, page_count + 1)]
+        return chain_future(gather_futures(futures), self.select_page_sheets)
+
+    def select_page_sheets(self, sheets):
+        """按多页提取方式筛选各页的标题块"""
+        if self.page_mode == "distinct":
+            # 只保留标题块内容与之前页面不同的页
+            seen = set()
+            distinct_sheets = []
+            for sheet in sheets:
+                key = sheet.key()
+                if key not in seen:
+                    seen.add(key)
+                    distinct_sheets.append(sheet)
+            sheets = distinct_sheets
+        return sheets
+
+    def sheet_label(self, pdf_path, pdf_data):
+        """图纸页的显示名称（逐页提取的多页PDF附带页码）"""
+        label = os.path.basename(pdf_path)
+        if self.page_mode != "first" and pdf_data.page_count > 1:
+            label += f" (第{pdf_data.page_no}页)"
+        return label
+
+    def extract_page_title_block(self, page):
+        """从单页图纸中提取标题块字段：已知模板按单元格坐标直接读取，未知模板进行表格识别并学习"""
+        # 先用整页文字快速定位标题栏，表格识别只在该区域内进行
+        page_words = page.extract_words()
+        bbox = self.locate_title_block(page, page_words)
+        cropped_page = page.crop(bbox)
+        words = [w for w in page_words
+                 if w["x0"] >= bbox[0] and w["top"] >= bbox[1] and w["x1"] <= bbox[2] and w["bottom"] <= bbox[3]]
+
+        # 页面文本只在需要文本补充时才提取
+        text_cache = []
+
+        def get_text():
+            if not text_cache:
+                text_cache.append(cropped_page.extract_text() or "")
+            return text_cache[0]
+
+        # 标题栏区域的文字只建立一次空间索引，各字段的查找共用
+        index = WordIndex(words, label_words=self.TITLE_BLOCK_LABELS)
+
+        # 已知模板：跳过表格识别，直接读取学习到的单元格
+        fingerprint = self.title_block_fingerprint(page, words)
+        template = self.match_title_block_template(fingerprint, page)
+        if template:
+            raw_fields = self.read_title_block_template(template, page, index)
+            if raw_fields["名称"] or raw_fields["图号"]:
+                return self.finalize_title_fields(raw_fields, get_text)
+
+        # 未知模板（或模板读取失败）：进行表格识别
+        raw_fields, located_cells, table_cells = self.extract_title_fields_from_tables(cropped_page, index)
+        if fingerprint and (located_cells.get("名称") or located_cells.get("图号")):
+            self.learn_title_block_template(fingerprint, located_cells, table_cells, page)
+
+        return self.finalize_title_fields(raw_fields, get_text)
+
+    def extract_title_fields_from_tables(self, cropped_page, index):
+        """通过表格识别提取标题块原始字段，同时返回各字段候选值单元格和全部单元格的坐标（用于学习模板）"""
+        tables = cropped_page.find_tables()
+
+        # 单元格合并函数（同时合并单元格坐标）
+        def merge_split_cells(table, table_cells):
+            merged_table = []
+            merged_cells = []
+            for row, row_cells in zip(table, table_cells):
+                merged_row = []
+                merged_row_cells = []
+                i = 0
+                while i < len(row):
+                    cell = str(row[i]).strip()
+                    if i + 1 < len(row) and re.match(r'^[a-zA-Z]+\d+$', cell) and re.match(r'^t=[\d.]+$', str(
+                            row[i + 1]).strip()):
+                        merged_cell = f"{cell} {str(row[i + 1]).strip()}"
+                        merged_row.append(merged_cell)
+                        merged_row_cells.append(self.union_bbox(row_cells[i], row_cells[i + 1]))
+                        i += 2
+                    else:
+                        merged_row.append(cell)
+                        merged_row_cells.append(row_cells[i])
+                        i += 1
+                merged_table.append(merged_row)
+                merged_cells.append(merged_row_cells)
+            return merged_table, merged_cells
+
+        # 处理表格
+        table_grid = []
+        cell_grid = []
+        for table in tables:
+            merged_table, merged_cells = merge_split_cells(table.extract(), [row.cells for row in table.rows])
+            for row, row_cells in zip(merged_table, merged_cells):
+                clean_row = [str(cell).strip() if cell is not None else "" for cell in row]
+                table_grid.append(clean_row)
+                cell_grid.append(row_cells)
+
+        # 一次扫描表格，记录所有字段标签所在的单元格（每个单元格只规范化一次）
+        field_keywords = [(field, [re.sub(r'\s+', '', keyword).lower() for keyword in keywords])
+                          for field, keywords, _ in self.TITLE_FIELD_KEYWORDS]
+        label_hits = {field: [] for field, _ in field_keywords}
+        for r, row in enumerate(table_grid):
+            for c, cell in enumerate(row):
+                clean_cell = re.sub(r'\s+', '', cell).lower()
+                for field, keywords in field_keywords:
+                    for keyword in keywords:
+                        if keyword in clean_cell:
+                            label_hits[field].append((r, c))
+
+        located_cells = {}
+
+        # 表格搜索函数：取标签右侧search_range个单元格内的值（最下方一行优先），并记录候选单元格
+        def find_in_grid(field, search_range=5, ignore_values=[]):
+            ignore_values = [v.lower() for v in ignore_values]
+            matches = []
+            for r, c in label_hits[field]:
+                row = table_grid[r]
+                for i in range(1, search_range + 1):
+                    if c + i < len(row):
+                        value = row[c + i].strip()
+                        if value and value.lower() not in ignore_values:
+                            matches.append((value, r, c))
+            if label_hits[field]:
+                # 记录最终取值所在行的标签（无取值时取最下方的标签）
+                if matches:
+                    _, r, c = sorted(matches, key=lambda x: x[1], reverse=True)[0]
+                else:
+                    r, c = max(label_hits[field], key=lambda hit: hit[0])
+                located_cells[field] = [cell_grid[r][c + i] for i in range(1, search_range + 1)
+                                        if c + i < len(cell_grid[r])]
+            if matches:
+                matches.sort(key=lambda x: x[1], reverse=True)
+                return matches[0][0]
+            return ""
+
+        raw_fields = {}
+        ignore_list = self.TITLE_IGNORE_VALUES
+        for field, keywords, search_range in self.TITLE_FIELD_KEYWORDS:
+            raw_fields[field] = find_in_grid(field, search_range=search_range, ignore_values=ignore_list)
+
+        # 表格拆分异常时，用空间索引在标签所在、右侧或下方的单元格中补充查找
+        table_cells = [cell for table in tables for cell in table.cells]
+        index.cells = table_cells
+        for field, keywords, _ in self.TITLE_FIELD_KEYWORDS:
+            if not raw_fields[field]:
+                raw_fields[field] = index.find_value(keywords, ignore_list)
+
+        return raw_fields, located_cells, table_cells
+
+    def finalize_title_fields(self, raw_fields, get_text):
+        """对原始字段进行清洗、版本号规范化和文本补充，返回标题块字段"""
+        title_data = {
+            "名称": raw_fields["名称"], "图号": raw_fields["图号"], "加工": "", "材料": raw_fields["材料"],
+            "颜色": raw_fields["颜色"], "表面处理": raw_fields["表面处理"], "版本": "", "title": raw_fields["title"]
+        }
 
-        # 居中窗口
-        self.center_window()
+        # -------------------------- 优化加工字段提取（保留中英文） --------------------------
+        # 1. 提取原始加工信息
+        processing_raw = raw_fields["加工"]
+
+        # 2. 清洗逻辑：保留所有有效内容（中英文），只去除末尾无意义后缀
+        if processing_raw:
+            # 定义需要去除的末尾无意义词汇（可扩展）
+            suffix_to_remove = r'(中|中文|了|的|等|完毕|完成|结束)$'
+
+            # 先去除首尾空格
+            processed = processing_raw.strip()
+
+            # 循环去除末尾的无意义后缀（可能有多个）
+            while re.search(suffix_to_remove, processed):
+                processed = re.sub(suffix_to_remove, '', processed).strip()
+
+            title_data["加工"] = processed
+        else:
+            title_data["加工"] = ""
+        # ------------------------------------------------------------------
+
+        # 版本提取（保持之前的优化逻辑）
+        version_raw = raw_fields["版本"]
+
+        # 2. 正则匹配：支持小数点前后空格，容错性更强
+        # 优化后正则：允许V/Rev后有空格、小数点前后有空格（如V0 .1 → 匹配后清理为V0.1）
+        version_pattern = r'(V|Rev|rev)\.?\s*(\d+(?:\s*\.\s*\d+)*)([a-zA-Z]*)'
+        version_match = re.search(version_pattern, version_raw, re.IGNORECASE)
+
+        table_extracted = ""  # 存储表格提取的版本号
+        if version_match:
+            prefix = version_match.group(1).strip()
+            number_part = version_match.group(2).strip()
+            suffix = version_match.group(3).strip()
+
+            # 清理数字部分的空格（如“0 .1”→“0.1”，“0. 1”→“0.1”）
+            number_part = re.sub(r'\s*\.\s*', '.', number_part)
+            # 清理SIZE关键词（保留原有逻辑）
+            if 'SIZE' in suffix.upper():
+                size_pos = suffix.upper().find('SIZE')
+                suffix = suffix[:size_pos]
+            table_extracted = f"{prefix}{number_part}{suffix}"
+
+        # 3. 二次校验：若表格提取结果是“短版本号”（如V0、Rev1），强制用文本提取补充
+        final_version = table_extracted
+        if len(table_extracted) <= 2:
+            text_extracted = ""  # 存储文本提取的版本号
+            extracted_text = get_text()  # 页面的完整文本
+            if extracted_text:
+                # 文本提取正则：同样支持空格容错
+                text_version_pattern = r'(?:版\s*本|Version|rev)[:：]?\s*(V|Rev|rev)\.?\s*(\d+(?:\s*\.\s*\d+)*)'
+                text_match = re.search(text_version_pattern, extracted_text, re.IGNORECASE)
+                if text_match:
+                    text_prefix = text_match.group(1).strip()
+                    text_number = text_match.group(2).strip()
+                    text_number = re.sub(r'\s*\.\s*', '.', text_number)  # 清理空格
+                    text_extracted = f"{text_prefix}{text_number}"
+
+            # 4. 选择最优结果：优先用“完整版本号”（如V0.1），避免短版本号
+            if len(text_extracted) > 2:
+                final_version = text_extracted
+
+        title_data["版本"] = final_version
+
+        # 无效值处理（保持不变）
+        surface_treatment = title_data["表面处理"].strip().lower()
+        invalid_surface_values = {"none", "无", "空白", "/", ""}
+        if all(part.strip().lower() in invalid_surface_values for part in re.split(r'\s+', surface_treatment)):
+            title_data["表面处理"] = ""
+        title_value = title_data["title"].strip().lower()
+        invalid_title_values = {"none", "无", "空白", "/", ""}
+        if all(part.strip().lower() in invalid_title_values for part in re.split(r'\s+', title_value)):
+            title_data["title"] = ""
+
+        # 文本提取补充（只在有字段为空时提取页面文本）
+        fallback_keys = ["名称", "图号", "加工", "材料", "颜色"]
+        if any(not title_data[key].strip() for key in fallback_keys):
+            extracted_text = get_text()
+        else:
+            extracted_text = ""
+
+        if extracted_text:
+            patterns = {
+                "名称": r"(?:名\s*称|Name)[:：]?\s*(\S+)",
+                "图号": r"(?:图\s*号|图\s*名|Drawing|DWG NO.)[:：]?\s*(\S+)",
+                # 加工字段文本提取模式调整
+                "加工": r"(?:加\s*工|Processing)[:：]?\s*(.*?)[\s:，;。]",
+                "材料": r"(?:材\s*料|Material)[:：]?\s*(\S+)",
+                "颜色": r"(?:颜\s*色|Color)[:：]?\s*(\S+)",
+                "表面处理": r"(?:表\s*面\s*处\s*理|Surface)[:：]?\s*(\S+)",
+                "版本": r"(?:版\s*本|Version|rev)[:：]?\s*(V|Rev|rev)\.?\s*(\d+(?:\.\d+)*)([a-zA-Z]*)",
+                "title": r"(?:title|TITLE)[:：]?\s*(\S+)"
+            }
+
+            # 处理加工字段的文本提取结果
+            if not title_data["加工"].strip() and "加工" in patterns:
+                match = re.search(patterns["加工"], extracted_text, re.IGNORECASE)
+                if match:
+                    processing_text = match.group(1).strip()
+                    # 应用相同的清洗逻辑
+                    suffix_to_remove = r'(中|了|的|等|完毕|完成|结束)$'
+                    while re.search(suffix_to_remove, processing_text):
+                        processing_text = re.sub(suffix_to_remove, '', processing_text).strip()
+                    title_data["加工"] = processing_text
+
+            # 其他字段处理（保持不变）
+            for key, pattern in patterns.items():
+                if key in ["表面处理", "版本", "加工"]:
+                    continue
+                if key == "title" and not title_data[key].strip():
+                    continue
+                if not title_data[key].strip():
+                    match = re.search(pattern, extracted_text, re.IGNORECASE)
+                    if match:
+                        title_data[key] = match.group(1).strip()
+
+        return title_data
+
+    # ======================== 标题栏定位与模板函数 ========================
+
+    def normalize_label(self, text):
+        """规范化标签文字（小写、去空白和冒号）"""
+        return re.sub(r'[\s:：]+', '', text).lower()
+
+    def locate_title_block(self, page, words):
+        """根据标签关键字和页面旋转定位包含标题栏的最小区域，返回裁剪框"""
+        width = page.width
+        height = page.height
+
+        # 按页面旋转确定标题栏通常所在的角（未旋转时为右下角）
+        corner = {0: (1, 1), 90: (0, 1), 180: (0, 0), 270: (1, 0)}.get((page.rotation or 0) % 360, (1, 1))
+
+        def center(word):
+            return (word["x0"] + word["x1"]) / 2, (word["top"] + word["bottom"]) / 2
+
+        def corner_distance(word):
+            cx, cy = center(word)
+            return abs(cx / width - corner[0]) + abs(cy / height - corner[1])
+
+        hits = [(self.normalize_label(word["text"]), word) for word in words]
+        hits = [(label, word) for label, word in hits if label in self.TITLE_BLOCK_LABELS]
+
+        if hits:
+            radius_x = width * 0.25
+            radius_y = height * 0.2
+
+            def neighbours(word):
+                cx, cy = center(word)
+                return [(label, other) for label, other in hits
+                        if abs(center(other)[0] - cx) <= radius_x and abs(center(other)[1] - cy) <= radius_y]
+
+            # 以周围标签种类最多的位置为中心聚类（数量相同时取更靠近标题栏所在角的位置）
+            anchor = max(hits, key=lambda hit: (len({label for label, _ in neighbours(hit[1])}),
+                                                -corner_distance(hit[1])))
+            cluster = [word for _, word in neighbours(anchor[1])]
+
+            if len({label for label, _ in neighbours(anchor[1])}) >= 3:
+                # 值通常在标签右侧或下方，向右和向下多留余量
+                x0 = min(word["x0"] for word in cluster) - width * 0.02
+                x1 = max(word["x1"] for word in cluster) + width * 0.25
+                top = min(word["top"] for word in cluster) - height * 0.03
+                bottom = max(word["bottom"] for word in cluster) + height * 0.05
+                return max(0, x0), max(0, top), min(width, x1), min(height, bottom)
+
+        # 未找到标题栏标签：按页面旋转取对应角落的固定比例区域
+        x0, x1 = (width * 0.3, width) if corner[0] else (0, width * 0.7)
+        top, bottom = (height * 0.6, height) if corner[1] else (0, height * 0.4)
+        return x0, top, x1, bottom
+
+    def union_bbox(self, *bboxes):
+        """合并多个坐标框（忽略None）"""
+        bboxes = [bbox for bbox in bboxes if bbox]
+        if not bboxes:
+            return None
+        return (min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+                max(b[2] for b in bboxes), max(b[3] for b in bboxes))
+
+    def title_block_fingerprint(self, page, words):
+        """根据标签文字的位置计算标题栏模板指纹（坐标按页面尺寸归一化并量化）"""
+        labels = []
+        for word in words:
+            text = self.normalize_label(word["text"])
+            if text in self.TITLE_BLOCK_LABELS:
+                labels.append((text, round(word["x0"] / page.width * 200), round(word["top"] / page.height * 200)))
+        if len(labels) < 2:
+            return None
+        key = (round(page.width), round(page.height), tuple(sorted(labels)))
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def title_block_rulings(self, page, region):
+        """计算模板区域内表格线的签名（用于确认版式一致）"""
+        x0, top, x1, bottom = region
+        bbox = (x0 * page.width, top * page.height, x1 * page.width, bottom * page.height)
+        edges = []
+        for edge in page.crop(bbox).edges:
+            if edge["orientation"] == "h":
+                edges.append(("h", round(edge["top"] / page.height * 400),
+                              round(edge["x0"] / page.width * 400), round(edge["x1"] / page.width * 400)))
+            else:
+                edges.append(("v", round(edge["x0"] / page.width * 400),
+                              round(edge["top"] / page.height * 400), round(edge["bottom"] / page.height * 400)))
+        return hashlib.sha1(repr(sorted(set(edges))).encode("utf-8")).hexdigest()
+
+    def load_title_block_templates(self):
+        """加载已学习的标题栏模板（首次使用时从磁盘读取）"""
+        with self._template_lock:
+            if self.title_block_templates is None:
+                self.title_block_templates = {}
+                template_file = os.path.join(self.cache_dir, "title_block_templates.json")
+                if os.path.exists(template_file):
+                    try:
+                        with open(template_file, "r", encoding="utf-8") as f:
+                            self.title_block_templates = json.load(f)
+                    except Exception:
+                        pass  # 模板文件损坏时重新学习
+            return self.title_block_templates
+
+    def match_title_block_template(self, fingerprint, page):
+        """查找与指纹匹配且表格线一致的模板"""
+        if not fingerprint:
+            return None
+        template = self.load_title_block_templates().get(fingerprint)
+        if template and self.title_block_rulings(page, template["region"]) == template["rulings"]:
+            return template
+        return None
+
+    def learn_title_block_template(self, fingerprint, located_cells, table_cells, page):
+        """记录各字段候选单元格及表格单元格的坐标（按页面尺寸归一化），保存为标题栏模板"""
+        templates = self.load_title_block_templates()
+        if fingerprint in templates or len(templates) >= 500:
+            return
+
+        def normalize(bbox):
+            if not bbox:
+                return None
+            return [bbox[0] / page.width, bbox[1] / page.height, bbox[2] / page.width, bbox[3] / page.height]
+
+        fields = {field: [normalize(bbox) for bbox in cells] for field, cells in located_cells.items()}
+        region = self.union_bbox(*[tuple(bbox) for cells in fields.values() for bbox in cells if bbox])
+        if not region:
+            return
+        template = {"fields": fields, "region": list(region), "rulings": self.title_block_rulings(page, region),
+                    "cells": [normalize(cell) for cell in table_cells]}
+
+        with self._template_lock:
+            self.title_block_templates[fingerprint] = template
+            try:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                template_file = os.path.join(self.cache_dir, "title_block_templates.json")
+
+                # 合并其他工作进程已保存的模板，写入临时文件后替换，避免并发写入时文件损坏
+                if os.path.exists(template_file):
+                    try:
+                        with open(template_file, "r", encoding="utf-8") as f:
+                            for key, value in json.load(f).items():
+                                self.title_block_templates.setdefault(key, value)
+                    except Exception:
+                        pass
+                temp_file = f"{template_file}.{os.getpid()}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(self.title_block_templates, f, ensure_ascii=False)
+                os.replace(temp_file, template_file)
+            except Exception:
+                pass  # 保存失败不影响提取
+
+    def read_title_block_template(self, template, page, index):
+        """按模板中的单元格坐标直接读取各字段（取第一个有效的候选单元格），未取到的字段用空间索引补充"""
+        def scale(bbox):
+            return (bbox[0] * page.width, bbox[1] * page.height, bbox[2] * page.width, bbox[3] * page.height)
+
+        ignore_values = [v.lower() for v in self.TITLE_IGNORE_VALUES]
+        index.cells = [scale(cell) for cell in template.get("cells", []) if cell]
+        raw_fields = {}
+        for field, keywords, _ in self.TITLE_FIELD_KEYWORDS:
+            raw_fields[field] = ""
+            for bbox in template["fields"].get(field, []):
+                value = index.text(scale(bbox)) if bbox else ""
+                if value and value.lower() not in ignore_values:
+                    raw_fields[field] = value
+                    break
+            if not raw_fields[field]:
+                raw_fields[field] = index.find_value(keywords, self.TITLE_IGNORE_VALUES)
+        return raw_fields
+
+    # ======================== 扫描图纸OCR函数 ========================
+
+    def get_ocr_executor(self):
+        """获取OCR线程池（线程数有限，避免OCR占满CPU影响正常提取）"""
+        with self._page_executor_lock:
+            if self._ocr_executor is None:
+                self._ocr_executor = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="pdf_ocr")
+                self._ocr_slots = threading.Semaphore(self.ocr_workers * self.OCR_PENDING_PER_WORKER)
+            return self._ocr_executor
+
+    def ocr_page_title_block(self, pdf_path, page, page_no, data=None):
+        """对扫描图纸的标题栏区域进行OCR，返回字段字典（按标签命名）的Future，结果按文件内容哈希缓存。
+        标题栏区域在当前线程渲染，识别在OCR线程池中进行，当前线程不等待识别结果"""
+        content_hash = hashlib.sha1(data).hexdigest() if data is not None else self.compute_file_hash(pdf_path)
+        cache_key = hashlib.sha1(f"{content_hash}_{page_no}_{self.ocr_dpi}_{self.ocr_lang}"
+                                 .encode("utf-8")).hexdigest()
+        cache_file = os.path.join(self.cache_dir, f"ocr_{cache_key}.json")
+
+        # 1. 内存缓存 / 2. 磁盘缓存
+        title_data = self._ocr_cache.get(cache_key)
+        if title_data is not None:
+            return completed_future(dict(title_data))
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    title_data = json.load(f)
+                self._ocr_cache.put(cache_key, title_data)
+                return completed_future(dict(title_data))
+            except Exception:
+                pass  # 缓存文件损坏时重新识别
+
+        # 没有文字可用于定位，按页面旋转取标题栏所在角落，只渲染该区域；
+        # 排队的图片过多时等待，避免渲染比识别快时图片堆积占用内存
+        executor = self.get_ocr_executor()
+        self._ocr_slots.acquire()
+        try:
+            bbox = self.locate_title_block(page, [])
+            image = page.crop(bbox).to_image(resolution=self.ocr_dpi).original
+            future = executor.submit(self.ocr_title_fields, image, bbox, cache_key, cache_file)
+        except BaseException:
+            self._ocr_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._ocr_slots.release())
+        return future
+
+    def ocr_title_fields(self, image, bbox, cache_key, cache_file):
+        """识别标题栏图片并提取字段（在OCR线程中执行），结果写入内存和磁盘缓存"""
+        words = self.run_ocr(image)
+        scale = 72 / self.ocr_dpi
+        for word in words:
+            word["x0"] = bbox[0] + word["x0"] * scale
+            word["x1"] = bbox[0] + word["x1"] * scale
+            word["top"] = bbox[1] + word["top"] * scale
+            word["bottom"] = bbox[1] + word["bottom"] * scale
+
+        # 识别出的文字没有表格线信息，按同一行右侧或下方查找字段值
+        index = WordIndex(words, label_words=self.TITLE_BLOCK_LABELS)
+        raw_fields = {field: index.find_value(keywords, self.TITLE_IGNORE_VALUES)
+                      for field, keywords, _ in self.TITLE_FIELD_KEYWORDS}
+        title_data = self.finalize_title_fields(raw_fields, lambda: index.join_words(words))
+
+        self._ocr_cache.put(cache_key, title_data)
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(title_data, f, ensure_ascii=False)
+        except Exception:
+            pass  # 缓存写入失败不影响识别结果
+        return dict(title_data)
+
+    def run_ocr(self, image):
+        """调用本地Tesseract识别图片，返回文字及其像素坐标"""
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("未安装pytesseract，无法识别扫描图纸")
+
+        if self.ocr_tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.ocr_tesseract_cmd
+        data = pytesseract.image_to_data(image, lang=self.ocr_lang, output_type=pytesseract.Output.DICT)
+
+        words = []
+        for i, text in enumerate(data["text"]):
+            text = text.strip()
+            if not text or float(data["conf"][i]) < 0:
+                continue
+            words.append({"text": text, "x0": data["left"][i], "x1": data["left"][i] + data["width"][i],
+                          "top": data["top"][i], "bottom": data["top"][i] + data["height"][i]})
+        return words
+
+    def compute_file_hash(self, file_path, chunk_size=1024 * 1024):
+        """计算文件内容的SHA1哈希（分块读取，用于缓存键）"""
+        sha1 = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+
+def process_memory_mb():
+    """当前进程的内存占用和峰值（MB），按平台读取"""
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize / 1048576, counters.PeakWorkingSetSize / 1048576
+        except (AttributeError, OSError):
+            return 0.0, 0.0
+
+    # Linux：VmRSS为当前占用，VmHWM为峰值（单位kB）
+    try:
+        values = {}
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(value.split()[0]) / 1024
+        return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+    except (OSError, ValueError):
+        pass
+
+    # 其他系统只能取得峰值（macOS单位为字节）
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 1048576 if sys.platform == "darwin" else peak / 1024
+        return peak, peak
+    except (ImportError, OSError):
+        return 0.0, 0.0
+
+
+def extraction_worker(settings, task_queue, result_queue, max_rss_mb):
+    """提取工作进程：依次处理任务队列中的PDF，只返回标题块字段；内存超过上限时处理完当前文件后退出"""
+    extractor = TitleBlockExtractor(settings)
+    extractor.warm_up_extractor()
+    pid = os.getpid()
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            seq, pdf_path = task
+            result_queue.put(("start", pid, seq, pdf_path))
+            sheets, error, seconds = extractor.extract_pdf_task(pdf_path)
+            rss, peak = process_memory_mb()
+            result_queue.put(("done", pid, seq, pdf_path, sheets, error, seconds, peak))
+            if max_rss_mb and rss > max_rss_mb:
+                result_queue.put(("recycle", pid, rss))
+                break
+    finally:
+        extractor.shutdown_executors()
+
+
+class RecyclingProcessPool:
+    """PDF提取工作进程池：所有任务放在一个共享队列中（保持LPT顺序，空闲进程取下一个任务），
+    工作进程内存超过上限或异常退出时启动新进程替换，并记录各工作进程的内存峰值"""
+
+    def __init__(self, settings, max_workers, max_rss_mb, on_result):
+        self.context = multiprocessing.get_context("spawn")
+        self.settings = settings
+        self.max_workers = max_workers
+        self.max_rss_mb = max_rss_mb
+        self.on_result = on_result
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.workers = {}  # 进程号 -> 进程
+        self.running_tasks = {}  # 进程号 -> 正在处理的 (序号, 文件)
+        self.remaining = 0
+        self.unfinished = {}  # 尚未返回结果的任务：序号 -> 文件
+        self.active_pids = set()  # 已开始处理任务的进程
+        self.startup_failures = 0
+        self.exited_checks = 0  # 连续发现所有进程都已退出的次数
+        self.peak_rss_mb = 0.0
+        self.recycled = 0
+        self.crashed = 0
+        self.collector = None
+
+    def start(self, tasks):
+        """提交所有任务并启动工作进程和结果收集线程"""
+        tasks = list(tasks)
+        self.remaining = len(tasks)
+        self.unfinished = dict(tasks)
+        for task in tasks:
+            self.task_queue.put(task)
+        for _ in range(self.max_workers):
+            self.task_queue.put(None)
+        for _ in range(self.max_workers):
+            self.start_worker()
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def start_worker(self):
+        process = self.context.Process(target=extraction_worker,
+                                       args=(self.settings, self.task_queue, self.result_queue, self.max_rss_mb),
+                                       daemon=True)
+        process.start()
+        self.workers[process.pid] = process
+
+    def collect(self):
+        """收集工作进程的消息，直到所有任务都有结果"""
+        while self.remaining > 0:
+            try:
+                message = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                self.check_workers()
+                continue
+
+            kind, pid = message[0], message[1]
+            if kind == "start":
+                self.running_tasks[pid] = message[2:4]
+                self.active_pids.add(pid)
+                self.startup_failures = 0
+            elif kind == "done":
+                _, _, seq, pdf_path, sheets, error, seconds, peak = message
+                self.running_tasks.pop(pid, None)
+                self.unfinished.pop(seq, None)
+                self.peak_rss_mb = max(self.peak_rss_mb, peak)
+                self.remaining -= 1
+                self.on_result(seq, pdf_path, sheets, error, seconds)
+            elif kind == "recycle":
+                # 该进程未取走结束标记，新进程接替它继续处理剩余任务
+                self.recycled += 1
+                process = self.workers.pop(pid, None)
+                if process:
+                    process.join(timeout=5)
+                if self.remaining > 0:
+                    self.start_worker()
+
+    def check_workers(self):
+        """处理异常退出的工作进程：当前文件记为错误，并启动新进程；
+        所有进程都已退出时，仍没有结果的文件记为错误"""
+        for pid, process in list(self.workers.items()):
+            if process.is_alive() or process.exitcode == 0:
+                continue
+            del self.workers[pid]
+            self.crashed += 1
+            task = self.running_tasks.pop(pid, None)
+            if task:
+                self.unfinished.pop(task[0], None)
+                self.remaining -= 1
+                self.on_result(task[0], task[1], [], f"工作进程异常退出 (代码 {process.exitcode})", 0.0)
+
+            # 工作进程连续启动失败（未处理任何文件就退出）时，剩余文件全部记为错误，不再重试
+            if pid not in self.active_pids:
+                self.startup_failures += 1
+                if self.startup_failures >= 3:
+                    self.fail_unfinished(f"工作进程无法启动 (代码 {process.exitcode})")
+                    return
+            if self.remaining > 0:
+                self.start_worker()
+
+        # 进程取走任务后、开始消息发出前被终止时，该任务既不在队列中也不在处理中：
+        # 所有进程都已退出、且再等一轮读完退出前发出的消息后仍有文件没有结果时记为错误，避免收集线程一直等待
+        if self.remaining > 0 and not any(process.is_alive() for process in self.workers.values()):
+            self.exited_checks += 1
+            if self.exited_checks >= 2:
+                self.fail_unfinished("工作进程退出前未返回结果")
+        else:
+            self.exited_checks = 0
+
+    def fail_unfinished(self, error):
+        """把所有尚未返回结果的文件记为错误"""
+        for seq, pdf_path in list(self.unfinished.items()):
+            self.on_result(seq, pdf_path, [], error, 0.0)
+        self.unfinished.clear()
+        self.remaining = 0
+
+    def shutdown(self):
+        """等待所有任务完成并结束工作进程"""
+        if self.collector:
+            self.collector.join()
+        for process in self.workers.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.workers.clear()
+
+
+class PDFPrefetcher:
+    """PDF预读：少量I/O线程按处理顺序把即将处理的PDF整体读入内存，内存中的PDF总字节数不超过预算。
+    提取线程直接从内存解析，不再在网络共享上做大量小块随机读取"""
+
+    def __init__(self, pdf_files, budget_bytes, io_threads=4):
+        self.pending = deque(pdf_files)  # 待预读的 (路径, 大小)，与提取顺序一致
+        self.sizes = dict(pdf_files)
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0  # 已读入或正在读入、尚未释放的字节数
+        self.peak_bytes = 0
+        self.buffers = {}  # 路径 -> 文件内容（读取失败为None）
+        self.loading = set()
+        self.taken = set()  # 提取线程已取走（或不再需要预读）的路径
+        self.hits = 0
+        self.misses = 0
+        self.wait_seconds = 0.0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.threads = [threading.Thread(target=self.io_loop, name="pdf_prefetch", daemon=True)
+                        for _ in range(max(1, io_threads))]
+        for thread in self.threads:
+            thread.start()
+
+    def io_loop(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.closed:
+                        return
+                    # 跳过已被提取线程直接读取的文件；超过整个预算的大文件不预读
+                    while self.pending and (self.pending[0][0] in self.taken
+                                            or self.pending[0][1] > self.budget_bytes):
+                        self.pending.popleft()
+                    if not self.pending:
+                        return
+                    if self.used_bytes + self.pending[0][1] <= self.budget_bytes:
+                        break
+                    self.condition.wait()
+                pdf_path, size = self.pending.popleft()
+                self.used_bytes += size
+                self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+                self.loading.add(pdf_path)
+
+            try:
+                with open(pdf_path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+
+            with self.condition:
+                self.loading.discard(pdf_path)
+                self.used_bytes += (len(data) if data is not None else 0) - size
+                self.sizes[pdf_path] = len(data) if data is not None else 0
+                if self.closed or pdf_path in self.taken:
+                    self.used_bytes -= self.sizes[pdf_path]
+                else:
+                    self.buffers[pdf_path] = data
+                self.condition.notify_all()
+
+    def acquire(self, pdf_path):
+        """取出PDF内容：正在读取时等待；还没轮到预读、超出预算或读取失败时返回None，由调用方直接读文件。
+        取到内容的文件处理完后需调用 release() 归还预算"""
+        with self.condition:
+            start_time = time.perf_counter()
+            while pdf_path in self.loading:
+                self.condition.wait()
+            self.wait_seconds += time.perf_counter() - start_time
+            self.taken.add(pdf_path)
+            data = self.buffers.pop(pdf_path, None)
+            if data is None:
+                self.misses += 1
+                self.sizes[pdf_path] = 0  # 未预读或读取失败的文件没有占用预算
+            else:
+                self.hits += 1
+            return data
+
+    def release(self, pdf_path):
+        """文件处理完成，归还占用的预算"""
+        with self.condition:
+            self.used_bytes -= self.sizes.pop(pdf_path, 0)
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for data in self.buffers.values():
+                self.used_bytes -= len(data) if data is not None else 0
+            self.buffers.clear()
+            self.condition.notify_all()
+
+
+class ExtractionThreadPool(ThreadPoolExecutor):
+    """提取线程池（可带PDF预读），关闭时一并停止预读"""
+
+    def __init__(self, max_workers, prefetcher=None):
+        super().__init__(max_workers=max_workers)
+        self.prefetcher = prefetcher
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+
+class ExtractionBatch:
+    """共享提取线程池中一个任务的文件（保持该任务的LPT顺序），结果收齐后调用shutdown()"""
+
+    def __init__(self, pool, tasks, run_task, log_queue, priority, order, prefetcher=None):
+        self.pool = pool
+        self.tasks = deque(tasks)
+        self.run_task = run_task
+        self.priority = priority
+        self.order = order
+        self.prefetcher = prefetcher
+        self.log_queue = log_queue  # 提交该批次的任务的日志队列
+        self.running = 0
+        self.finished = 0
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.pool.finish_batch(self, wait, cancel_futures)
+
+
+class SharedExtractionPool:
+    """多个任务共用的提取线程池：空闲线程从优先级最高的任务中取下一个文件，
+    同优先级的任务中取正在处理的文件最少（其次已完成最少）的任务，各任务平分线程（公平份额）"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.batches = []
+        self.condition = threading.Condition()
+        self.threads = []
+        self.next_order = 0
+        self.closed = False
+
+    def submit_batch(self, tasks, run_task, log_queue, priority=0, prefetcher=None):
+        """提交一个任务的全部文件 [(序号, 文件)]，run_task(序号, 文件) 在共享线程中执行，出错时写入log_queue"""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("共享提取线程池已关闭")
+            if not self.threads:
+                for i in range(self.max_workers):
+                    thread = threading.Thread(target=self.worker, daemon=True, name=f"shared_extract_{i + 1}")
+                    thread.start()
+                    self.threads.append(thread)
+            batch = ExtractionBatch(self, tasks, run_task, log_queue, priority, self.next_order, prefetcher)
+            self.next_order += 1
+            self.batches.append(batch)
+            self.condition.notify_all()
+        return batch
+
+    def next_task(self):
+        """选出下一个文件（调用时持有condition）"""
+        self.batches = [batch for batch in self.batches if batch.tasks or batch.running]
+        candidates = [batch for batch in self.batches if batch.tasks]
+        if not candidates:
+            return None, None
+        top = max(batch.priority for batch in candidates)
+        batch = min((batch for batch in candidates if batch.priority == top),
+                    key=lambda batch: (batch.running, batch.finished, batch.order))
+        batch.running += 1
+        return batch, batch.tasks.popleft()
+
+    def worker(self):
+        while True:
+            with self.condition:
+                batch, task = self.next_task()
+                while task is None and not self.closed:
+                    self.condition.wait()
+                    batch, task = self.next_task()
+                if task is None:
+                    return
+            try:
+                batch.run_task(*task)
+            except Exception as e:
+                batch.log_queue.put(f"提取 {os.path.basename(task[1])} 时出错: {str(e)}\n")
+            finally:
+                with self.condition:
+                    batch.running -= 1
+                    batch.finished += 1
+                    self.condition.notify_all()
+
+    def finish_batch(self, batch, wait=True, cancel=False):
+        """结束一个任务的批次（cancel时丢弃未开始的文件，wait时等待正在处理的文件）"""
+        with self.condition:
+            if cancel:
+                batch.tasks.clear()
+            while wait and (batch.tasks or batch.running):
+                self.condition.wait()
+        if batch.prefetcher is not None:
+            batch.prefetcher.close()
+
+    def shutdown(self):
+        """丢弃未开始的文件，等待正在处理的文件完成后结束所有线程"""
+        with self.condition:
+            self.closed = True
+            for batch in self.batches:
+                batch.tasks.clear()
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+
+class RunJournal:
+    """运行记录（追加写入的JSON行文件）：每个文件提取完成后立即写入结果，
+    程序崩溃、Excel卡死或电脑休眠后重新运行同一任务时，已完成的文件直接使用记录的结果"""
+
+    SYNC_INTERVAL = 2.0  # 同步到磁盘的间隔（秒），断电时最多丢失最近这段时间的结果
+
+    def __init__(self, path, header):
+        self.path = path
+        self.entries = {}  # 文件键 -> 上次运行记录的提取结果
+        self.lock = threading.Lock()
+        self.last_sync = time.monotonic()
+        self.partial_tail = False  # 文件最后一行是否不完整
+        self.load()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8")
+        if is_new:
+            self.write(dict(header, type="run"))
+        elif self.partial_tail:
+            self.file.write("\n")  # 上次中断时写了一半的行单独成行，后续记录不受影响
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                self.partial_tail = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 中断时只写了一半的行
+                if record.get("type") == "file":
+                    self.entries[record["file"]] = record
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.file.flush()
+            if time.monotonic() - self.last_sync >= self.SYNC_INTERVAL:
+                os.fsync(self.file.fileno())
+                self.last_sync = time.monotonic()
+
+    def record_file(self, file_key, size, mtime, file_hash, sheets, error):
+        """记录一个文件的提取结果"""
+        self.write({"type": "file", "file": file_key, "size": size, "mtime": mtime, "hash": file_hash,
+                    "sheets": [list(sheet.__getstate__()) for sheet in sheets], "error": error})
+
+    def record_outcome(self, file_key, outcome):
+        """记录一个文件的比对结果（[Excel行, 匹配类型]列表）"""
+        self.write({"type": "outcome", "file": file_key, "outcome": outcome})
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+    def finish(self):
+        """任务正常完成（报告已保存）后删除运行记录"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class TitleBlockStore:
+    """标题栏库（SQLite）：保存监视文件夹中各PDF的标题栏提取结果，可按图号/名称查询；
+    批量比对时大小、修改时间和提取设置都未变化的文件直接使用库中的结果"""
+
+    SHEET_COLUMNS = ("name", "drawing_no", "processing", "material", "color", "surface", "version", "title",
+                     "page_count", "page_no", "source")
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")  # 守护进程写入时其他进程可以同时读取
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime REAL, "
+                "settings TEXT, error TEXT, updated REAL)")
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS sheets (key TEXT, {', '.join(self.SHEET_COLUMNS)}, "
+                f"PRIMARY KEY (key, page_no))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS sheets_drawing_no ON sheets (drawing_no)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS sheets_name ON sheets (name)")
+
+    @staticmethod
+    def file_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def put(self, path, size, mtime, settings, sheets, error):
+        """写入（替换）一个文件的提取结果"""
+        key = self.file_key(path)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM sheets WHERE key = ?", (key,))
+            self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (key, os.path.abspath(path), size, mtime, settings, error, time.time()))
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO sheets VALUES (?, {', '.join('?' * len(self.SHEET_COLUMNS))})",
+                [(key,) + sheet.__getstate__() for sheet in sheets])
+
+    def get(self, path, size, mtime, settings):
+        """文件未变化（大小、修改时间、提取设置相同）时返回 (图纸页列表, 错误信息)，否则返回None"""
+        key = self.file_key(path)
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime, settings, error FROM files WHERE key = ?",
+                                          (key,)).fetchone()
+            if row is None or row[0] != size or int(row[1]) != int(mtime) or row[2] != settings:
+                return None
+            sheets = self.connection.execute(
+                f"SELECT {', '.join(self.SHEET_COLUMNS)} FROM sheets WHERE key = ? ORDER BY page_no",
+                (key,)).fetchall()
+        return [TitleBlock(*sheet) for sheet in sheets], row[3]
+
+    def remove(self, path):
+        """删除一个文件，或一个目录下的所有文件"""
+        key = self.file_key(path)
+        prefix = key.rstrip(os.sep) + os.sep
+        with self.lock, self.connection:
+            for table in ("sheets", "files"):
+                self.connection.execute(f"DELETE FROM {table} WHERE key = ? OR substr(key, 1, ?) = ?",
+                                        (key, len(prefix), prefix))
+
+    def snapshot(self, folder):
+        """目录下已入库的文件：{路径: (大小, 修改时间)}"""
+        prefix = self.file_key(folder).rstrip(os.sep) + os.sep
+        with self.lock:
+            rows = self.connection.execute("SELECT path, size, mtime FROM files WHERE substr(key, 1, ?) = ?",
+                                           (len(prefix), prefix)).fetchall()
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def find(self, text, limit=200):
+        """按图号或名称（包含关系）查询，返回 [(路径, TitleBlock)]"""
+        pattern = f"%{text}%"
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT files.path, {', '.join('sheets.' + column for column in self.SHEET_COLUMNS)} "
+                f"FROM sheets JOIN files ON files.key = sheets.key "
+                f"WHERE sheets.drawing_no LIKE ? OR sheets.name LIKE ? ORDER BY files.path, sheets.page_no LIMIT ?",
+                (pattern, pattern, limit)).fetchall()
+        return [(row[0], TitleBlock(*row[1:])) for row in rows]
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class FolderWatcher:
+    """监视文件夹中PDF的新增、修改和删除：Linux本地文件系统用inotify，其他情况（网络共享、其他平台）定时轮询。
+    文件在稳定时间内大小和修改时间不再变化才视为落地完成；inotify方式也定期全量扫描，防止遗漏事件"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    # 这些文件系统上其他机器的写入不会产生inotify事件，只能轮询
+    REMOTE_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p")
+
+    def __init__(self, folders, scan, accept, on_change, on_delete, known=None, mode="auto",
+                 poll_interval=5.0, settle_seconds=2.0, rescan_interval=600.0, log=print):
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.scan = scan  # scan(文件夹) -> 可迭代的 (路径, 大小, 修改时间)
+        self.accept = accept  # accept(路径) -> 是否为需要提取的PDF
+        self.on_change = on_change  # on_change(路径, 大小, 修改时间)
+        self.on_delete = on_delete  # on_delete(路径)，路径也可能是目录
+        self.known = dict(known or {})  # 已处理的文件：路径 -> (大小, 修改时间)
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.rescan_interval = rescan_interval
+        self.log = log
+        self.pending = {}  # 等待稳定的文件：路径 -> ((大小, 修改时间), 到期时间)
+        self.inotify_fd = None
+        self.watch_dirs = {}  # inotify监视描述符 -> 目录
+        self.stop_event = threading.Event()
+
+    def run(self):
+        """监视循环（阻塞，直到调用stop）"""
+        use_inotify = self.mode == "inotify" or (self.mode == "auto" and self.inotify_supported())
+        if use_inotify and self.start_inotify():
+            self.log(f"监视方式: inotify（每 {self.rescan_interval:.0f} 秒全量扫描一次）\n")
+            rescan_interval = self.rescan_interval
+        else:
+            self.log(f"监视方式: 轮询（每 {self.poll_interval:g} 秒扫描一次）\n")
+            rescan_interval = self.poll_interval
+
+        next_rescan = 0.0
+        try:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                if now >= next_rescan:
+                    self.full_scan()
+                    next_rescan = time.monotonic() + rescan_interval
+                self.emit_settled()
+
+                timeout = max(0.05, min([next_rescan] + [due for _, due in self.pending.values()]) - time.monotonic())
+                if self.inotify_fd is not None:
+                    self.read_inotify_events(min(timeout, 1.0))
+                else:
+                    self.stop_event.wait(min(timeout, 1.0))
+        finally:
+            if self.inotify_fd is not None:
+                os.close(self.inotify_fd)
+                self.inotify_fd = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def observe(self, path):
+        """记录文件的当前状态，稳定时间后再确认"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        state = (stat.st_size, stat.st_mtime)
+        if self.known.get(path) != state:
+            self.pending[path] = (state, time.monotonic() + self.settle_seconds)
+
+    def emit_settled(self):
+        """稳定时间内没有变化的文件交给on_change"""
+        now = time.monotonic()
+        for path, (state, due) in list(self.pending.items()):
+            if due > now:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime)
+            if current != state:
+                self.pending[path] = (current, now + self.settle_seconds)  # 仍在写入
+                continue
+            del self.pending[path]
+            self.known[path] = current
+            self.on_change(path, *current)
+
+    def full_scan(self):
+        """全量扫描：找出新增/修改的文件和已删除的文件"""
+        seen = set()
+        for folder in self.folders:
+            for path, size, mtime in self.scan(folder):
+                seen.add(path)
+                if self.known.get(path) != (size, mtime) and path not in self.pending:
+                    self.pending[path] = ((size, mtime), time.monotonic() + self.settle_seconds)
+        for path in [path for path in self.known if path not in seen]:
+            del self.known[path]
+            self.on_delete(path)
+
+    def inotify_supported(self):
+        """Linux且所有监视目录都在本地文件系统上"""
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            with open("/proc/mounts", "r", encoding="utf-8", errors="ignore") as f:
+                mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+        except OSError:
+            return False
+        for folder in self.folders:
+            real = os.path.realpath(folder)
+            mount_point, fs_type = max(((point, fs) for point, fs in mounts
+                                        if real == point or real.startswith(point.rstrip("/") + "/")),
+                                       key=lambda item: len(item[0]), default=("/", ""))
+            if fs_type in self.REMOTE_FILESYSTEMS:
+                return False
+        return True
+
+    def start_inotify(self):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            self._libc = libc
+            fd = libc.inotify_init1(0o2000000)  # IN_CLOEXEC
+            if fd < 0:
+                return False
+            self.inotify_fd = fd
+            for folder in self.folders:
+                if not self.add_watch_tree(folder):
+                    os.close(fd)
+                    self.inotify_fd = None
+                    self.watch_dirs = {}
+                    return False
+            return True
+        except (AttributeError, OSError):
+            return False
+
+    def add_watch_tree(self, folder):
+        """为目录及其所有子目录添加监视（监视数达到系统上限时返回False）"""
+        for directory, dirs, _ in os.walk(folder):
+            wd = self._libc.inotify_add_watch(self.inotify_fd, os.fsencode(directory), self.WATCH_MASK)
+            if wd < 0:
+                self.log(f"无法监视目录 {directory}（errno {ctypes.get_errno()}），改用轮询\n")
+                return False
+            self.watch_dirs[wd] = directory
+        return True
+
+    def read_inotify_events(self, timeout):
+        import select
+        import struct
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return
+        data = os.read(self.inotify_fd, 64 * 1024)
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, name_length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + name_length].rstrip(b"\0")
+            offset += 16 + name_length
+            if mask & self.IN_Q_OVERFLOW:
+                self.full_scan()  # 事件队列溢出，重新扫描
+                continue
+            directory = self.watch_dirs.get(wd)
+            if mask & self.IN_IGNORED:
+                self.watch_dirs.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # 新目录：添加监视，并扫描其中在添加监视前已经写入的文件
+                    self.add_watch_tree(path)
+                    for file_path, _, _ in self.scan(path):
+                        self.observe(file_path)
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    prefix = path + os.sep
+                    for known_path in [p for p in self.known if p.startswith(prefix)]:
+                        del self.known[known_path]
+                    self.on_delete(path)
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                if self.accept(path):
+                    self.observe(path)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self.pending.pop(path, None)
+                if self.known.pop(path, None) is not None:
+                    self.on_delete(path)
+
+
+class ArchiveBackend:
+    """压缩包后端：列出成员、流式读取单个成员、只解压选中的成员。
+    find_archive_backend 按 ARCHIVE_BACKENDS 的顺序选用第一个可用且能打开该文件的后端"""
+    name = ""
+
+    def available(self):
+        """后端依赖（可选库或外部程序）是否可用"""
+        return True
+
+    def can_open(self, archive_path):
+        raise NotImplementedError
+
+    def list_members(self, archive_path):
+        """返回 [(成员名, 解压后大小)]，不含目录"""
+        raise NotImplementedError
+
+    def open_member(self, archive_path, name):
+        """以二进制流方式打开单个成员（上下文管理器，不落盘）"""
+        raise NotImplementedError
+
+    def extract_members(self, archive_path, names, extract_dir):
+        """只解压指定的成员"""
+        raise NotImplementedError
+
+
+class ZipArchiveBackend(ArchiveBackend):
+    """zipfile：按成员多线程解压（每个线程单独打开压缩包）"""
+    name = "zipfile"
+
+    def can_open(self, archive_path):
+        return zipfile.is_zipfile(archive_path)
+
+    def member_infos(self, zf):
+        """文件成员（未标记UTF-8的文件名按GBK解码，国内常见的压缩包中文名）"""
+        infos = {}
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            if not info.flag_bits & 0x800:
+                try:
+                    info.filename = info.filename.encode('cp437').decode('gbk')
+                except (UnicodeEncodeError, UnicodeDecodeError):
+                    pass
+            infos[info.filename] = info
+        return infos
+
+    def list_members(self, archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            return [(name, info.file_size) for name, info in self.member_infos(zf).items()]
+
+    @contextmanager
+    def open_member(self, archive_path, name):
+        with zipfile.ZipFile(archive_path) as zf:
+            with zf.open(self.member_infos(zf)[name]) as stream:
+                yield stream
+
+    def member_dir(self, extract_dir, info):
+        """成员解压后所在的目录（与 ZipFile.extract 的规则相同：去掉盘符和空、.、..路径段，Windows下替换非法字符）"""
+        arcname = info.filename.replace('/', os.sep)
+        if os.altsep:
+            arcname = arcname.replace(os.altsep, os.sep)
+        parts = [part for part in os.path.splitdrive(arcname)[1].split(os.sep)
+                 if part not in ('', os.curdir, os.pardir)]
+        if os.sep == '\\':
+            parts = [part for part in (re.sub(r'[:<>|"?*]', '_', part).rstrip('.') for part in parts) if part]
+        return os.path.join(extract_dir, *parts[:-1])
+
+    def extract_members(self, archive_path, names, extract_dir):
+        names = set(names)
+        with zipfile.ZipFile(archive_path) as zf:
+            wanted = [info for name, info in self.member_infos(zf).items() if name in names]
+        if not wanted:
+            return
+
+        # 先创建所有成员的上级目录：ZipFile.extract 创建目录时不允许目录已存在，多个线程同时创建同一目录会出错
+        for directory in {self.member_dir(extract_dir, info) for info in wanted}:
+            os.makedirs(directory, exist_ok=True)
+
+        # 成员按大小交错分组，各线程的解压量大致相同
+        worker_count = max(1, min(8, os.cpu_count() or 4, len(wanted)))
+        wanted.sort(key=lambda info: info.file_size, reverse=True)
+        groups = [wanted[i::worker_count] for i in range(worker_count)]
+
+        def extract_group(group):
+            with zipfile.ZipFile(archive_path) as zf:
+                for info in group:
+                    zf.extract(info, extract_dir)
+
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            for future in [executor.submit(extract_group, group) for group in groups]:
+                future.result()
+
+
+class TarArchiveBackend(ArchiveBackend):
+    """tarfile：按成员过滤解压（压缩的TAR只能顺序读取，不拆分线程）"""
+    name = "tarfile"
+
+    def can_open(self, archive_path):
+        return tarfile.is_tarfile(archive_path)
+
+    def list_members(self, archive_path):
+        with tarfile.open(archive_path) as tf:
+            return [(member.name, member.size) for member in tf.getmembers() if member.isfile()]
+
+    @contextmanager
+    def open_member(self, archive_path, name):
+        with tarfile.open(archive_path) as tf:
+            with tf.extractfile(name) as stream:
+                yield stream
+
+    def extract_members(self, archive_path, names, extract_dir):
+        names = set(names)
+        with tarfile.open(archive_path) as tf:
+            wanted = [member for member in tf.getmembers() if member.isfile() and member.name in names]
+            if hasattr(tarfile, 'data_filter'):
+                tf.extractall(extract_dir, members=wanted, filter='data')
+            else:
+                tf.extractall(extract_dir, members=wanted)
+
+
+class Py7zrArchiveBackend(ArchiveBackend):
+    """py7zr（可选库，纯Python解压7z）"""
+    name = "py7zr"
+
+    def available(self):
+        try:
+            import py7zr  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def can_open(self, archive_path):
+        import py7zr
+        return py7zr.is_7zfile(archive_path)
+
+    def list_members(self, archive_path):
+        import py7zr
+        with py7zr.SevenZipFile(archive_path, 'r') as archive:
+            return [(info.filename, info.uncompressed or 0) for info in archive.list() if not info.is_directory]
+
+    @contextmanager
+    def open_member(self, archive_path, name):
+        import py7zr
+        with py7zr.SevenZipFile(archive_path, 'r') as archive:
+            if hasattr(archive, 'read'):
+                yield archive.read(targets=[name])[name]
+                return
+        # 新版本没有read()，解压到临时目录后读取
+        temp_dir = tempfile.mkdtemp(prefix="7z_member_")
+        try:
+            self.extract_members(archive_path, [name], temp_dir)
+            with open(os.path.join(temp_dir, name), 'rb') as stream:
+                yield stream
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def extract_members(self, archive_path, names, extract_dir):
+        import py7zr
+        with py7zr.SevenZipFile(archive_path, 'r') as archive:
+            archive.extract(path=extract_dir, targets=list(names))
+
+
+class RarfileArchiveBackend(ArchiveBackend):
+    """rarfile（可选库；压缩的RAR成员仍需系统中有unrar/unar/bsdtar之一）"""
+    name = "rarfile"
+
+    def available(self):
+        try:
+            import rarfile  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def can_open(self, archive_path):
+        import rarfile
+        return rarfile.is_rarfile(archive_path)
+
+    def list_members(self, archive_path):
+        import rarfile
+        with rarfile.RarFile(archive_path) as rf:
+            return [(info.filename, info.file_size) for info in rf.infolist() if not info.is_dir()]
+
+    @contextmanager
+    def open_member(self, archive_path, name):
+        import rarfile
+        with rarfile.RarFile(archive_path) as rf:
+            with rf.open(name) as stream:
+                yield stream
+
+    def extract_members(self, archive_path, names, extract_dir):
+        import rarfile
+        with rarfile.RarFile(archive_path) as rf:
+            for name in names:
+                rf.extract(name, extract_dir)
+
+
+class SevenZipBinaryBackend(ArchiveBackend):
+    """外部7z程序（兜底）：直接运行打包资源、程序目录或PATH中的7z，不再复制到临时目录"""
+    name = "7z"
+    BINARY_NAMES = ("7z", "7za", "7zz")
+
+    def __init__(self):
+        self._path = None  # 找到的7z路径（首次使用时查找，找不到为空字符串）
+
+    def binary_path(self):
+        if self._path is None:
+            candidates = []
+            if hasattr(sys, '_MEIPASS'):
+                candidates.append(os.path.join(sys._MEIPASS, "7z.exe"))
+            if sys.platform == "win32":
+                candidates.append(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0] or __file__)), "7z.exe"))
+            self._path = next((path for path in candidates if os.path.isfile(path)), "")
+            if not self._path:
+                self._path = next((shutil.which(name) for name in self.BINARY_NAMES if shutil.which(name)), "") or ""
+        return self._path
+
+    def available(self):
+        return bool(self.binary_path())
+
+    def can_open(self, archive_path):
+        return True
+
+    def run(self, args):
+        """运行7z命令，返回 subprocess.CompletedProcess"""
+        return subprocess.run(
+            [self.binary_path()] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+            startupinfo=startupinfo
+        )
+
+    def check(self, result, action):
+        if result.returncode != 0:
+            raise RuntimeError(f"{action}失败 (错误码 {result.returncode}): "
+                               f"{result.stderr.decode('gbk', errors='ignore').strip()}")
+
+    def list_members(self, archive_path):
+        result = self.run(["l", "-slt", "-sccUTF-8", archive_path])
+        self.check(result, "读取压缩包")
+
+        # -slt 输出中，分隔线之后每个成员是一组 "键 = 值" 行，成员之间空行分隔
+        members = []
+        current = {}
+        listing = result.stdout.decode('utf-8', errors='ignore').replace('\r\n', '\n')
+        for line in listing.split('----------\n', 1)[-1].split('\n') + ['']:
+            if ' = ' in line:
+                key, value = line.split(' = ', 1)
+                current[key.strip()] = value
+            elif current:
+                if 'Path' in current and current.get('Folder') != '+' and 'D' not in current.get('Attributes', '')[:1]:
+                    members.append((current['Path'], int(current.get('Size') or 0)))
+                current = {}
+        return members
+
+    @contextmanager
+    def open_member(self, archive_path, name):
+        process = subprocess.Popen(
+            [self.binary_path(), "e", "-so", "-spd", "-sccUTF-8", archive_path, name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+            startupinfo=startupinfo
+        )
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+    def extract_members(self, archive_path, names, extract_dir):
+        list_fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="7z_list_")
+        try:
+            with os.fdopen(list_fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(names) + '\n')
+            # -spd: 文件列表中的名称不按通配符解析；-mmt=on: 多线程解压
+            result = self.run(["x", archive_path, f"-o{extract_dir}", "-y", "-mmt=on", "-spd",
+                               "-scsUTF-8", f"@{list_path}"])
+        finally:
+            os.remove(list_path)
+        self.check(result, "解压")
+
+
+# 按顺序尝试：标准库 -> 可选库 -> 外部7z程序
+ARCHIVE_BACKENDS = [ZipArchiveBackend(), TarArchiveBackend(), Py7zrArchiveBackend(),
+                    RarfileArchiveBackend(), SevenZipBinaryBackend()]
+
+
+def find_archive_backend(archive_path):
+    """选出第一个可用且能打开该压缩包的后端，都不行时返回None"""
+    for backend in ARCHIVE_BACKENDS:
+        try:
+            if backend.available() and backend.can_open(archive_path):
+                return backend
+        except Exception:
+            continue  # 可选库识别文件头出错时交给下一个后端
+    return None
+
+
+class PDFExcelTool(TitleBlockExtractor):
+    # 表头标签别名（按顺序匹配，先匹配的字段占用该列；TITLE表头含"name"，需先于物料名称匹配）
+    COLUMN_ALIASES = [
+        ("title", ["name and specification", "name&specification"]),
+        ("物料名称", ["物料名称", "part name"]),
+        ("物料规格", ["物料规格", "规格型号", "specification"]),
+        ("描述", ["描述", "description"]),
+        ("版本", ["版本", "version", "rev"]),
+    ]
+
+    # 字段与配置项的对应关系
+    COLUMN_CONFIG_KEYS = {
+        "物料名称": "name_col",
+        "物料规格": "spec_col",
+        "描述": "desc_col",
+        "版本": "version_col",
+        "title": "title_col",
+    }
+
+    # 支持的填入行顺序和填入模式
+    FILL_ORDERS = ("path", "natural", "drawing")
+    FILL_MODES = ("overwrite", "upsert")
+
+    # 并行提取方式
+    WORKER_MODES = ("thread", "process")
+    # 支持的压缩文件扩展名（输入的压缩包和包内嵌套的压缩包）
+    ARCHIVE_EXTENSIONS = ('.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.tgz')
+    # PDF文件头识别方式（auto=只检查可疑文件名, all=检查所有非PDF后缀的文件, off=只认.pdf后缀）
+    SNIFF_MODES = ("auto", "all", "off")
+    # auto方式下需要读取文件头确认的扩展名（常见的改名/备份后缀，以及无扩展名的文件）
+    SNIFF_EXTENSIONS = ('', '.bak', '.old', '.orig', '.tmp', '.part', '.download', '.dat', '.bin')
+    MAX_ARCHIVE_DEPTH = 3  # 嵌套压缩包的最大解压层数
+    NESTED_ARCHIVE_PREFIX = "~nested_"  # 嵌套压缩包解压目录的前缀（位于临时目录下，遍历时跳过）
+    PDF_COST_LIMIT = 20000  # 处理耗时记录的最大条数（超过时淘汰最久未用的记录）
+    PDF_COST_RETENTION_DAYS = 90  # 超过该天数未用到的处理耗时记录在保存时删除
+
+    def __init__(self, root=None):
+        """root为None时不创建界面（守护进程、服务等命令行模式），日志输出到标准输出"""
+        self.root = root
+        if root is not None:
+            self.setup_window()
 
         # 初始化变量
         self.excel_path = ""
@@ -67,11 +2249,17 @@ class PDFExcelTool:
         self.processed_count = 0
         self.progress_frame = None  # 延迟创建进度条
         self.temp_dir = None  # 存储临时解压目录
-        self._7z_path = None  # 存储7z工具路径
-        self._7z_dir = None  # 7z工具的临时目录
         self.excel_app = None  # xlwings应用实例
         self.excel_book = None  # xlwings工作簿实例
 
+        # 标题栏提取相关变量（cache_dir、多页/OCR设置等）
+        super().__init__()
+
+        # 缓存相关变量
+        self._bom_cache = {}  # 已解析的BOM数据（按工作簿哈希缓存）
+        self._column_map_cache = {}  # 列映射（按表头模板指纹缓存）
+        self.column_map = {}  # 最近一次解析得到的列映射
+
         # 配置相关变量
         self.config = configparser.ConfigParser()
         self.config_file = "config.ini"
@@ -82,15 +2270,61 @@ class PDFExcelTool:
         self.desc_col = 4  # 默认描述列
         self.version_col = 9  # 默认版本列
         self.title_col = 13  # 新增：TITLE对应的列，第13列 (Name and Specification)
+        self.column_overrides = {}  # 强制指定的列号（[COLUMNS]配置节）
+        self.fill_order = "natural"  # 填入行顺序
+        self.fill_mode = "overwrite"  # 填入模式
+        self.worker_mode = "thread"  # 并行提取方式（thread=线程, process=工作进程）
+        self.max_worker_rss_mb = 1500  # 工作进程内存上限（MB，超过后替换该进程）
+        self.prefetch_mb = 256  # PDF预读的内存预算（MB，0为不预读）
+        self.prefetch_threads = 4  # PDF预读的I/O线程数
+        self.journal_enabled = True  # 是否写运行记录（中断后重新运行时跳过已完成的文件）
+        self.journal = None  # 当前运行的运行记录
+        self.journal_root = ""  # 运行记录中文件键的相对路径起点
+        self.nested_archive_dirs = {}  # 嵌套压缩包解压目录 -> 压缩包路径
+        self.watch_folders = []  # 守护进程监视的文件夹
+        self.watch_mode = "auto"  # 监视方式（auto=本地文件系统用inotify, inotify, poll=轮询）
+        self.watch_poll_interval = 5.0  # 轮询间隔（秒）
+        self.watch_settle_seconds = 2.0  # 文件大小和修改时间保持不变多久后视为写入完成（秒）
+        self.watch_workers = 4  # 守护进程的提取线程数
+        self.store_path = ""  # 标题栏库文件（空为缓存目录下的title_blocks.db）
+        self.use_store = True  # 批量比对/填入时是否使用标题栏库中的结果
+        self._title_block_store = None
+        self.service_host = "127.0.0.1"  # 本地服务的监听地址
+        self.service_port = 8765  # 本地服务的端口
+        self.scheduler_jobs = 4  # 多任务调度同时处理的任务数（常驻工具实例数）
+        self.scheduler_workers = 0  # 多任务共享提取线程数（0为CPU核心数的2倍，最多16）
+        self.shared_pool = None  # 多任务调度时各任务共用的提取线程池
+        self.job_priority = 0  # 当前任务在共享提取线程池中的优先级
+        self.job_scheduler = None  # 界面“加入队列”使用的多任务调度器（首次使用时创建）
+        self.service_queue_size = 16  # 本地服务等待队列的上限（满时拒绝新任务）
+        self.memory_stats = ""  # 最近一次处理的内存峰值统计
+        self.duplicate_pdfs = {}  # 最近一次处理中内容相同的PDF：首个文件 -> 其他相同文件
+        self.duplicate_originals = {}  # 重复文件 -> 内容相同的首个文件
+        self.extracted_files = []  # 最近一次处理中实际提取的文件（不含重复文件和已有结果的文件）
+        self._pdf_costs = None  # 各PDF上次的处理耗时和页数（用于任务调度，首次使用时加载）
+        self._pdf_costs_lock = threading.Lock()
+        self.sniff_mode = "auto"  # PDF文件头识别方式
+        self.discovery_workers = 8  # 遍历文件夹的并行线程数
+        self.discovery_stats = ""  # 最近一次遍历的统计（文件头识别/嵌套压缩包）
+        self._pdf_stats = {}  # 遍历时记录的 PDF路径 -> (大小, 修改时间)
+        self._pdf_digests = {}  # 临时目录中PDF的首尾内容摘要（耗时记录的键）
+        self._temp_dir_lock = threading.Lock()
 
         # 注册程序退出时的清理函数
         atexit.register(self.cleanup_on_exit)
-        # 当窗口关闭时也执行清理
-        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # 加载配置
         self.load_config()
 
+        if root is None:
+            # 无界面模式：日志直接输出
+            self.log_update_thread = threading.Thread(target=self.print_log, daemon=True)
+            self.log_update_thread.start()
+            return
+
+        # 当窗口关闭时也执行清理
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # 创建主框架
         self.main_frame = ttk.Frame(self.root, padding=10)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
@@ -125,6 +2359,7 @@ class PDFExcelTool:
         welcome_msg += f"  描述列: {self.desc_col}\n"
         welcome_msg += f"  版本列: {self.version_col}\n"
         welcome_msg += f"  TITLE列 (Name and Specification): {self.title_col}\n"  # 新增
+        welcome_msg += "  (以上列号在表头未识别时使用，[COLUMNS]中填写的列号优先)\n"
         welcome_msg += "=" * 70 + "\n"
         welcome_msg += "使用说明:\n"
         welcome_msg += "1. 选择PDF图纸文件夹或压缩包\n"
@@ -134,10 +2369,6 @@ class PDFExcelTool:
         welcome_msg += "=" * 70 + "\n"
         self.log_queue.put(welcome_msg)
 
-        # 初始化7z工具（如果是打包版本）
-        if hasattr(sys, 'frozen'):
-            self.init_7z_tool()
-
     def load_config(self):
         """加载配置文件"""
         # 默认配置
@@ -150,6 +2381,69 @@ class PDFExcelTool:
                 'desc_col': '4',
                 'version_col': '9',
                 'title_col': '13'
+            },
+            # 强制指定列号（留空表示按表头标签自动识别）
+            'COLUMNS': {
+                'name_col': '',
+                'spec_col': '',
+                'desc_col': '',
+                'version_col': '',
+                'title_col': ''
+            },
+            # 填入设置（order: path=按文件路径, natural=按文件路径自然排序, drawing=按图号；
+            #           mode: overwrite=按顺序逐行填入, upsert=按图号/名称更新已有行并追加新图纸）
+            'FILL': {
+                'order': 'natural',
+                'mode': 'overwrite'
+            },
+            # PDF提取设置（page_mode: first=仅首页, all=每一页, distinct=标题块不同的页；page_workers: 页面并行线程数）
+            'PDF': {
+                'page_mode': 'first',
+                'page_workers': '4',
+                # 并行方式（thread=线程, process=工作进程）；工作进程内存上限（MB），超过后替换该进程
+                'worker_mode': 'thread',
+                'max_worker_rss_mb': '1500',
+                # 文件头识别（auto=检查 .PDF.bak 等可疑文件名, all=检查所有文件, off=只认.pdf后缀）；遍历并行线程数
+                'sniff': 'auto',
+                'discovery_workers': '8',
+                # 线程方式下预读PDF到内存（适合网络共享）：内存预算（MB，0为不预读）和I/O线程数
+                'prefetch_mb': '256',
+                'prefetch_threads': '4'
+            },
+            # 运行设置（journal: 逐个文件写运行记录，程序中断后重新运行同一任务时跳过已完成的文件）
+            'RUN': {
+                'journal': 'true'
+            },
+            # 监视文件夹守护进程（--watch）：folders 用分号分隔；mode: auto/inotify/poll；
+            # store: 标题栏库文件（空为缓存目录下的title_blocks.db）；use_store: 批量处理时使用库中未变化文件的结果
+            'WATCH': {
+                'folders': '',
+                'mode': 'auto',
+                'poll_interval': '5',
+                'settle_seconds': '2',
+                'workers': '4',
+                'store': '',
+                'use_store': 'true'
+            },
+            # 本地HTTP/JSON服务（--serve）：queue_size 为等待队列上限
+            'SERVICE': {
+                'host': '127.0.0.1',
+                'port': '8765',
+                'queue_size': '16'
+            },
+            # 多任务调度（服务、--jobs、界面“加入队列”）：jobs 为同时处理的任务数，
+            # workers 为各任务共用的提取线程数（0为CPU核心数的2倍，最多16）
+            'SCHEDULER': {
+                'jobs': '4',
+                'workers': '0'
+            },
+            # 扫描图纸OCR设置（需安装pytesseract和本地Tesseract；只在页面没有文字时识别标题栏区域）
+            'OCR': {
+                'enabled': 'false',
+                'tesseract_cmd': '',
+                'lang': 'chi_sim+eng',
+                'dpi': '300',
+                'workers': '2'
             }
         }
 
@@ -172,58 +2466,102 @@ class PDFExcelTool:
             self.desc_col = int(self.config['EXCEL']['desc_col'])
             self.version_col = int(self.config['EXCEL']['version_col'])
             self.title_col = int(self.config['EXCEL']['title_col'])  # 新增：读取TITLE列配置
+
+            # 读取强制列号（可选配置节）
+            self.column_overrides = {}
+            if self.config.has_section('COLUMNS'):
+                for field, key in self.COLUMN_CONFIG_KEYS.items():
+                    value = self.config['COLUMNS'].get(key, '').strip()
+                    if value:
+                        self.column_overrides[field] = int(value)
+
+            # 读取填入设置（可选配置节）
+            self.fill_order = self.config.get('FILL', 'order', fallback='natural').strip().lower()
+            if self.fill_order not in self.FILL_ORDERS:
+                self.log_queue.put(f"未知的填入顺序: {self.fill_order}，使用natural\n")
+                self.fill_order = "natural"
+            self.fill_mode = self.config.get('FILL', 'mode', fallback='overwrite').strip().lower()
+            if self.fill_mode not in self.FILL_MODES:
+                self.log_queue.put(f"未知的填入模式: {self.fill_mode}，使用overwrite\n")
+                self.fill_mode = "overwrite"
+
+            # 读取PDF提取设置（可选配置节）
+            self.page_mode = self.config.get('PDF', 'page_mode', fallback='first').strip().lower()
+            if self.page_mode not in self.PAGE_MODES:
+                self.log_queue.put(f"未知的多页提取方式: {self.page_mode}，使用first\n")
+                self.page_mode = "first"
+            self.page_workers = max(1, self.config.getint('PDF', 'page_workers', fallback=4))
+            self.worker_mode = self.config.get('PDF', 'worker_mode', fallback='thread').strip().lower()
+            if self.worker_mode not in self.WORKER_MODES:
+                self.log_queue.put(f"未知的并行方式: {self.worker_mode}，使用thread\n")
+                self.worker_mode = "thread"
+            self.max_worker_rss_mb = max(0, self.config.getint('PDF', 'max_worker_rss_mb', fallback=1500))
+            self.sniff_mode = self.config.get('PDF', 'sniff', fallback='auto').strip().lower()
+            if self.sniff_mode not in self.SNIFF_MODES:
+                self.log_queue.put(f"未知的文件头识别方式: {self.sniff_mode}，使用auto\n")
+                self.sniff_mode = "auto"
+            self.discovery_workers = max(1, self.config.getint('PDF', 'discovery_workers', fallback=8))
+            self.prefetch_mb = max(0, self.config.getint('PDF', 'prefetch_mb', fallback=256))
+            self.prefetch_threads = max(1, self.config.getint('PDF', 'prefetch_threads', fallback=4))
+
+            # 读取运行设置（可选配置节）
+            self.journal_enabled = self.config.getboolean('RUN', 'journal', fallback=True)
+
+            # 读取监视文件夹设置（可选配置节）
+            folders = self.config.get('WATCH', 'folders', fallback='')
+            self.watch_folders = [folder.strip() for folder in folders.split(';') if folder.strip()]
+            self.watch_mode = self.config.get('WATCH', 'mode', fallback='auto').strip().lower()
+            if self.watch_mode not in ("auto", "inotify", "poll"):
+                self.log_queue.put(f"未知的监视方式: {self.watch_mode}，使用auto\n")
+                self.watch_mode = "auto"
+            self.watch_poll_interval = max(0.5, self.config.getfloat('WATCH', 'poll_interval', fallback=5.0))
+            self.watch_settle_seconds = max(0.0, self.config.getfloat('WATCH', 'settle_seconds', fallback=2.0))
+            self.watch_workers = max(1, self.config.getint('WATCH', 'workers', fallback=4))
+            self.store_path = self.config.get('WATCH', 'store', fallback='').strip()
+            self.use_store = self.config.getboolean('WATCH', 'use_store', fallback=True)
+
+            # 读取本地服务设置（可选配置节）
+            self.service_host = self.config.get('SERVICE', 'host', fallback='127.0.0.1').strip() or "127.0.0.1"
+            self.service_port = self.config.getint('SERVICE', 'port', fallback=8765)
+            self.service_queue_size = max(1, self.config.getint('SERVICE', 'queue_size', fallback=16))
+
+            # 读取多任务调度设置（可选配置节）
+            self.scheduler_jobs = max(1, self.config.getint('SCHEDULER', 'jobs', fallback=4))
+            self.scheduler_workers = max(0, self.config.getint('SCHEDULER', 'workers', fallback=0))
+
+            # 读取OCR设置（可选配置节）
+            self.ocr_enabled = self.config.getboolean('OCR', 'enabled', fallback=False)
+            self.ocr_tesseract_cmd = self.config.get('OCR', 'tesseract_cmd', fallback='').strip()
+            self.ocr_lang = self.config.get('OCR', 'lang', fallback='chi_sim+eng').strip() or "chi_sim+eng"
+            self.ocr_dpi = max(72, self.config.getint('OCR', 'dpi', fallback=300))
+            self.ocr_workers = max(1, self.config.getint('OCR', 'workers', fallback=2))
             self.log_queue.put("配置文件加载成功\n")
         except (KeyError, ValueError) as e:
             self.log_queue.put(f"配置加载错误: {str(e)}，使用默认值\n")
 
-    def init_7z_tool(self):
-        """初始化7z工具（支持重复调用，确保工具文件存在）"""
-        # 如果已存在有效路径，直接返回
-        if self._7z_path and os.path.exists(self._7z_path):
-            return True
-
-        try:
-            # 若之前的临时目录无效，创建新的临时目录
-            if self._7z_dir and (not os.path.exists(self._7z_dir)):
-                self._7z_dir = None  # 标记为无效
-
-            if not self._7z_dir:
-                self._7z_dir = tempfile.mkdtemp(prefix="7z_")
-                self.log_queue.put(f"创建7z工具临时目录: {self._7z_dir}\n")
-
-            self._7z_path = os.path.join(self._7z_dir, "7z.exe")
-
-            # 从打包资源中提取7z.exe和7z.dll
-            if hasattr(sys, '_MEIPASS'):
-                # 检查资源中是否存在7z文件
-                resource_exe = os.path.join(sys._MEIPASS, "7z.exe")
-                resource_dll = os.path.join(sys._MEIPASS, "7z.dll")
-
-                if not os.path.exists(resource_exe):
-                    self.log_queue.put("错误：未在打包资源中找到7z.exe\n")
-                    return False
+    def setup_window(self):
+        """设置主窗口（标题、DPI感知、尺寸和位置）"""
+        self.root.title("PDF信息提取与比对工具")
 
-                # 复制文件到临时目录（如果不存在或已损坏）
-                if not os.path.exists(self._7z_path) or os.path.getsize(self._7z_path) == 0:
-                    shutil.copy(resource_exe, self._7z_path)
-                    self.log_queue.put(f"已提取7z.exe到临时目录\n")
+        # 设置DPI感知（仅Windows）
+        if sys.platform == "win32":
+            try:
+                # 启用DPI感知
+                ctypes.windll.shcore.SetProcessDpiAwareness(1)
+            except (AttributeError, OSError):
+                pass  # 如果API不可用则忽略
 
-                # 处理7z.dll
-                dll_dest = os.path.join(self._7z_dir, "7z.dll")
-                if os.path.exists(resource_dll) and (not os.path.exists(dll_dest) or os.path.getsize(dll_dest) == 0):
-                    shutil.copy(resource_dll, dll_dest)
-                    self.log_queue.put(f"已提取7z.dll到临时目录\n")
+        # 计算相对尺寸
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        width = int(min(1000, screen_width * 0.8))
+        height = int(min(900, screen_height * 0.8))
+        self.root.geometry(f"{width}x{height}")
+        self.root.minsize(800, 700)  # 最小尺寸
+        self.root.resizable(True, True)  # 允许调整大小
 
-                self.log_queue.put(f"7z工具已初始化: {self._7z_path}\n")
-                return True
-            else:
-                self.log_queue.put("警告：未在打包环境中运行，使用系统7z工具\n")
-                # 尝试使用系统7z
-                self._7z_path = "7z"
-                return True
-        except Exception as e:
-            self.log_queue.put(f"初始化7z工具失败: {str(e)}\n")
-            return False
+        # 居中窗口
+        self.center_window()
 
     def center_window(self):
         """居中窗口"""
@@ -262,6 +2600,10 @@ class PDFExcelTool:
         self.compare_btn = ttk.Button(center_frame, text="开始比对", command=self.start_comparison, width=15)
         self.compare_btn.pack(side=tk.LEFT, padx=5)
 
+        # 加入队列：不等当前处理结束，比对任务由多任务调度器在后台依次/同时处理
+        self.queue_btn = ttk.Button(center_frame, text="加入队列", command=self.queue_comparison, width=15)
+        self.queue_btn.pack(side=tk.LEFT, padx=5)
+
         self.report_btn = ttk.Button(center_frame, text="查看报告", command=self.open_report, state=tk.DISABLED,
                                      width=15)
         self.report_btn.pack(side=tk.LEFT, padx=5)
@@ -307,6 +2649,19 @@ class PDFExcelTool:
             except Exception:
                 pass
 
+    def print_log(self):
+        """无界面模式：把日志消息输出到标准输出"""
+        log_queue = self.log_queue  # 任务调度时log_queue会被替换为任务的事件通道，这里只输出原队列
+        while True:
+            msg = log_queue.get()
+            try:
+                sys.stdout.write(msg)
+                sys.stdout.flush()
+            except Exception:
+                pass
+            finally:
+                log_queue.task_done()  # 退出前用 log_queue.join() 等待日志输出完
+
     def create_progress_section(self):
         """创建进度条区域（在需要时创建）"""
         if self.progress_frame is None:
@@ -399,6 +2754,17 @@ class PDFExcelTool:
         config_msg += f"  描述列: {self.desc_col}\n"
         config_msg += f"  版本列: {self.version_col}\n"
         config_msg += f"  TITLE列 (Name and Specification): {self.title_col}\n"  # 新增
+        if self.column_overrides:
+            config_msg += f"  强制列号: {self.format_column_map(self.column_overrides)}\n"
+        config_msg += f"  填入顺序: {self.fill_order}\n"
+        config_msg += f"  填入模式: {self.fill_mode}\n"
+        config_msg += f"  多页PDF提取: {self.page_mode}\n"
+        config_msg += f"  并行方式: {self.worker_mode}"
+        config_msg += f" (工作进程内存上限 {self.max_worker_rss_mb} MB)\n" if self.worker_mode == "process" else "\n"
+        if self.worker_mode == "thread":
+            config_msg += (f"  PDF预读: {self.prefetch_mb} MB, {self.prefetch_threads} 个I/O线程\n"
+                           if self.prefetch_mb else "  PDF预读: 关闭\n")
+        config_msg += f"  扫描图纸OCR: {'开启' if self.ocr_enabled else '关闭'}\n"
         self.log_queue.put(config_msg)
 
         # 创建进度条区域
@@ -464,6 +2830,59 @@ class PDFExcelTool:
         # 启动进度更新
         self.root.after(100, self.update_progress)
 
+    def queue_comparison(self):
+        """把当前图纸与所选Excel的比对加入多任务队列（可在处理中继续添加）"""
+        if not self.pdf_folder:
+            messagebox.showerror("错误", "请先选择PDF文件夹或压缩包")
+            return
+
+        if not os.path.exists(self.pdf_folder):
+            messagebox.showerror("错误", f"路径不存在: {self.pdf_folder}")
+            return
+
+        excel_path = filedialog.askopenfilename(
+            title="选择要比对的Excel文件（加入队列）",
+            filetypes=[("Excel文件", "*.xlsx *.xls"), ("所有文件", "*.*")]
+        )
+
+        if not excel_path:
+            return
+
+        if self.job_scheduler is None:
+            self.job_scheduler = JobScheduler.from_config()
+            self.job_scheduler.start()
+        try:
+            job = self.job_scheduler.submit("compare", {"excel": excel_path, "pdf": self.pdf_folder})
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        self.log_queue.put(f"[任务 {job.id}] 已加入队列: {os.path.basename(excel_path)} - {self.pdf_folder}\n")
+        threading.Thread(target=self.follow_queued_job, args=(job,), daemon=True).start()
+
+    def follow_queued_job(self, job):
+        """在日志中显示队列任务的状态和进度（每完成10%显示一次）"""
+        since = 0
+        last_step = -1
+        while True:
+            events, since, finished = job.wait_events(since)
+            for event in events:
+                if event["type"] == "state" and event["state"] == "running":
+                    self.log_queue.put(f"[任务 {job.id}] 开始处理\n")
+                elif event["type"] == "progress" and event["total"]:
+                    step = event["done"] * 10 // event["total"]
+                    if step > last_step:
+                        last_step = step
+                        self.log_queue.put(f"[任务 {job.id}] 进度: {event['done']}/{event['total']}\n")
+            if finished:
+                break
+        if job.state == "done":
+            self.report_path = job.result["report"]
+            self.log_queue.put(f"[任务 {job.id}] 比对完成，发现 {job.result['error_count']} 个错误，"
+                               f"报告已保存到: {self.report_path}\n")
+            self.root.after(0, lambda: self.report_btn.config(state=tk.NORMAL))
+        else:
+            self.log_queue.put(f"[任务 {job.id}] 处理失败: {job.error}\n")
+
     def update_progress(self):
         """更新进度条显示"""
         if not self.running:
@@ -490,38 +2909,48 @@ class PDFExcelTool:
             self.root.after(100, self.update_progress)
 
     def extract_archive(self, archive_path, extract_dir):
-        """使用7z工具解压压缩包"""
-        # 每次解压前检查7z工具是否有效，无效则重新初始化
-        if not self.init_7z_tool():
-            self.log_queue.put("7z工具不可用，无法解压文件\n")
+        """解压压缩包中的PDF（以及嵌套压缩包和文件头确认为PDF的可疑文件名），其余成员（模型、图片等）跳过。
+        解压方式见 ARCHIVE_BACKENDS：ZIP/TAR用标准库，7z/RAR优先用可选库，最后才调用外部7z程序"""
+        backend = find_archive_backend(archive_path)
+        if backend is None:
+            self.log_queue.put("没有可用的解压方式（7z/RAR压缩包需安装py7zr/rarfile或7z程序），无法解压文件\n")
             return False
 
         try:
-            # 构建解压命令
-            if self._7z_path and os.path.exists(self._7z_path):
-                cmd = [self._7z_path, "x", archive_path, f"-o{extract_dir}", "-y"]
-            else:
-                # 回退到系统7z（如果有）
-                cmd = ["7z", "x", archive_path, f"-o{extract_dir}", "-y"]
-
-            # 运行解压命令
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
-                startupinfo=startupinfo
-            )
+            wanted = []
+            extracted_count = extracted_bytes = skipped_count = skipped_bytes = 0
+            for name, size in backend.list_members(archive_path):
+                if self.is_wanted_member(backend, archive_path, name):
+                    wanted.append(name)
+                    extracted_count += 1
+                    extracted_bytes += size
+                else:
+                    skipped_count += 1
+                    skipped_bytes += size
+            if wanted:
+                backend.extract_members(archive_path, wanted, extract_dir)
+        except Exception as e:
+            self.log_queue.put(f"解压过程中出错: {str(e)}\n")
+            return False
 
-            if result.returncode != 0:
-                error_msg = f"解压失败 (错误码 {result.returncode}): {result.stderr.decode('gbk', errors='ignore')}"
-                self.log_queue.put(error_msg + "\n")
-                return False
+        self.log_queue.put(f"解压 {os.path.basename(archive_path)} ({backend.name}): 提取 {extracted_count} 个文件 "
+                           f"({extracted_bytes / (1024 * 1024):.1f} MB)，跳过 {skipped_count} 个无关文件 "
+                           f"({skipped_bytes / (1024 * 1024):.1f} MB)\n")
+        return True
 
+    def is_wanted_member(self, backend, archive_path, name):
+        """压缩包成员是否需要解压：PDF、嵌套压缩包，以及可疑文件名中（流式读取文件头）确认为PDF的成员"""
+        base_name = os.path.basename(name.replace('\\', '/')).lower()
+        ext = os.path.splitext(base_name)[1]
+        if ext == '.pdf' or ext in self.ARCHIVE_EXTENSIONS:
             return True
-        except Exception as e:
-            self.log_queue.put(f"解压过程中出错: {str(e)}\n")
+        if not self.should_sniff_pdf(base_name, ext):
             return False
+        try:
+            with backend.open_member(archive_path, name) as stream:
+                return b'%PDF-' in stream.read(1024)
+        except Exception:
+            return True  # 读取不了文件头时先解压，由遍历时再识别
 
     def run_filling(self):
         """执行填充过程"""
@@ -537,9 +2966,6 @@ class PDFExcelTool:
             is_archive = False
             archive_type = ""
 
-            # 支持的压缩文件扩展名
-            archive_extensions = ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2']
-
             # 检查是否是压缩文件
             if os.path.isfile(self.pdf_folder):
                 file_ext = os.path.splitext(self.pdf_folder)[1].lower()
@@ -548,7 +2974,7 @@ class PDFExcelTool:
                 if file_ext == '.pdf':
                     actual_pdf_folder = os.path.dirname(self.pdf_folder)
                 # 如果是支持的压缩格式
-                elif file_ext in archive_extensions:
+                elif file_ext in self.ARCHIVE_EXTENSIONS:
                     archive_type = file_ext[1:].upper()  # 去掉点，转换为大写
                     self.log_queue.put(f"检测到{archive_type}压缩包: {self.pdf_folder}\n")
                     self.log_queue.put("正在解压缩...\n")
@@ -607,11 +3033,12 @@ class PDFExcelTool:
                 self.complete_processing()
                 return
 
-            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件\n")
+            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件{self.discovery_stats}\n")
 
             # 打开Excel文件（使用xlwings）
             try:
                 self.log_queue.put(f"打开Excel文件: {self.excel_path}\n")
+                import xlwings as xw
                 self.excel_app = xw.App(visible=False)  # 隐藏Excel窗口
                 self.excel_book = self.excel_app.books.open(self.excel_path)
 
@@ -623,19 +3050,14 @@ class PDFExcelTool:
                     f"检测到表头行({self.header_row})和备注行({self.note_start_row})之间可用行数: {available_rows}\n")
                 self.log_queue.put(f"需要处理的PDF文件数: {self.total_pdfs}\n")
 
-                # 如果可用行数不足，插入新行
-                if available_rows < self.total_pdfs:
-                    need_rows = self.total_pdfs - available_rows
-                    self.log_queue.put(f"可用行数不足，需要插入 {need_rows} 行\n")
+                # 行数不足时的插行由填入过程的行布局规划统一处理（一次性插入）
 
-                    # 在表头行之后插入新行
-                    insert_position = self.header_row + 2  # 在表头行后插入
-                    sheet.api.Rows(f"{insert_position}:{insert_position + need_rows - 1}").Insert()
-                    self.log_queue.put(f"已在第{insert_position}行位置插入 {need_rows} 行\n")
-
-                    # 更新备注行的位置
-                    self.note_start_row += need_rows
-                    self.log_queue.put(f"备注行已更新到第 {self.note_start_row} 行\n")
+                # 按表头标签解析列映射（与比对模式共用同一解析逻辑）
+                header_last_col = sheet.used_range.last_cell.column
+                header_rows = sheet.range((max(1, self.header_row - 1), 1),
+                                          (self.header_row, header_last_col)).options(ndim=2).value
+                self.column_map = self.resolve_column_mapping(header_rows)
+                self.log_queue.put(f"列映射: {self.format_column_map(self.column_map)}\n")
 
             except Exception as e:
                 error_msg = f"打开Excel文件失败: {str(e)}\n"
@@ -648,6 +3070,7 @@ class PDFExcelTool:
                 return
 
             # 处理文件
+            self.open_run_journal("fill", actual_pdf_folder)
             self.log_queue.put(f"开始处理 {self.total_pdfs} 个PDF文件...\n")
             results = self.process_files_for_filling(
                 self.excel_path,
@@ -658,11 +3081,13 @@ class PDFExcelTool:
                 self.excel_book,
                 self.header_row,
                 self.note_start_row,
-                self.name_col,
-                self.spec_col,
-                self.desc_col,
-                self.version_col,
-                self.title_col  # 新增：传递TITLE列参数
+                self.column_map["物料名称"],
+                self.column_map["物料规格"],
+                self.column_map["描述"],
+                self.column_map["版本"],
+                self.column_map["title"],  # 新增：传递TITLE列参数
+                self.fill_order,
+                self.fill_mode
             )
 
             # 保存Excel文件到excel文件夹
@@ -691,15 +3116,21 @@ class PDFExcelTool:
             # 保存文件的路径
             report_file = os.path.join('log', f"处理报告_{time.strftime('%Y%m%d_%H%M%S')}.txt")
             self.report_path = self.generate_filling_report(results, report_file)
+            self.finish_run_journal()
 
             # 显示完成消息
             complete_msg = "\n" + "=" * 70 + "\n"
-            complete_msg += f"处理完成！已处理 {len(results)} 个PDF文件。\n"
+            complete_msg += f"处理完成！已处理 {self.total_pdfs} 个PDF文件。\n"
 
             # 统计多页PDF数量
-            multi_page_count = sum(1 for result in results if result['page_count'] > 1)
+            multi_page_count = len({result['pdf_path'] for result in results if result['page_count'] > 1})
+            multi_page_msg = ""
             if multi_page_count > 0:
-                complete_msg += f"发现 {multi_page_count} 个多页PDF文件，需要进一步查看。\n"
+                if self.page_mode == "first":
+                    multi_page_msg = f"发现 {multi_page_count} 个多页PDF文件，需要进一步查看。\n"
+                else:
+                    multi_page_msg = f"发现 {multi_page_count} 个多页PDF文件，已逐页提取，共 {len(results)} 条图纸记录。\n"
+            complete_msg += multi_page_msg
 
             complete_msg += f"报告已保存到: {self.report_path}\n"
             self.log_queue.put(complete_msg)
@@ -711,8 +3142,8 @@ class PDFExcelTool:
             # 弹出完成消息
             self.root.after(0, lambda: messagebox.showinfo(
                 "处理完成",
-                f"处理完成！已处理 {len(results)} 个PDF文件。\n\n" +
-                (f"发现 {multi_page_count} 个多页PDF文件，需要进一步查看。\n" if multi_page_count > 0 else "") +
+                f"处理完成！已处理 {self.total_pdfs} 个PDF文件。\n\n" +
+                multi_page_msg +
                 f"报告已保存到:\n{self.report_path}"
             ))
 
@@ -736,6 +3167,9 @@ class PDFExcelTool:
                 except Exception as e:
                     self.log_queue.put(f"退出Excel应用时出错: {str(e)}\n")
 
+            # 关闭运行记录（未完成时保留，下次运行同一任务时继续）
+            self.close_run_journal()
+
             # 清理临时目录（如果是解压的）
             if self.temp_dir and os.path.exists(self.temp_dir):
                 try:
@@ -762,9 +3196,6 @@ class PDFExcelTool:
             is_archive = False
             archive_type = ""
 
-            # 支持的压缩文件扩展名
-            archive_extensions = ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2']
-
             # 检查是否是压缩文件
             if os.path.isfile(self.pdf_folder):
                 file_ext = os.path.splitext(self.pdf_folder)[1].lower()
@@ -773,7 +3204,7 @@ class PDFExcelTool:
                 if file_ext == '.pdf':
                     actual_pdf_folder = os.path.dirname(self.pdf_folder)
                 # 如果是支持的压缩格式
-                elif file_ext in archive_extensions:
+                elif file_ext in self.ARCHIVE_EXTENSIONS:
                     archive_type = file_ext[1:].upper()  # 去掉点，转换为大写
                     self.log_queue.put(f"检测到{archive_type}压缩包: {self.pdf_folder}\n")
                     self.log_queue.put("正在解压缩...\n")
@@ -832,11 +3263,13 @@ class PDFExcelTool:
                 self.complete_processing()
                 return
 
-            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件\n")
+            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件{self.discovery_stats}\n")
 
             # 提取Excel数据
             self.log_queue.put("读取Excel数据...\n")
             excel_data = self.extract_excel_data(self.excel_path)
+            if self.column_map:
+                self.log_queue.put(f"列映射: {self.format_column_map(self.column_map)}\n")
             if excel_data.empty:
                 self.log_queue.put("错误: 未找到有效的Excel数据\n")
                 self.root.after(0, lambda: messagebox.showerror(
@@ -851,6 +3284,7 @@ class PDFExcelTool:
             excel_index = self.build_excel_index(excel_data)
 
             # 处理文件
+            self.open_run_journal("compare", actual_pdf_folder)
             self.log_queue.put(f"开始处理 {self.total_pdfs} 个PDF文件...\n")
             errors = self.process_files_for_comparison(
                 self.excel_path,
@@ -869,6 +3303,7 @@ class PDFExcelTool:
             # 保存文件的路径
             report_file = os.path.join('log', f"比对报告_{time.strftime('%Y%m%d_%H%M%S')}.txt")
             self.report_path = self.generate_comparison_report(errors, report_file)
+            self.finish_run_journal()
 
             # 显示完成消息
             complete_msg = "\n" + "=" * 70 + "\n"
@@ -907,6 +3342,9 @@ class PDFExcelTool:
                 f"处理过程中发生错误:\n{str(e)}"
             ))
         finally:
+            # 关闭运行记录（未完成时保留，下次运行同一任务时继续）
+            self.close_run_journal()
+
             # 清理临时目录（如果是解压的）
             if self.temp_dir and os.path.exists(self.temp_dir):
                 try:
@@ -916,23 +3354,155 @@ class PDFExcelTool:
                     self.log_queue.put(f"清理临时目录失败: {str(e)}\n")
                 self.temp_dir = None
 
-            # 更新状态
-            self.complete_processing()
+            # 更新状态
+            self.complete_processing()
+
+    def find_pdf_files(self, folder_path):
+        """递归查找文件夹中的所有PDF文件（含文件头识别出的PDF和嵌套压缩包中的PDF）"""
+        self._pdf_stats = {}
+        self._pdf_digests = {}
+        self.discovery_stats = ""
+        self.nested_archive_dirs = {}
+
+        # 如果是单个PDF文件
+        if os.path.isfile(folder_path) and folder_path.lower().endswith('.pdf'):
+            return [folder_path]
+
+        # 并行遍历，边遍历边收集（同时记录大小和修改时间，后续调度和去重不再重复stat）。
+        # 提取要等遍历结束才开始：LPT调度要按耗时对全部文件排序，重复文件检测要按大小分组，
+        # 报告顺序和进度总数也需要完整列表；遍历只做scandir和少量文件头读取，相对提取耗时很短
+        pdf_files = []
+        for pdf_path, size, mtime in self.iter_pdf_files(folder_path):
+            self._pdf_stats[pdf_path] = (size, mtime)
+            pdf_files.append(pdf_path)
+
+        # 并行遍历的产出顺序不固定，按路径排序保证每次处理顺序一致
+        return sorted(pdf_files, key=os.path.normcase)
+
+    def iter_pdf_files(self, folder_path, expand_archives=True):
+        """并行遍历文件夹（os.scandir，每个子目录一个任务），边遍历边产出 (PDF路径, 大小, 修改时间)。
+        .pdf后缀直接接受，可疑文件名（如 .PDF.bak）读取文件头 %PDF- 确认；嵌套的压缩包解压后继续遍历
+        （expand_archives为False时跳过压缩包）"""
+        found = queue.Queue()
+        pending = [0]
+        counts = {"sniffed": 0, "archives": 0}
+        lock = threading.Lock()
+        executor = ThreadPoolExecutor(max_workers=self.discovery_workers)
+
+        def submit(func, *args):
+            with lock:
+                pending[0] += 1
+            executor.submit(run, func, *args)
+
+        def run(func, *args):
+            try:
+                func(*args)
+            except Exception as e:
+                self.log_queue.put(f"遍历文件夹时出错: {str(e)}\n")
+            finally:
+                with lock:
+                    pending[0] -= 1
+                    if pending[0] == 0:
+                        found.put(None)  # 所有目录和嵌套压缩包都已遍历完
+
+        def scan_dir(directory, depth):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                self.log_queue.put(f"无法访问目录 {directory}: {str(e)}\n")
+                return
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.is_nested_archive_dir(entry):
+                            submit(scan_dir, entry.path, depth)
+                    elif entry.is_file():
+                        check_file(entry, depth)
+                except OSError:
+                    continue  # 遍历过程中被删除或无权限的文件
+
+        def check_file(entry, depth):
+            name = entry.name.lower()
+            ext = os.path.splitext(name)[1]
+            if ext in self.ARCHIVE_EXTENSIONS:
+                if not expand_archives:
+                    return
+                if depth >= self.MAX_ARCHIVE_DEPTH:
+                    self.log_queue.put(f"压缩包嵌套超过 {self.MAX_ARCHIVE_DEPTH} 层，跳过: {entry.path}\n")
+                else:
+                    submit(extract_nested, entry.path, depth + 1)
+                return
+            if ext != '.pdf':
+                if not (self.should_sniff_pdf(name, ext) and self.is_pdf_content(entry.path)):
+                    return
+                with lock:
+                    counts["sniffed"] += 1
+            stat = entry.stat()
+            found.put((entry.path, stat.st_size, stat.st_mtime))
+
+        def extract_nested(archive_path, depth):
+            extract_dir = tempfile.mkdtemp(prefix=self.NESTED_ARCHIVE_PREFIX, dir=self.get_temp_dir())
+            with lock:
+                self.nested_archive_dirs[extract_dir] = archive_path
+            self.log_queue.put(f"解压嵌套压缩包: {archive_path}\n")
+            if self.extract_archive(archive_path, extract_dir):
+                with lock:
+                    counts["archives"] += 1
+                scan_dir(extract_dir, depth)
+
+        submit(scan_dir, folder_path, 0)
+        try:
+            while True:
+                item = found.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            stats = []
+            if counts["sniffed"]:
+                stats.append(f"按文件头识别 {counts['sniffed']} 个非.pdf后缀的PDF")
+            if counts["archives"]:
+                stats.append(f"解压 {counts['archives']} 个嵌套压缩包")
+            self.discovery_stats = f" ({', '.join(stats)})" if stats else ""
+
+    def should_sniff_pdf(self, name, ext):
+        """非.pdf后缀的文件是否需要读取文件头确认（auto方式只检查可疑文件名，避免在网络共享上逐个打开文件）"""
+        if self.sniff_mode == "off":
+            return False
+        if self.sniff_mode == "all":
+            return True
+        return '.pdf' in name or ext in self.SNIFF_EXTENSIONS
+
+    def is_pdf_candidate(self, file_path):
+        """单个文件是否按PDF处理（.pdf后缀，或可疑文件名且文件头为 %PDF-）"""
+        name = os.path.basename(file_path).lower()
+        ext = os.path.splitext(name)[1]
+        if ext == '.pdf':
+            return True
+        return (ext not in self.ARCHIVE_EXTENSIONS and self.should_sniff_pdf(name, ext)
+                and self.is_pdf_content(file_path))
 
-    def find_pdf_files(self, folder_path):
-        """递归查找文件夹中的所有PDF文件"""
-        pdf_files = []
+    def is_pdf_content(self, file_path):
+        """文件头前1024字节内包含 %PDF- 即视为PDF"""
+        try:
+            with open(file_path, 'rb') as f:
+                return b'%PDF-' in f.read(1024)
+        except OSError:
+            return False
 
-        # 如果是单个PDF文件
-        if os.path.isfile(folder_path) and folder_path.lower().endswith('.pdf'):
-            return [folder_path]
+    def get_temp_dir(self):
+        """本次处理的临时目录（没有时创建，处理结束后统一清理）"""
+        with self._temp_dir_lock:
+            if not self.temp_dir or not os.path.exists(self.temp_dir):
+                self.temp_dir = tempfile.mkdtemp()
+                self.log_queue.put(f"创建临时目录: {self.temp_dir}\n")
+            return self.temp_dir
 
-        # 递归搜索文件夹
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    pdf_files.append(os.path.join(root, file))
-        return pdf_files
+    def is_nested_archive_dir(self, entry):
+        """是否为嵌套压缩包的解压目录（由解压任务单独遍历，避免重复）"""
+        return (entry.name.startswith(self.NESTED_ARCHIVE_PREFIX) and self.temp_dir
+                and os.path.dirname(entry.path) == self.temp_dir)
 
     def complete_processing(self):
         """完成处理后的清理工作"""
@@ -964,6 +3534,9 @@ class PDFExcelTool:
 
     def cleanup_on_exit(self):
         """程序退出时清理临时文件"""
+        # 关闭页面线程池和OCR线程池
+        self.shutdown_executors()
+
         # 关闭Excel
         if hasattr(self, 'excel_book') and self.excel_book:
             try:
@@ -976,14 +3549,6 @@ class PDFExcelTool:
             except:
                 pass
 
-        # 清理7z工具的临时目录
-        if hasattr(self, '_7z_dir') and self._7z_dir and os.path.exists(self._7z_dir):
-            try:
-                shutil.rmtree(self._7z_dir)
-                print(f"已清理7z工具临时目录: {self._7z_dir}")
-            except Exception as e:
-                print(f"清理7z工具临时目录失败: {str(e)}")
-
         # 清理可能残留的PDF解压临时目录
         if hasattr(self, 'temp_dir') and self.temp_dir and os.path.exists(self.temp_dir):
             try:
@@ -1005,218 +3570,67 @@ class PDFExcelTool:
         # 关闭窗口
         self.root.destroy()
 
-    # ======================== 填充功能函数 ========================
-
-    def extract_pdf_title_block(self, pdf_path):
-        """从PDF文件中提取标题块信息，优化加工字段提取逻辑（保留中英文）"""
-        import pdfplumber
-        import re
+    # ======================== 列映射函数 ========================
+
+    def column_config_signature(self):
+        """列配置签名（别名、强制列号、回退列号），用于缓存键"""
+        fallback = {field: getattr(self, key) for field, key in self.COLUMN_CONFIG_KEYS.items()}
+        signature = repr((self.COLUMN_ALIASES, sorted(self.column_overrides.items()), sorted(fallback.items())))
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()[:12]
+
+    def resolve_column_mapping(self, header_rows):
+        """根据表头标签解析列映射（填入和比对共用），返回 {字段: 列号(从1开始)}"""
+        # 合并多行表头（如中文表头+英文表头）为每列一个标签
+        width = max((len(row) for row in header_rows), default=0)
+        labels = []
+        for col in range(width):
+            parts = [self.normalize_cell_value(row[col]) for row in header_rows if col < len(row)]
+            labels.append(re.sub(r'\s+', '', "".join(parts)).lower())
+
+        # 按模板指纹缓存，相同模板的工作簿不再重复解析表头
+        fingerprint = hashlib.sha1(repr((labels, self.column_config_signature())).encode("utf-8")).hexdigest()
+        if fingerprint in self._column_map_cache:
+            return dict(self._column_map_cache[fingerprint])
+
+        # 1. 配置中强制指定的列号优先
+        mapping = dict(self.column_overrides)
+        used_cols = set(mapping.values())
+
+        # 2. 按表头标签匹配
+        for field, aliases in self.COLUMN_ALIASES:
+            if field in mapping:
+                continue
+            for alias in aliases:
+                alias = re.sub(r'\s+', '', alias).lower()
+                # 短英文别名（如 rev）按整词匹配，避免 review/preview 等表头误占列；较长的标签仍按子串匹配
+                if alias.isascii() and len(alias) <= 3:
+                    pattern = re.compile(rf'(?<![a-z]){re.escape(alias)}(?![a-z])')
+                    col = next((idx for idx, label in enumerate(labels, 1)
+                                if idx not in used_cols and pattern.search(label)), None)
+                else:
+                    col = next((idx for idx, label in enumerate(labels, 1)
+                                if idx not in used_cols and alias in label), None)
+                if col:
+                    mapping[field] = col
+                    used_cols.add(col)
+                    break
 
-        title_data = {
-            "名称": "", "图号": "", "加工": "", "材料": "", "颜色": "", "表面处理": "", "版本": "", "title": "",
-            "页数": 0
-        }
+        # 3. 未识别的字段回退到[EXCEL]中配置的列号
+        for field, key in self.COLUMN_CONFIG_KEYS.items():
+            mapping.setdefault(field, getattr(self, key))
 
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                title_data["页数"] = len(pdf.pages)
-                if len(pdf.pages) == 0:
-                    return title_data
-
-                first_page = pdf.pages[0]
-                width = first_page.width
-                height = first_page.height
-                bbox = (width * 0.3, height * 0.6, width, height)
-                cropped_page = first_page.crop(bbox)
-                tables = cropped_page.extract_tables()
-                extracted_text = cropped_page.extract_text() or ""
-
-                # 单元格合并函数（保持不变）
-                def merge_split_cells(table):
-                    merged_table = []
-                    for row in table:
-                        merged_row = []
-                        i = 0
-                        while i < len(row):
-                            cell = str(row[i]).strip()
-                            if i + 1 < len(row) and re.match(r'^[a-zA-Z]+\d+$', cell) and re.match(r'^t=[\d.]+$', str(
-                                    row[i + 1]).strip()):
-                                merged_cell = f"{cell} {str(row[i + 1]).strip()}"
-                                merged_row.append(merged_cell)
-                                i += 2
-                            else:
-                                merged_row.append(cell)
-                                i += 1
-                        merged_table.append(merged_row)
-                    return merged_table
-
-                # 表格搜索函数（保持不变）
-                def find_in_grid(keywords, search_range=5, ignore_values=[]):
-                    matches = []
-                    for r, row in enumerate(table_grid):
-                        for c, cell in enumerate(row):
-                            clean_cell = re.sub(r'\s+', '', cell).lower()
-                            for keyword in keywords:
-                                if re.sub(r'\s+', '', keyword).lower() in clean_cell:
-                                    for i in range(1, search_range + 1):
-                                        if c + i < len(row):
-                                            value = row[c + i].strip()
-                                            if value and value.lower() not in [v.lower() for v in ignore_values]:
-                                                matches.append((value, r))
-                    if matches:
-                        matches.sort(key=lambda x: x[1], reverse=True)
-                        return matches[0][0]
-                    return ""
-
-                # 处理表格（保持不变）
-                table_grid = []
-                if tables:
-                    merged_tables = [merge_split_cells(table) for table in tables]
-                    for table in merged_tables:
-                        for row in table:
-                            clean_row = [str(cell).strip() if cell is not None else "" for cell in row]
-                            table_grid.append(clean_row)
-
-                # 其他字段提取（保持不变）
-                ignore_list = ["none", "无", "空白", "/", ""]
-                title_data["名称"] = find_in_grid(["名称", "name"], ignore_values=ignore_list)
-                title_data["图号"] = find_in_grid(["图号", "图名", "drawing", "DWG NO."], ignore_values=ignore_list)
-                title_data["材料"] = find_in_grid(["材料", "material"], ignore_values=ignore_list)
-                title_data["颜色"] = find_in_grid(["颜色", "color"], ignore_values=ignore_list)
-                title_data["表面处理"] = find_in_grid(["表面处理", "表面", "surface", "SURFACE\nFINISHING"],
-                                                      ignore_values=ignore_list)
-
-                # -------------------------- 优化加工字段提取（保留中英文） --------------------------
-                # 1. 提取原始加工信息
-                processing_raw = find_in_grid(
-                    ["加工", "processing", "processes", "MANUFACTUIING\nPROCESSES"],
-                    ignore_values=ignore_list
-                )
-
-                # 2. 清洗逻辑：保留所有有效内容（中英文），只去除末尾无意义后缀
-                if processing_raw:
-                    # 定义需要去除的末尾无意义词汇（可扩展）
-                    suffix_to_remove = r'(中|中文|了|的|等|完毕|完成|结束)$'
-
-                    # 先去除首尾空格
-                    processed = processing_raw.strip()
-
-                    # 循环去除末尾的无意义后缀（可能有多个）
-                    while re.search(suffix_to_remove, processed):
-                        processed = re.sub(suffix_to_remove, '', processed).strip()
-
-                    title_data["加工"] = processed
-                else:
-                    title_data["加工"] = ""
-                # ------------------------------------------------------------------
-
-                # 版本提取（保持之前的优化逻辑）
-                # 关键修改：find_in_grid增加search_range=6
-                version_raw = find_in_grid(
-                    ["版本", "版 本", "version", "rev"],
-                    ignore_values=ignore_list,
-                    search_range=6  # 扩大搜索范围，覆盖更多拆分场景
-                )
-
-                # 2. 正则匹配：支持小数点前后空格，容错性更强
-                # 优化后正则：允许V/Rev后有空格、小数点前后有空格（如V0 .1 → 匹配后清理为V0.1）
-                version_pattern = r'(V|Rev|rev)\.?\s*(\d+(?:\s*\.\s*\d+)*)([a-zA-Z]*)'
-                version_match = re.search(version_pattern, version_raw, re.IGNORECASE)
-
-                table_extracted = ""  # 存储表格提取的版本号
-                if version_match:
-                    prefix = version_match.group(1).strip()
-                    number_part = version_match.group(2).strip()
-                    suffix = version_match.group(3).strip()
-
-                    # 清理数字部分的空格（如“0 .1”→“0.1”，“0. 1”→“0.1”）
-                    number_part = re.sub(r'\s*\.\s*', '.', number_part)
-                    # 清理SIZE关键词（保留原有逻辑）
-                    if 'SIZE' in suffix.upper():
-                        size_pos = suffix.upper().find('SIZE')
-                        suffix = suffix[:size_pos]
-                    table_extracted = f"{prefix}{number_part}{suffix}"
-
-                # 3. 二次校验：若表格提取结果是“短版本号”（如V0、Rev1），强制用文本提取补充
-                text_extracted = ""  # 存储文本提取的版本号
-                if extracted_text:  # extracted_text是页面的完整文本
-                    # 文本提取正则：同样支持空格容错
-                    text_version_pattern = r'(?:版\s*本|Version|rev)[:：]?\s*(V|Rev|rev)\.?\s*(\d+(?:\s*\.\s*\d+)*)'
-                    text_match = re.search(text_version_pattern, extracted_text, re.IGNORECASE)
-                    if text_match:
-                        text_prefix = text_match.group(1).strip()
-                        text_number = text_match.group(2).strip()
-                        text_number = re.sub(r'\s*\.\s*', '.', text_number)  # 清理空格
-                        text_extracted = f"{text_prefix}{text_number}"
-
-                # 4. 选择最优结果：优先用“完整版本号”（如V0.1），避免短版本号
-                final_version = ""
-                # 规则：若表格提取不完整（长度≤2，如V0、Rev1），且文本提取更完整，则用文本提取结果
-                if len(table_extracted) <= 2 and len(text_extracted) > 2:
-                    final_version = text_extracted
-                    # self.log_queue.put(f"版本号过短，使用文本提取结果: {final_version}\n")
-                else:
-                    final_version = table_extracted
-
-                title_data["版本"] = final_version
-
-                # TITLE提取及其他处理（保持不变）
-                title_data["title"] = find_in_grid(
-                    ["title","TITLE"],
-                    ignore_values=ignore_list
-                )
-                # 无效值处理（保持不变）
-                surface_treatment = title_data["表面处理"].strip().lower()
-                invalid_surface_values = {"none", "无", "空白", "/", ""}
-                if all(part.strip().lower() in invalid_surface_values for part in re.split(r'\s+', surface_treatment)):
-                    title_data["表面处理"] = ""
-                title_value = title_data["title"].strip().lower()
-                invalid_title_values = {"none", "无", "空白", "/", ""}
-                if all(part.strip().lower() in invalid_title_values for part in re.split(r'\s+', title_value)):
-                    title_data["title"] = ""
-
-                # 文本提取补充（同步优化加工字段）
-                if extracted_text:
-                    patterns = {
-                        "名称": r"(?:名\s*称|Name)[:：]?\s*(\S+)",
-                        "图号": r"(?:图\s*号|图\s*名|Drawing|DWG NO.)[:：]?\s*(\S+)",
-                        # 加工字段文本提取模式调整
-                        "加工": r"(?:加\s*工|Processing)[:：]?\s*(.*?)[\s:，;。]",
-                        "材料": r"(?:材\s*料|Material)[:：]?\s*(\S+)",
-                        "颜色": r"(?:颜\s*色|Color)[:：]?\s*(\S+)",
-                        "表面处理": r"(?:表\s*面\s*处\s*理|Surface)[:：]?\s*(\S+)",
-                        "版本": r"(?:版\s*本|Version|rev)[:：]?\s*(V|Rev|rev)\.?\s*(\d+(?:\.\d+)*)([a-zA-Z]*)",
-                        "title": r"(?:title|TITLE)[:：]?\s*(\S+)"
-                    }
-
-                    # 处理加工字段的文本提取结果
-                    if not title_data["加工"].strip() and "加工" in patterns:
-                        match = re.search(patterns["加工"], extracted_text, re.IGNORECASE)
-                        if match:
-                            processing_text = match.group(1).strip()
-                            # 应用相同的清洗逻辑
-                            suffix_to_remove = r'(中|了|的|等|完毕|完成|结束)$'
-                            while re.search(suffix_to_remove, processing_text):
-                                processing_text = re.sub(suffix_to_remove, '', processing_text).strip()
-                            title_data["加工"] = processing_text
-
-                    # 其他字段处理（保持不变）
-                    for key, pattern in patterns.items():
-                        if key in ["表面处理", "版本", "加工"]:
-                            continue
-                        if key == "title" and not title_data[key].strip():
-                            continue
-                        if not title_data[key].strip():
-                            match = re.search(pattern, extracted_text, re.IGNORECASE)
-                            if match:
-                                title_data[key] = match.group(1).strip()
+        self._column_map_cache[fingerprint] = mapping
+        return dict(mapping)
 
-        except Exception as e:
-            print(f"提取PDF {os.path.basename(pdf_path)} 时出错: {str(e)}")
+    def format_column_map(self, column_map):
+        """格式化列映射用于日志显示"""
+        labels = {"物料名称": "名称", "物料规格": "规格", "描述": "描述", "版本": "版本", "title": "TITLE"}
+        return ", ".join(f"{labels[field]}={column_map[field]}" for field in self.COLUMN_CONFIG_KEYS
+                         if field in column_map)
 
-        return title_data
+    # ======================== 填充功能函数 ========================
 
-    def extract_excel_data_for_filling(self, excel_book, header_row, data_start_row, log_queue):
+    def extract_excel_data_for_filling(self, excel_book, header_row, data_start_row, log_queue, column_map=None):
         """从Excel文件中提取数据，确保不修改表头行之前的内容"""
         # 使用xlwings处理Excel
         try:
@@ -1236,25 +3650,29 @@ class PDFExcelTool:
 
             log_queue.put(f"检测到数据范围: 第 {data_start_row} 行至第 {end_row} 行\n")
 
+            # 未传入列映射时使用配置的列号
+            if not column_map:
+                column_map = {field: getattr(self, key) for field, key in self.COLUMN_CONFIG_KEYS.items()}
+
             # 创建结果列表
             result = []
 
             # 读取数据
             for row in range(data_start_row, end_row + 1):
-                # 物料名称 -> 配置的列
-                name = str(sheet.range((row, self.name_col)).value or "").strip()
+                # 物料名称 -> 映射的列
+                name = str(sheet.range((row, column_map["物料名称"])).value or "").strip()
 
-                # 物料规格 -> 配置的列
-                spec = str(sheet.range((row, self.spec_col)).value or "").strip()
+                # 物料规格 -> 映射的列
+                spec = str(sheet.range((row, column_map["物料规格"])).value or "").strip()
 
-                # 描述 -> 配置的列
-                desc = str(sheet.range((row, self.desc_col)).value or "").strip()
+                # 描述 -> 映射的列
+                desc = str(sheet.range((row, column_map["描述"])).value or "").strip()
 
-                # 版本 -> 配置的列
-                version = str(sheet.range((row, self.version_col)).value or "").strip()
+                # 版本 -> 映射的列
+                version = str(sheet.range((row, column_map["版本"])).value or "").strip()
 
                 # 新增：读取TITLE列数据
-                title = str(sheet.range((row, self.title_col)).value or "").strip()
+                title = str(sheet.range((row, column_map["title"])).value or "").strip()
 
                 result.append({
                     "物料名称": name,
@@ -1274,13 +3692,13 @@ class PDFExcelTool:
     def build_pdf_description(self, pdf_data):
         """构建PDF的描述字符串"""
         # 当表面处理为"无"、空白或"/"时，忽略表面处理
-        include_surface = pdf_data["表面处理"] not in ["无", "空白", "/", ""]
+        include_surface = pdf_data.surface not in ["无", "空白", "/", ""]
 
         pdf_desc_parts = [
-            pdf_data["加工"],
-            pdf_data["材料"],
-            pdf_data["颜色"],
-            pdf_data["表面处理"] if include_surface else ""
+            pdf_data.processing,
+            pdf_data.material,
+            pdf_data.color,
+            pdf_data.surface if include_surface else ""
         ]
 
         # 过滤空值并连接
@@ -1290,6 +3708,44 @@ class PDFExcelTool:
         pdf_desc = re.sub(r'\s*,\s*', ',', pdf_desc).strip()
         return pdf_desc
 
+    def convert_fill_punctuation(self, value):
+        """将填入值中的半角标点转换为全角"""
+        # 定义半角转全角的标点映射
+        punctuation_map = {
+            ',': '，',
+            # '.': '。',
+            # ';': '；',
+            # ':': '：',
+            # '?': '？',
+            # '!': '！',
+            # '(': '（',
+            # ')': '）',
+            # '[': '［',
+            # ']': '］',
+            # '{': '｛',
+            # '}': '｝',
+            # '<': '＜',
+            # '>': '＞',
+            # '"': '“',
+            # "'": '‘',
+            # '-': '－',
+            # '_': '＿',
+            # '*': '＊',
+            # '&': '＆',
+            # '%': '％',
+            # '$': '＄',
+            # '#': '＃',
+            # '@': '＠',
+            # '^': '＾',
+            # '`': '｀'
+        }
+
+        # 如果值是字符串，进行标点转换
+        if isinstance(value, str):
+            for half, full in punctuation_map.items():
+                value = value.replace(half, full)
+        return value
+
     def fill_excel_with_pdf_data(self, excel_book, pdf_data, row_idx, name_col, spec_col, desc_col, version_col,
                                  title_col, note_start_row, log_queue):
         """将PDF数据填充到Excel的指定行，设置字体为宋体12号，新增填充TITLE列的功能"""
@@ -1305,20 +3761,7 @@ class PDFExcelTool:
             log_queue.put(
                 f"使用列索引: 名称={name_col}, 规格={spec_col}, 描述={desc_col}, 版本={version_col}, TITLE={title_col}\n")
 
-            # 检查行是否存在，如果不存在，插入新行
-            last_row = sheet.used_range.last_cell.row
-            if row_idx > last_row:
-                # 需要插入新行，按照Excel中选中表头行+1插入新行的方式
-                reference_row = self.header_row + 1  # 表头行+1作为参考行
-
-                log_queue.put(f"插入新行 {row_idx}，使用第 {reference_row} 行的格式\n")
-
-                # 插入新行
-                sheet.api.Rows(f"{row_idx}:{row_idx}").Insert()
-
-                # 复制参考行的格式到新行
-                sheet.range((reference_row, 1), (reference_row, sheet.used_range.last_cell.column)).copy()
-                sheet.range((row_idx, 1)).paste(paste="formats")
+            # 目标行由行布局规划预先分配（见plan_fill_layout），这里不再逐行插入
 
             # 填充数据并设置字体为宋体12号
             updated = False
@@ -1326,40 +3769,7 @@ class PDFExcelTool:
             # 设置字体格式的辅助函数
             def set_cell_value_with_font(row, col, value):
                 """设置单元格值并应用字体格式，同时将半角标点转换为全角"""
-                # 定义半角转全角的标点映射
-                punctuation_map = {
-                    ',': '，',
-                    # '.': '。',
-                    # ';': '；',
-                    # ':': '：',
-                    # '?': '？',
-                    # '!': '！',
-                    # '(': '（',
-                    # ')': '）',
-                    # '[': '［',
-                    # ']': '］',
-                    # '{': '｛',
-                    # '}': '｝',
-                    # '<': '＜',
-                    # '>': '＞',
-                    # '"': '“',
-                    # "'": '‘',
-                    # '-': '－',
-                    # '_': '＿',
-                    # '*': '＊',
-                    # '&': '＆',
-                    # '%': '％',
-                    # '$': '＄',
-                    # '#': '＃',
-                    # '@': '＠',
-                    # '^': '＾',
-                    # '`': '｀'
-                }
-
-                # 如果值是字符串，进行标点转换
-                if isinstance(value, str):
-                    for half, full in punctuation_map.items():
-                        value = value.replace(half, full)
+                value = self.convert_fill_punctuation(value)
 
                 cell = sheet.range((row, col))
                 cell.value = value
@@ -1368,20 +3778,20 @@ class PDFExcelTool:
                 cell.api.Font.Size = 12
 
             # 检查并填充名称
-            if pdf_data["名称"]:
+            if pdf_data.name:
                 try:
-                    set_cell_value_with_font(row_idx, name_col, pdf_data["名称"])
+                    set_cell_value_with_font(row_idx, name_col, pdf_data.name)
                     updated = True
-                    log_queue.put(f"已填充名称: {pdf_data['名称']} 到第 {row_idx} 行, 第 {name_col} 列\n")
+                    log_queue.put(f"已填充名称: {pdf_data.name} 到第 {row_idx} 行, 第 {name_col} 列\n")
                 except Exception as e:
                     log_queue.put(f"填充名称时出错: {str(e)}\n")
 
             # 检查并填充图号
-            if pdf_data["图号"]:
+            if pdf_data.drawing_no:
                 try:
-                    set_cell_value_with_font(row_idx, spec_col, pdf_data["图号"])
+                    set_cell_value_with_font(row_idx, spec_col, pdf_data.drawing_no)
                     updated = True
-                    log_queue.put(f"已填充图号: {pdf_data['图号']} 到第 {row_idx} 行, 第 {spec_col} 列\n")
+                    log_queue.put(f"已填充图号: {pdf_data.drawing_no} 到第 {row_idx} 行, 第 {spec_col} 列\n")
                 except Exception as e:
                     log_queue.put(f"填充图号时出错: {str(e)}\n")
 
@@ -1396,20 +3806,20 @@ class PDFExcelTool:
                     log_queue.put(f"填充描述时出错: {str(e)}\n")
 
             # 检查并填充版本
-            if pdf_data["版本"]:
+            if pdf_data.version:
                 try:
-                    set_cell_value_with_font(row_idx, version_col, pdf_data["版本"])
+                    set_cell_value_with_font(row_idx, version_col, pdf_data.version)
                     updated = True
-                    log_queue.put(f"已填充版本: {pdf_data['版本']} 到第 {row_idx} 行, 第 {version_col} 列\n")
+                    log_queue.put(f"已填充版本: {pdf_data.version} 到第 {row_idx} 行, 第 {version_col} 列\n")
                 except Exception as e:
                     log_queue.put(f"填充版本时出错: {str(e)}\n")
 
             # 新增：检查并填充TITLE
-            if pdf_data["title"]:
+            if pdf_data.title:
                 try:
-                    set_cell_value_with_font(row_idx, title_col, pdf_data["title"])
+                    set_cell_value_with_font(row_idx, title_col, pdf_data.title)
                     updated = True
-                    log_queue.put(f"已填充TITLE: {pdf_data['title']} 到第 {row_idx} 行, 第 {title_col} 列\n")
+                    log_queue.put(f"已填充TITLE: {pdf_data.title} 到第 {row_idx} 行, 第 {title_col} 列\n")
                 except Exception as e:
                     log_queue.put(f"填充TITLE时出错: {str(e)}\n")
 
@@ -1418,109 +3828,897 @@ class PDFExcelTool:
             log_queue.put(f"填充Excel时出错: {str(e)}\n")
             return False
 
-    def process_pdf_file_for_filling(self, pdf_path, result_queue):
-        """处理单个PDF文件（线程安全）"""
+    def build_fill_values(self, pdf_data):
+        """根据PDF数据构建各字段要填入的值（只包含非空字段，已做标点转换）"""
+        values = {
+            "物料名称": pdf_data.name,
+            "物料规格": pdf_data.drawing_no,
+            "描述": self.build_pdf_description(pdf_data),
+            "版本": pdf_data.version,
+            "title": pdf_data.title,
+        }
+        return {field: self.convert_fill_punctuation(value) for field, value in values.items() if value}
+
+    def find_upsert_row(self, excel_index, pdf_data, claimed_rows):
+        """按图号/名称索引查找要更新的Excel行（哈希连接），优先选择尚未被占用的行"""
+        name = pdf_data.name.strip()
+        spec = pdf_data.drawing_no.strip()
+
+        candidates = []
+        if name and spec:
+            candidates += excel_index["by_name_spec"].get(f"{name}|{spec}", [])
+        if spec:
+            candidates += excel_index["by_spec"].get(spec, [])
+        if name:
+            candidates += excel_index["by_name"].get(name, [])
+
+        for idx, row_no in candidates:
+            if idx not in claimed_rows:
+                return idx, row_no
+        # 所有候选行都已被占用（如同一图纸重复出现），更新第一个候选行
+        return candidates[0] if candidates else (None, None)
+
+    def plan_fill_layout(self, header_row, note_start_row, row_count, first_row=None):
+        """规划填入的最终行布局：目标行、需插入的行块、备注区的新位置和格式模板行"""
+        data_start_row = header_row + 1
+        first_row = max(first_row or data_start_row, data_start_row)
+        last_row = first_row + row_count - 1
+
+        # 数据行超出备注行时，在备注行前一次性插入不足的行，备注区整体下移
+        insert_count = max(0, last_row - note_start_row + 1)
+        return {
+            "first_row": first_row,
+            "last_row": last_row,
+            "rows": list(range(first_row, last_row + 1)),
+            "insert_at": note_start_row,
+            "insert_count": insert_count,
+            "note_start_row": note_start_row + insert_count,
+            "template_row": data_start_row,  # 表头行+1作为格式参考行
+        }
+
+    def apply_fill_layout(self, sheet, plan, log_queue):
+        """执行行布局规划：一次块插入并一次性复制格式（不再逐行插入）"""
+        insert_count = plan["insert_count"]
+        available_rows = plan["insert_at"] - plan["first_row"]
+        log_queue.put(f"行布局: 需要 {len(plan['rows'])} 行，可用 {max(0, available_rows)} 行，"
+                      f"需插入 {insert_count} 行\n")
+        if insert_count == 0:
+            return
+
+        insert_at = plan["insert_at"]
+        insert_end = insert_at + insert_count - 1
+        sheet.api.Rows(f"{insert_at}:{insert_end}").Insert()
+
+        # 复制参考行的格式到整个插入块
+        template_row = plan["template_row"]
+        last_col = sheet.used_range.last_cell.column
+        sheet.range((template_row, 1), (template_row, last_col)).copy()
+        sheet.range((insert_at, 1), (insert_end, last_col)).paste(paste="formats")
+
+        log_queue.put(f"已在第{insert_at}行位置插入 {insert_count} 行（格式参考第{template_row}行），"
+                      f"备注行已更新到第 {plan['note_start_row']} 行\n")
+
+    def upsert_excel_with_pdf_data(self, excel_book, results, excel_data, column_map, header_row, note_start_row,
+                                   log_queue):
+        """更新模式：按图号/名称匹配已有行并只改写变化的单元格，未匹配的图纸一次性追加到数据区末尾"""
+        sheet = excel_book.sheets.active
+
+        # 只索引表头与备注之间的数据行
+        data_rows = [row for row in excel_data if row["原始行号"] < note_start_row]
+        excel_index = self.build_excel_index(data_rows)
+
+        claimed_rows = set()
+        unmatched = []
+        changed_cells = 0
+        updated_rows = 0
+
+        def write_cell(row, col, value):
+            cell = sheet.range((row, col))
+            cell.value = value
+            cell.api.Font.Name = "宋体"
+            cell.api.Font.Size = 12
+
+        for result in results:
+            pdf_data = result["extracted_data"]
+            if result["status"] == "错误" or not pdf_data:
+                continue
+
+            idx, row_no = self.find_upsert_row(excel_index, pdf_data, claimed_rows)
+            if idx is None:
+                unmatched.append(result)
+                continue
+
+            claimed_rows.add(idx)
+            existing = data_rows[idx]
+            changed_fields = []
+            try:
+                for field, value in self.build_fill_values(pdf_data).items():
+                    if existing.get(field, "") != str(value).strip():
+                        write_cell(row_no, column_map[field], value)
+                        changed_fields.append(field)
+            except Exception as e:
+                result["status"] = "错误"
+                result["message"] = f"更新Excel第{row_no}行失败: {str(e)}"
+                log_queue.put(f"错误: {result['message']}\n")
+                continue
+
+            if changed_fields:
+                updated_rows += 1
+                changed_cells += len(changed_fields)
+                message = f"更新第{row_no}行: {', '.join(changed_fields)}"
+            else:
+                message = f"第{row_no}行无变化"
+            result["message"] = f"{result['message']}; {message}" if result["message"] else message
+            log_queue.put(f"{result['pdf_file']}: {message}\n")
+
+        # 未匹配的图纸按 名称|图号 分组（同一图纸的多个文件只追加一行），追加到最后一个有数据的行之后
+        new_rows = {}
+        for result in unmatched:
+            pdf_data = result["extracted_data"]
+            new_rows.setdefault(f"{pdf_data.name.strip()}|{pdf_data.drawing_no.strip()}", []).append(result)
+        new_rows = list(new_rows.values())
+        if new_rows:
+            # 任一映射列有内容的行都算已占用（只有描述或版本的行也不能被覆盖）
+            occupied = [row["原始行号"] for row in data_rows if any(row.get(field) for field in column_map)]
+            plan = self.plan_fill_layout(header_row, note_start_row, len(new_rows),
+                                         first_row=max(occupied) + 1 if occupied else None)
+            append_start, append_end = plan["first_row"], plan["last_row"]
+
+            try:
+                # 空行不足时在备注行前一次性插入所需行数，并一次性复制数据行格式
+                self.apply_fill_layout(sheet, plan, log_queue)
+
+                # 按列批量写入追加的行
+                fill_values = [self.build_fill_values(group[0]["extracted_data"]) for group in new_rows]
+                for field, col in column_map.items():
+                    block = sheet.range((append_start, col), (append_end, col))
+                    block.value = [[values.get(field)] for values in fill_values]
+                    block.api.Font.Name = "宋体"
+                    block.api.Font.Size = 12
+
+                for offset, group in enumerate(new_rows):
+                    for result in group:
+                        message = f"新增第{append_start + offset}行"
+                        if result is not group[0]:
+                            message += f"（与 {group[0]['pdf_file']} 为同一图纸）"
+                        result["message"] = f"{result['message']}; {message}" if result["message"] else message
+                log_queue.put(f"已追加 {len(unmatched)} 个未匹配的图纸（{len(new_rows)} 行）到第 {append_start}-{append_end} 行\n")
+            except Exception as e:
+                for result in unmatched:
+                    result["status"] = "错误"
+                    result["message"] = f"追加到Excel失败: {str(e)}"
+                log_queue.put(f"追加新行时出错: {str(e)}\n")
+
+        log_queue.put(f"更新模式完成: 更新 {updated_rows} 行 ({changed_cells} 个单元格)，"
+                      f"新增 {len(new_rows)} 行\n")
+        return results
+
+    def natural_sort_key(self, text):
+        """自然排序键（数字按数值比较，如 A2 < A10）"""
+        return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', text)]
+
+    def sort_pdf_files(self, pdf_files, order):
+        """按配置的顺序排列PDF文件（图号顺序需提取后再排，这里先按自然顺序）"""
+        if order == "path":
+            return sorted(pdf_files, key=os.path.normcase)
+        return sorted(pdf_files, key=lambda path: self.natural_sort_key(os.path.normcase(path)))
+
+    # ======================== 任务调度函数 ========================
+
+    def pdf_stat(self, pdf_path):
+        """PDF的 (大小, 修改时间)：优先用遍历时记录的结果，避免在网络共享上重复stat"""
+        stat = self._pdf_stats.get(pdf_path)
+        if stat is None:
+            st = os.stat(pdf_path)
+            stat = (st.st_size, st.st_mtime)
+        return stat
+
+    def pdf_cost_key(self, pdf_path):
+        """处理耗时记录的键：普通文件用路径+大小+修改时间（文件变化后重新估算）；
+        压缩包中的文件每次解压到新的临时目录、修改时间也不固定，改用大小+首尾内容摘要"""
+        size, mtime = self.pdf_stat(pdf_path)
+        if self.temp_dir and pdf_path.startswith(self.temp_dir + os.sep):
+            digest = self._pdf_digests.get(pdf_path)
+            if digest is None:
+                digest = self._pdf_digests[pdf_path] = self.pdf_quick_digest(pdf_path, size)
+            return f"{size}|{digest}"
+        return f"{os.path.normcase(os.path.abspath(pdf_path))}|{size}|{int(mtime)}"
+
+    def pdf_quick_digest(self, pdf_path, size, block_size=64 * 1024):
+        """文件开头和结尾各64KB的摘要（临时目录在本地磁盘，读取很快；只用于估算耗时，不要求完全唯一）"""
+        blake = hashlib.blake2b(digest_size=12)
+        with open(pdf_path, "rb") as f:
+            blake.update(f.read(block_size))
+            if size > block_size:
+                f.seek(max(block_size, size - block_size))
+                blake.update(f.read(block_size))
+        return blake.hexdigest()
+
+    def load_pdf_costs(self):
+        """加载上次记录的各PDF处理耗时（首次使用时从磁盘读取）"""
+        with self._pdf_costs_lock:
+            if self._pdf_costs is None:
+                self._pdf_costs = {}
+                cost_file = os.path.join(self.cache_dir, "pdf_costs.json")
+                if os.path.exists(cost_file):
+                    try:
+                        with open(cost_file, "r", encoding="utf-8") as f:
+                            self._pdf_costs = json.load(f)
+                    except Exception:
+                        pass  # 记录损坏时重新统计
+                # 旧记录没有最近使用时间，按加载时间计
+                now = int(time.time())
+                for record in self._pdf_costs.values():
+                    record.setdefault("used", now)
+            return self._pdf_costs
+
+    def record_pdf_cost(self, pdf_path, seconds, page_count):
+        """记录一个PDF的实际处理耗时和页数"""
+        try:
+            key = self.pdf_cost_key(pdf_path)
+        except OSError:
+            return
+        costs = self.load_pdf_costs()
+        with self._pdf_costs_lock:
+            costs[key] = {"seconds": round(seconds, 4), "pages": page_count, "mode": self.page_mode,
+                          "used": int(time.time())}
+
+    def save_pdf_costs(self):
+        """保存处理耗时记录：删除长时间未用到的记录，超过条数上限时保留最近用到的"""
+        costs = self.load_pdf_costs()
+        with self._pdf_costs_lock:
+            expire = time.time() - self.PDF_COST_RETENTION_DAYS * 86400
+            for key in [key for key, record in costs.items() if record["used"] < expire]:
+                del costs[key]
+            if len(costs) > self.PDF_COST_LIMIT:
+                for key in sorted(costs, key=lambda key: costs[key]["used"])[:len(costs) - self.PDF_COST_LIMIT]:
+                    del costs[key]
+            try:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                with open(os.path.join(self.cache_dir, "pdf_costs.json"), "w", encoding="utf-8") as f:
+                    json.dump(costs, f, ensure_ascii=False)
+            except Exception:
+                pass  # 保存失败不影响处理
+
+    def estimate_pdf_costs(self, pdf_files):
+        """估算各PDF的处理耗时：处理过的文件用上次实测耗时，其余按文件大小和本批实测的每MB耗时估算"""
+        costs = self.load_pdf_costs()
+        now = int(time.time())
+        estimates = []
+        known_seconds = 0.0
+        known_size = 0
+        unknown = []
+        for i, pdf_path in enumerate(pdf_files):
+            try:
+                size = self.pdf_stat(pdf_path)[0]
+                record = costs.get(self.pdf_cost_key(pdf_path))
+            except OSError:
+                size, record = 0, None
+            if record:
+                record["used"] = now
+                # 上次只提取首页、本次逐页提取时，按页数放大（旧记录没有提取方式，按首页处理）
+                seconds = record["seconds"]
+                if (self.page_mode != "first" and record.get("mode", "first") == "first"
+                        and record.get("pages", 1) > 1):
+                    seconds = max(seconds, seconds * record["pages"] / max(1, self.page_workers))
+                estimates.append(seconds)
+                known_seconds += record["seconds"]
+                known_size += size
+            else:
+                estimates.append(None)
+                unknown.append((i, size))
+
+        # 每MB耗时：有实测记录时按实测折算，否则用经验值
+        seconds_per_mb = known_seconds / (known_size / (1024 * 1024)) if known_size else 0.2
+        for i, size in unknown:
+            estimates[i] = size / (1024 * 1024) * seconds_per_mb + 0.05
+        return estimates
+
+    def schedule_pdf_files(self, pdf_files):
+        """最长处理时间优先（LPT）：按估计耗时从大到小排列任务，返回 (序号, 文件) 列表。
+        任务放在线程池的共享队列中，空闲线程总是取下一个最大的任务，大文件不会拖到最后"""
+        estimates = self.estimate_pdf_costs(pdf_files)
+        return sorted(enumerate(pdf_files), key=lambda item: estimates[item[0]], reverse=True)
+
+    def log_schedule_stats(self, pdf_files, max_workers, wall_seconds, log_queue):
+        """输出本批任务的调度统计（累计处理耗时 / (线程数 × 总耗时)），pdf_files为实际提取的文件"""
+        costs = self.load_pdf_costs()
+        total_work = 0.0
+        for pdf_path in pdf_files:
+            try:
+                record = costs.get(self.pdf_cost_key(pdf_path))
+            except OSError:
+                record = None
+            if record:
+                total_work += record["seconds"]
+        if pdf_files and wall_seconds > 0 and max_workers > 0:
+            efficiency = total_work / (max_workers * wall_seconds) * 100
+            unit = "个工作进程" if self.worker_mode == "process" else "个线程"
+            log_queue.put(f"任务调度: {max_workers} {unit}, 总耗时 {wall_seconds:.1f} 秒, "
+                          f"累计处理 {total_work:.1f} 秒, 并行效率 {efficiency:.0f}%\n")
+        self.save_pdf_costs()
+
+    def start_extraction(self, pdf_files, handle_result, max_workers):
+        """按LPT顺序启动并行提取（线程池或工作进程池），每个文件完成后调用
+        handle_result(序号, 文件, 图纸页列表, 错误信息)；返回的池对象在结果收齐后调用shutdown()"""
+        # 内容相同的文件只提取一次，结果分发给每个路径
+        self.duplicate_pdfs = self.find_duplicate_pdfs(pdf_files)
+        self.duplicate_originals = {copy: original for original, group in self.duplicate_pdfs.items()
+                                    for copy in group}
+        if self.duplicate_originals:
+            self.log_queue.put(f"发现 {len(self.duplicate_originals)} 个内容重复的PDF文件，相同内容只提取一次\n")
+        seq_of = {pdf_path: seq for seq, pdf_path in enumerate(pdf_files)}
+        # 运行记录中已完成且未变化的文件直接使用记录的结果
+        restored = self.restore_known_results(pdf_files, seq_of, handle_result)
+        unique_files = [pdf_path for pdf_path in pdf_files
+                        if pdf_path not in self.duplicate_originals and pdf_path not in restored]
+        self.extracted_files = unique_files
+
+        def on_result(seq, pdf_path, sheets, error, seconds, data=None):
+            self.record_pdf_cost(pdf_path, seconds, sheets[0].page_count if sheets else 0)
+            if self.journal:
+                self.journal_record(pdf_path, sheets, error, data)
+            handle_result(seq_of[pdf_path], pdf_path, sheets, error)
+            for copy in self.duplicate_pdfs.get(pdf_path, ()):
+                handle_result(seq_of[copy], copy, sheets, error)
+
+        scheduled = [(seq_of[pdf_path], pdf_path) for _, pdf_path in self.schedule_pdf_files(unique_files)]
+        if self.worker_mode == "process":
+            # 工作进程只接收文件路径、只返回标题块字段
+            pool = RecyclingProcessPool(self.extractor_settings(), max_workers, self.max_worker_rss_mb, on_result)
+            pool.start(scheduled)
+            return pool
+
+        # 按相同的顺序预读即将处理的PDF，提取线程从内存解析
+        prefetcher = None
+        if self.prefetch_mb > 0:
+            prefetch_files = []
+            for _, pdf_path in scheduled:
+                try:
+                    prefetch_files.append((pdf_path, self.pdf_stat(pdf_path)[0]))
+                except OSError:
+                    pass
+            prefetcher = PDFPrefetcher(prefetch_files, self.prefetch_mb * 1024 * 1024, self.prefetch_threads)
+
+        def run_task(seq, pdf_path):
+            data = prefetcher.acquire(pdf_path) if prefetcher else None
+
+            def finish(sheets, error, seconds):
+                try:
+                    on_result(seq, pdf_path, sheets, error, seconds, data)
+                finally:
+                    if prefetcher:
+                        prefetcher.release(pdf_path)
+
+            # 有扫描页时文件在OCR完成后才回调，提取线程继续处理下一个文件
+            self.start_pdf_task(pdf_path, data, finish)
+
+        self.warm_up_extractor()
+        if self.shared_pool is not None:
+            # 多任务调度：与其他任务共用提取线程，按优先级和公平份额交替处理
+            return self.shared_pool.submit_batch(scheduled, run_task, self.log_queue, self.job_priority, prefetcher)
+        executor = ExtractionThreadPool(max_workers, prefetcher)
+        for seq, pdf_path in scheduled:
+            executor.submit(run_task, seq, pdf_path)
+        return executor
+
+    # ======================== 运行记录函数 ========================
+
+    def open_run_journal(self, mode, pdf_root):
+        """打开本次任务的运行记录（任务由模式、输入路径、Excel内容和提取设置确定，相同任务共用同一记录）"""
+        self.close_run_journal()
+        if not self.journal_enabled:
+            return
+        try:
+            input_path = os.path.normcase(os.path.abspath(self.pdf_folder or pdf_root))
+            input_stat = None
+            if os.path.isfile(input_path):
+                stat = os.stat(input_path)
+                input_stat = (stat.st_size, int(stat.st_mtime))
+            header = {
+                "mode": mode,
+                "input": input_path,
+                "input_stat": input_stat,
+                "excel": self.compute_file_hash(self.excel_path),
+                "settings": [self.page_mode, self.ocr_enabled, self.ocr_lang, self.ocr_dpi,
+                             self.fill_order, self.fill_mode, self.column_config_signature()],
+            }
+            key = hashlib.sha1(json.dumps(header, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+            journal_dir = os.path.join(self.cache_dir, "journal")
+            os.makedirs(journal_dir, exist_ok=True)
+            self.journal = RunJournal(os.path.join(journal_dir, f"{mode}_{key}.jsonl"), header)
+            self.journal_root = pdf_root
+        except Exception as e:
+            self.journal = None
+            self.log_queue.put(f"无法创建运行记录: {str(e)}\n")
+            return
+        if self.journal.entries:
+            self.log_queue.put(f"发现上次未完成的运行记录，已完成 {len(self.journal.entries)} 个文件\n")
+
+    def close_run_journal(self):
+        """关闭运行记录（保留文件，下次运行同一任务时继续）"""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def finish_run_journal(self):
+        """任务完成、报告已保存：删除运行记录"""
+        if self.journal:
+            self.journal.finish()
+            self.journal = None
+
+    def journal_file_key(self, pdf_path):
+        """文件在运行记录中的键：相对输入目录的路径，嵌套压缩包中的文件用“压缩包键!/包内路径”"""
+        for extract_dir, archive_path in self.nested_archive_dirs.items():
+            if pdf_path.startswith(extract_dir + os.sep):
+                return f"{self.journal_file_key(archive_path)}!/{os.path.relpath(pdf_path, extract_dir)}".replace(
+                    os.sep, "/")
+        return os.path.relpath(pdf_path, self.journal_root).replace(os.sep, "/")
+
+    def journal_record(self, pdf_path, sheets, error, data=None):
+        """把一个文件（及内容相同的其他文件）的提取结果写入运行记录。
+        内容摘要只在不需额外读网络共享时记录：预读的内容直接计算，临时目录中（压缩包解压出）的文件从本地磁盘读取；
+        其他文件不记录摘要，恢复时修改时间不同即重新提取"""
+        try:
+            if data is not None:
+                file_hash = hashlib.sha1(data).hexdigest()
+            elif self.temp_dir and pdf_path.startswith(self.temp_dir + os.sep):
+                file_hash = self.compute_file_hash(pdf_path)
+            else:
+                file_hash = None
+            for path in [pdf_path] + self.duplicate_pdfs.get(pdf_path, []):
+                size, mtime = self.pdf_stat(path)
+                self.journal.record_file(self.journal_file_key(path), size, mtime, file_hash, sheets, error)
+        except Exception as e:
+            self.log_queue.put(f"写入运行记录失败: {str(e)}\n")
+
+    def journal_entry_valid(self, pdf_path, entry):
+        """运行记录中的结果是否仍然有效（大小相同，且修改时间相同或内容摘要相同）"""
+        try:
+            size, mtime = self.pdf_stat(pdf_path)
+            if size != entry["size"]:
+                return False
+            if int(mtime) == int(entry["mtime"]):
+                return True
+            # 压缩包每次解压出的文件修改时间不同，按内容摘要确认（没有记录摘要时重新提取）
+            return bool(entry["hash"]) and self.compute_file_hash(pdf_path) == entry["hash"]
+        except (OSError, KeyError, TypeError):
+            return False
+
+    def restore_known_results(self, pdf_files, seq_of, handle_result):
+        """把已知的结果交给handle_result（运行记录中已完成的文件，以及标题栏库中未变化的文件），返回已恢复的文件集合"""
+        journal_entries = self.journal.entries if self.journal else {}
+        store = self.get_title_block_store() if self.use_store else None
+        if not journal_entries and store is None:
+            return set()
+        restored = {}
+        from_store = 0
+        settings = self.extraction_signature()
+        for pdf_path in pdf_files:
+            entry = journal_entries.get(self.journal_file_key(pdf_path)) if journal_entries else None
+            if entry and self.journal_entry_valid(pdf_path, entry):
+                restored[pdf_path] = ([TitleBlock(*state) for state in entry["sheets"]], entry["error"])
+            elif store is not None:
+                try:
+                    result = store.get(pdf_path, *self.pdf_stat(pdf_path), settings)
+                except Exception:
+                    result = None
+                if result is not None:
+                    restored[pdf_path] = result
+                    from_store += 1
+
+        # 内容相同的一组文件只在全部有记录时恢复，否则整组重新提取
+        for original, copies in self.duplicate_pdfs.items():
+            group = [original] + copies
+            if not all(pdf_path in restored for pdf_path in group):
+                for pdf_path in group:
+                    restored.pop(pdf_path, None)
+
+        for pdf_path, (sheets, error) in restored.items():
+            handle_result(seq_of[pdf_path], pdf_path, sheets, error)
+        if restored:
+            self.log_queue.put(f"已有结果 {len(restored)} 个文件（运行记录 {len(restored) - from_store} 个，"
+                               f"标题栏库 {from_store} 个），跳过提取\n")
+        return set(restored)
+
+    # ======================== 标题栏库与无界面处理函数 ========================
+
+    def extraction_signature(self):
+        """影响提取结果的设置签名（标题栏库中的结果只在设置相同时使用）"""
+        return repr((self.page_mode, self.ocr_enabled, self.ocr_lang, self.ocr_dpi))
+
+    def get_title_block_store(self, create=False):
+        """打开标题栏库（create为False且库文件不存在时返回None）"""
+        if self._title_block_store is None:
+            path = self.store_path or os.path.join(self.cache_dir, "title_blocks.db")
+            if not create and not os.path.exists(path):
+                return None
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._title_block_store = TitleBlockStore(path)
+        return self._title_block_store
+
+    def close_title_block_store(self):
+        """关闭标题栏库（之后再调用get_title_block_store时重新打开）"""
+        if self._title_block_store is not None:
+            self._title_block_store.close()
+            self._title_block_store = None
+
+    def prepare_pdf_input(self, pdf_input):
+        """无界面处理的输入：文件夹直接使用，压缩包解压到临时目录，单个PDF使用其所在文件夹"""
+        if os.path.isfile(pdf_input):
+            file_ext = os.path.splitext(pdf_input)[1].lower()
+            if file_ext == '.pdf':
+                return os.path.dirname(os.path.abspath(pdf_input))
+            if file_ext in self.ARCHIVE_EXTENSIONS:
+                extract_dir = self.get_temp_dir()
+                if not self.extract_archive(pdf_input, extract_dir):
+                    raise ValueError(f"无法解压文件: {pdf_input}")
+                return extract_dir
+            raise ValueError(f"不支持的文件格式: {file_ext}")
+        if not os.path.isdir(pdf_input):
+            raise ValueError(f"路径不存在: {pdf_input}")
+        return pdf_input
+
+    def cleanup_temp_dir(self):
+        """删除本次处理的临时解压目录"""
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.temp_dir = None
+
+    def compare_package(self, excel_path, pdf_input, progress_queue=None):
+        """无界面比对（命令行、服务）：查找PDF、读取BOM、比对并生成报告，返回 (错误列表, 报告路径)"""
+        self.excel_path = excel_path
+        self.pdf_folder = pdf_input
         try:
-            pdf_data = self.extract_pdf_title_block(pdf_path)
+            pdf_root = self.prepare_pdf_input(pdf_input)
+            pdf_files = self.find_pdf_files(pdf_root)
+            self.total_pdfs = len(pdf_files)
+            if not pdf_files:
+                raise ValueError(f"路径中没有找到PDF文件: {pdf_root}")
+            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件{self.discovery_stats}\n")
 
-            result = {
+            excel_data = self.extract_excel_data(excel_path)
+            if excel_data.empty:
+                raise ValueError("未找到有效的Excel数据")
+            excel_index = self.build_excel_index(excel_data)
+
+            self.open_run_journal("compare", pdf_root)
+            errors = self.process_files_for_comparison(excel_path, pdf_root, progress_queue or queue.Queue(),
+                                                       self.log_queue, pdf_files, excel_data, excel_index)
+            with self.reserved_output('log', "比对报告", ".txt") as (temp_file, report_file):
+                self.generate_comparison_report(errors, temp_file)
+            report_path = os.path.abspath(report_file)
+            self.finish_run_journal()
+            return errors, report_path
+        finally:
+            self.close_run_journal()
+            self.cleanup_temp_dir()
+
+    def extract_package(self, pdf_input, progress_queue=None):
+        """无界面提取（服务）：查找PDF并提取标题栏，按文件顺序返回 [(文件, 图纸页列表, 错误信息)]"""
+        self.excel_path = ""
+        self.pdf_folder = pdf_input
+        try:
+            pdf_root = self.prepare_pdf_input(pdf_input)
+            pdf_files = self.find_pdf_files(pdf_root)
+            self.total_pdfs = len(pdf_files)
+            if not pdf_files:
+                raise ValueError(f"路径中没有找到PDF文件: {pdf_root}")
+            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件{self.discovery_stats}\n")
+
+            result_queue = queue.Queue()
+            max_workers = self.extraction_worker_count(self.total_pdfs)
+            start_time = time.perf_counter()
+            pool = self.start_extraction(pdf_files, lambda *result: result_queue.put(result), max_workers)
+            file_results = {}
+            try:
+                while len(file_results) < self.total_pdfs:
+                    seq, pdf_path, sheets, error = result_queue.get()
+                    file_results[seq] = (pdf_path, sheets, error)
+                    if progress_queue is not None:
+                        progress_queue.put(len(file_results))
+            finally:
+                pool.shutdown()
+            self.log_schedule_stats(self.extracted_files, max_workers, time.perf_counter() - start_time,
+                                    self.log_queue)
+            return [file_results[seq] for seq in sorted(file_results)]
+        finally:
+            self.cleanup_temp_dir()
+
+    def fill_package(self, excel_path, pdf_input, progress_queue=None):
+        """无界面填入（服务）：提取标题栏填入Excel（需要xlwings），另存到excel文件夹，
+        返回 (填入结果, 报告路径, 另存的Excel路径)"""
+        self.excel_path = excel_path
+        self.pdf_folder = pdf_input
+        try:
+            pdf_root = self.prepare_pdf_input(pdf_input)
+            pdf_files = self.find_pdf_files(pdf_root)
+            self.total_pdfs = len(pdf_files)
+            if not pdf_files:
+                raise ValueError(f"路径中没有找到PDF文件: {pdf_root}")
+            self.log_queue.put(f"找到 {self.total_pdfs} 个PDF文件{self.discovery_stats}\n")
+
+            import xlwings as xw
+            self.excel_app = xw.App(visible=False)
+            self.excel_book = self.excel_app.books.open(os.path.abspath(excel_path))
+            sheet = self.excel_book.sheets.active
+            header_last_col = sheet.used_range.last_cell.column
+            header_rows = sheet.range((max(1, self.header_row - 1), 1),
+                                      (self.header_row, header_last_col)).options(ndim=2).value
+            self.column_map = self.resolve_column_mapping(header_rows)
+            self.log_queue.put(f"列映射: {self.format_column_map(self.column_map)}\n")
+
+            self.open_run_journal("fill", pdf_root)
+            results = self.process_files_for_filling(
+                excel_path, pdf_root, progress_queue or queue.Queue(), self.log_queue, pdf_files, self.excel_book,
+                self.header_row, self.note_start_row, self.column_map["物料名称"], self.column_map["物料规格"],
+                self.column_map["描述"], self.column_map["版本"], self.column_map["title"], self.fill_order,
+                self.fill_mode)
+
+            name, ext = os.path.splitext(os.path.basename(excel_path))
+            with self.reserved_output('excel', name, ext) as (temp_output, excel_output):
+                self.excel_book.save(os.path.abspath(temp_output))
+                # Excel另存后仍占用该文件，关闭后才能改名
+                self.excel_book.close()
+                self.excel_book = None
+            excel_output = os.path.abspath(excel_output)
+            self.log_queue.put(f"已另存Excel文件到: {excel_output}\n")
+            with self.reserved_output('log', "处理报告", ".txt") as (temp_file, report_file):
+                self.generate_filling_report(results, temp_file)
+            report_path = os.path.abspath(report_file)
+            self.finish_run_journal()
+            return results, report_path, excel_output
+        finally:
+            if self.excel_book:
+                try:
+                    self.excel_book.close()
+                except Exception as e:
+                    self.log_queue.put(f"关闭Excel文件时出错: {str(e)}\n")
+                self.excel_book = None
+            if self.excel_app:
+                try:
+                    self.excel_app.quit()
+                except Exception as e:
+                    self.log_queue.put(f"退出Excel应用时出错: {str(e)}\n")
+                self.excel_app = None
+            self.close_run_journal()
+            self.cleanup_temp_dir()
+
+    def reserve_output_path(self, folder, name, ext):
+        """folder下带时间戳的输出文件路径（同一秒内有多个任务时加序号，并创建空文件占位）"""
+        os.makedirs(folder, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        number = 1
+        while True:
+            suffix = f"_{number}" if number > 1 else ""
+            path = os.path.join(folder, f"{name}_{stamp}{suffix}{ext}")
+            try:
+                with open(path, "x"):
+                    return path
+            except FileExistsError:
+                number += 1
+
+    @contextmanager
+    def reserved_output(self, folder, name, ext):
+        """预留输出路径并产出 (临时文件路径, 正式路径)：内容写入临时文件，完成后替换到正式路径；
+        写入出错时删除临时文件和占位的空文件，不留下不完整的输出"""
+        path = self.reserve_output_path(folder, name, ext)
+        temp_path = f"{os.path.splitext(path)[0]}.tmp{ext}"
+        try:
+            yield temp_path, path
+            os.replace(temp_path, path)
+        except BaseException:
+            for leftover in (temp_path, path):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+            raise
+
+    def find_duplicate_pdfs(self, pdf_files):
+        """查找内容相同的PDF：先按文件大小筛选，只对大小相同的文件计算摘要；返回 首个文件 -> [其他相同文件]"""
+        by_size = {}
+        for pdf_path in pdf_files:
+            try:
+                by_size.setdefault(self.pdf_stat(pdf_path)[0], []).append(pdf_path)
+            except OSError:
+                pass
+        candidates = [pdf_path for group in by_size.values() if len(group) > 1 for pdf_path in group]
+        if not candidates:
+            return {}
+
+        def digest(pdf_path):
+            blake = hashlib.blake2b(digest_size=16)
+            try:
+                with open(pdf_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        blake.update(chunk)
+            except OSError:
+                return None
+            return blake.hexdigest()
+
+        # 摘要计算以读文件为主，用少量线程并行
+        with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as executor:
+            digests = dict(zip(candidates, executor.map(digest, candidates)))
+
+        groups = {}
+        for pdf_path in pdf_files:
+            key = digests.get(pdf_path)
+            if key:
+                groups.setdefault((self.pdf_stat(pdf_path)[0], key), []).append(pdf_path)
+        return {group[0]: group[1:] for group in groups.values() if len(group) > 1}
+
+    def write_duplicate_section(self, f):
+        """在报告中列出内容相同的PDF文件"""
+        if not self.duplicate_pdfs:
+            return
+        f.write("内容相同的PDF文件（只提取一次）:\n")
+        for original, copies in self.duplicate_pdfs.items():
+            f.write(f"  - {original}\n")
+            for copy in copies:
+                f.write(f"      相同: {copy}\n")
+        f.write("\n")
+
+    def extraction_worker_count(self, total_pdfs):
+        """并行数：线程方式为CPU核心数的2倍，工作进程方式为CPU核心数（最多16）；多任务调度时为共享线程数"""
+        cpu_count = os.cpu_count() or 4
+        if self.worker_mode == "process":
+            return max(1, min(cpu_count, 16, total_pdfs))
+        if self.shared_pool is not None:
+            return self.shared_pool.max_workers
+        return max(1, min(cpu_count * 2, 16, total_pdfs))
+
+    def log_memory_stats(self, pool, log_queue):
+        """输出并记录内存峰值（主进程及工作进程）"""
+        _, peak = process_memory_mb()
+        self.memory_stats = f"主进程 {peak:.0f} MB"
+        if isinstance(pool, RecyclingProcessPool):
+            self.memory_stats += (f", 工作进程 {pool.peak_rss_mb:.0f} MB (上限 {self.max_worker_rss_mb} MB, "
+                                  f"替换 {pool.recycled} 次, 异常退出 {pool.crashed} 次)")
+        elif isinstance(pool, (ExtractionThreadPool, ExtractionBatch)) and pool.prefetcher:
+            prefetcher = pool.prefetcher
+            self.memory_stats += (f", 预读 {prefetcher.peak_bytes / (1024 * 1024):.0f} MB (预算 {self.prefetch_mb} MB, "
+                                  f"命中 {prefetcher.hits}/{prefetcher.hits + prefetcher.misses}, "
+                                  f"等待读取 {prefetcher.wait_seconds:.1f} 秒)")
+        log_queue.put(f"内存峰值: {self.memory_stats}\n")
+
+    def build_filling_results(self, pdf_path, sheets, error=None):
+        """根据提取出的图纸页生成填入结果（每个图纸页一条）"""
+        if error:
+            return [{
                 "pdf_file": os.path.basename(pdf_path),
                 "pdf_path": pdf_path,
-                "page_count": pdf_data["页数"],
+                "page_count": 0,
+                "extracted_data": None,
+                "status": "错误",
+                "message": error
+            }]
+
+        results = []
+        for pdf_data in sheets:
+            result = {
+                "pdf_file": self.sheet_label(pdf_path, pdf_data),
+                "pdf_path": pdf_path,
+                "page_count": pdf_data.page_count,
                 "extracted_data": pdf_data,
                 "status": "成功",
                 "message": ""
             }
 
-            # 检查是否是多页PDF
-            if pdf_data["页数"] > 1:
-                result["status"] = "警告"
-                result["message"] = f"多页PDF ({pdf_data['页数']}页)，需要进一步查看"
+            # 检查是否是多页PDF（只提取首页时需要人工查看）
+            if pdf_data.page_count > 1:
+                if self.page_mode == "first":
+                    result["status"] = "警告"
+                    result["message"] = f"多页PDF ({pdf_data.page_count}页)，需要进一步查看"
+                else:
+                    result["message"] = f"多页PDF，第{pdf_data.page_no}/{pdf_data.page_count}页"
 
-            result_queue.put(result)
-            return True
+            results.append(result)
 
-        except Exception as e:
-            result_queue.put({
-                "pdf_file": os.path.basename(pdf_path),
-                "pdf_path": pdf_path,
-                "page_count": 0,
-                "extracted_data": {},
-                "status": "错误",
-                "message": f"处理错误: {str(e)}"
-            })
-            return False
+        # 内容重复的文件注明与哪个文件相同
+        original = self.duplicate_originals.get(pdf_path)
+        if original:
+            for result in results:
+                note = f"与 {os.path.basename(original)} 内容相同"
+                result["message"] = f"{result['message']}，{note}" if result["message"] else note
+        return results
 
     def process_files_for_filling(self, excel_path, pdf_folder, progress_queue, log_queue, pdf_files, excel_book,
                                   header_row, note_start_row,
-                                  name_col, spec_col, desc_col, version_col, title_col):  # 新增title_col参数
-        """处理PDF文件并填充到Excel中，确保只修改表头行之后的内容"""
-        # 1. 提取Excel数据
-        log_queue.put("读取Excel数据...\n")
+                                  name_col, spec_col, desc_col, version_col, title_col,  # 新增title_col参数
+                                  fill_order="natural", fill_mode="overwrite"):
+        """处理PDF文件并填充到Excel中，确保只修改表头行之后的内容；提取并行执行，结果按稳定顺序输出"""
+        # 1. 列映射
         data_start_row = header_row + 1  # 数据从表头行+1开始
-        excel_data = self.extract_excel_data_for_filling(excel_book, header_row, data_start_row, log_queue)
+        column_map = {"物料名称": name_col, "物料规格": spec_col, "描述": desc_col, "版本": version_col,
+                      "title": title_col}
 
         total_pdfs = len(pdf_files)
         log_queue.put(f"开始处理 {total_pdfs} 个PDF文件...\n")
 
+        # 按配置顺序排列文件，序号决定最终输出顺序（与线程完成顺序无关）
+        pdf_files = self.sort_pdf_files(pdf_files, fill_order)
+
         # 2. 创建结果队列
         result_queue = queue.Queue()
 
-        # 3. 使用线程池处理文件
+        # 3. 并行提取文件（线程池或工作进程池）
         processed_count = 0
         results = []
-
-        # 确定线程数（根据文件数量和CPU核心数）
-        cpu_count = os.cpu_count() or 4
-        max_workers = min(cpu_count * 2, 16, total_pdfs)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            futures = []
-            for pdf_file in pdf_files:
-                future = executor.submit(
-                    self.process_pdf_file_for_filling,
-                    pdf_file, result_queue
-                )
-                futures.append(future)
-
+        pending = {}  # 重排缓冲区：序号 -> 已完成但尚未输出的结果
+        next_seq = 0
+
+        # 确定并行数（根据文件数量和CPU核心数）
+        max_workers = self.extraction_worker_count(total_pdfs)
+
+        start_time = time.perf_counter()
+        # 按估计耗时从大到小提交任务（序号仍决定输出顺序）
+        pool = self.start_extraction(
+            pdf_files,
+            lambda seq, pdf_path, sheets, error: result_queue.put(
+                (seq, self.build_filling_results(pdf_path, sheets, error))),
+            max_workers
+        )
+        try:
             # 处理结果和更新进度
             while processed_count < total_pdfs:
                 try:
                     # 获取结果但不阻塞
                     if not result_queue.empty():
-                        result = result_queue.get()
-                        results.append(result)
+                        seq, file_results = result_queue.get()
+                        pending[seq] = file_results
                         processed_count += 1
                         progress_queue.put(processed_count)
 
-                        # 记录处理状态
-                        status_msg = f"处理: {result['pdf_file']} - {result['status']}"
-                        if result['message']:
-                            status_msg += f" - {result['message']}"
-                        log_queue.put(status_msg + "\n")
+                        # 按序号依次输出已连续完成的结果（多页PDF的各页按页码顺序）
+                        while next_seq in pending:
+                            for result in pending.pop(next_seq):
+                                results.append(result)
+
+                                # 记录处理状态
+                                status_msg = f"处理: {result['pdf_file']} - {result['status']}"
+                                if result['message']:
+                                    status_msg += f" - {result['message']}"
+                                log_queue.put(status_msg + "\n")
+                            next_seq += 1
                     else:
                         time.sleep(0.05)
                 except Exception:
                     pass
-
-        # 4. 按顺序将PDF数据填充到Excel中
+        finally:
+            pool.shutdown()
+        self.log_schedule_stats(self.extracted_files, max_workers, time.perf_counter() - start_time, log_queue)
+        self.log_memory_stats(pool, log_queue)
+
+        # 按图号排序（图号为空的排在最后，图号相同时保持文件顺序）
+        if fill_order == "drawing":
+            def drawing_no(result):
+                return result["extracted_data"].drawing_no if result["extracted_data"] else ""
+
+            results.sort(key=lambda r: (not drawing_no(r), self.natural_sort_key(drawing_no(r))))
+
+        # 4. 更新模式：按图号/名称匹配已有行，只改写变化的单元格
+        if fill_mode == "upsert":
+            log_queue.put("更新模式: 按图号/名称匹配Excel中已有的行...\n")
+            excel_data = self.extract_excel_data_for_filling(excel_book, header_row, data_start_row, log_queue,
+                                                             column_map)
+            return self.upsert_excel_with_pdf_data(excel_book, results, excel_data, column_map, header_row,
+                                                   note_start_row, log_queue)
+
+        # 先规划最终行布局，再一次性插入缺少的行并复制格式
+        sheet = excel_book.sheets.active
+        plan = self.plan_fill_layout(header_row, note_start_row, len(results))
+        self.apply_fill_layout(sheet, plan, log_queue)
+        note_start_row = plan["note_start_row"]
+
+        # 按顺序将PDF数据填充到Excel中
         log_queue.put("将PDF数据填充到Excel中...\n")
 
         # 按顺序填充数据
         for i, result in enumerate(results):
-            # 计算要填充的行号
-            if i < len(excel_data):
-                row_idx = excel_data[i]["原始行号"]
-            else:
-                # 如果Excel行数不足，从表头行+1开始计算新行
-                row_idx = header_row + 1 + i
-                log_queue.put(f"扩展Excel行到: {row_idx}\n")
-
-            # 确保不修改表头行之前的内容
-            if row_idx <= header_row:
-                row_idx = header_row + 1 + i
-                log_queue.put(f"自动调整行号到表头行之后: {row_idx}\n")
+            # 要填充的行号由布局规划确定（均在表头行之后）
+            row_idx = plan["rows"][i]
 
             # 新增：传递title_col参数
             success = self.fill_excel_with_pdf_data(excel_book, result["extracted_data"], row_idx, name_col, spec_col,
@@ -1547,22 +4745,34 @@ class PDFExcelTool:
             success_count = sum(1 for r in results if r["status"] == "成功")
             warning_count = sum(1 for r in results if r["status"] == "警告")
             error_count = sum(1 for r in results if r["status"] == "错误")
-            multi_page_count = sum(1 for r in results if r["page_count"] > 1)
+            multi_page_files = {}
+            for r in results:
+                if r["page_count"] > 1:
+                    multi_page_files.setdefault(r["pdf_path"], r)
+            multi_page_count = len(multi_page_files)
 
             f.write(f"处理统计:\n")
-            f.write(f"  总文件数: {len(results)}\n")
+            f.write(f"  总文件数: {len({r['pdf_path'] for r in results})}\n")
+            if self.page_mode != "first":
+                f.write(f"  图纸记录数: {len(results)}\n")
+            if self.memory_stats:
+                f.write(f"  内存峰值: {self.memory_stats}\n")
             f.write(f"  成功: {success_count}\n")
             f.write(f"  警告: {warning_count}\n")
             f.write(f"  错误: {error_count}\n")
             f.write(f"  多页PDF: {multi_page_count}\n\n")
 
             if multi_page_count > 0:
-                f.write("需要进一步查看的多页PDF文件:\n")
-                for result in results:
-                    if result["page_count"] > 1:
-                        f.write(f"  - {result['pdf_file']} ({result['page_count']}页)\n")
+                if self.page_mode == "first":
+                    f.write("需要进一步查看的多页PDF文件:\n")
+                else:
+                    f.write("已逐页提取的多页PDF文件:\n")
+                for result in multi_page_files.values():
+                    f.write(f"  - {os.path.basename(result['pdf_path'])} ({result['page_count']}页)\n")
                 f.write("\n")
 
+            self.write_duplicate_section(f)
+
             f.write("详细处理结果:\n\n")
             for i, result in enumerate(results, 1):
                 f.write(f"文件 #{i}:\n")
@@ -1574,9 +4784,10 @@ class PDFExcelTool:
 
                 if result['extracted_data']:
                     f.write("  提取的数据:\n")
-                    for key, value in result['extracted_data'].items():
-                        if key != "页数":  # 页数已经单独显示
-                            f.write(f"    {key}: {value}\n")
+                    for key, value in result['extracted_data'].field_items():
+                        f.write(f"    {key}: {value}\n")
+                    if result['extracted_data'].source:
+                        f.write(f"    提取方式: {result['extracted_data'].source}\n")
 
                 f.write("-" * 70 + "\n")
 
@@ -1584,91 +4795,140 @@ class PDFExcelTool:
 
     # ======================== 比对功能函数 ========================
 
+    def normalize_cell_value(self, value):
+        """规范化单元格值为字符串（与pandas读取结果保持一致）"""
+        if value is None:
+            return ""
+        # pandas会把整数值的浮点数转换为整数（如1.0 -> 1）
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+
+    def load_bom_cache(self, cache_key):
+        """按缓存键读取已解析的BOM数据（先内存后磁盘）"""
+        if cache_key in self._bom_cache:
+            return self._bom_cache[cache_key]
+
+        cache_file = os.path.join(self.cache_dir, f"bom_{cache_key}.pkl")
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "rb") as f:
+                    parsed = pickle.load(f)
+                self._bom_cache[cache_key] = parsed
+                return parsed
+            except Exception as e:
+                # 缓存损坏时删除并重新解析
+                self.log_queue.put(f"BOM缓存 {os.path.basename(cache_file)} 损坏，已删除并重新解析: {str(e)}\n")
+                self.discard_bom_cache(cache_key)
+        return None
+
+    def discard_bom_cache(self, cache_key):
+        """删除内存和磁盘中的BOM缓存项"""
+        self._bom_cache.pop(cache_key, None)
+        try:
+            os.remove(os.path.join(self.cache_dir, f"bom_{cache_key}.pkl"))
+        except OSError:
+            pass
+
+    def save_bom_cache(self, cache_key, parsed):
+        """保存解析后的BOM数据到内存和磁盘缓存"""
+        self._bom_cache[cache_key] = parsed
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            cache_file = os.path.join(self.cache_dir, f"bom_{cache_key}.pkl")
+            with open(cache_file, "wb") as f:
+                pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass  # 磁盘缓存失败不影响比对
+
     def extract_excel_data(self, excel_path):
-        """从Excel文件中提取申请表数据，新增提取TITLE列（第13列）"""
+        """从Excel文件中提取申请表数据（只读模式单次流式解析，按工作簿哈希缓存）"""
+        import pandas as pd
+        self.column_map = {}
+        cache_key = None
+        try:
+            # 列配置变化时解析结果不同，缓存键中包含列配置签名
+            cache_key = f"{self.compute_file_hash(excel_path)}_{self.column_config_signature()}"
+            parsed = self.load_bom_cache(cache_key)
+            if parsed is None:
+                parsed = self.parse_bom_columns(excel_path)
+                if parsed is None:
+                    return pd.DataFrame()
+                self.save_bom_cache(cache_key, parsed)
+
+            self.column_map = parsed["column_map"]
+            return pd.DataFrame(parsed["columns"])
+
+        except Exception as e:
+            self.log_queue.put(f"读取Excel数据时出错: {type(e).__name__}: {str(e)}\n")
+            if cache_key is not None:
+                # 缓存内容不完整时也会出错，删除缓存项，下次重新解析
+                self.discard_bom_cache(cache_key)
+            self.column_map = {}
+            return pd.DataFrame()
+
+    def parse_bom_columns(self, excel_path):
+        """单次流式读取工作簿：定位表头并只保留映射到的列，返回按列存储的数据和列映射"""
+        from openpyxl import load_workbook
+        wb = load_workbook(excel_path, read_only=True, data_only=True)
         try:
-            # 使用openpyxl定位数据起始行
-            wb = load_workbook(excel_path, data_only=True)
             ws = wb.active
+            rows = ws.iter_rows(values_only=True)
+
+            # 只缓存前49行用于定位表头，其余行继续流式读取
+            head_rows = list(islice(rows, 49))
+
+            def row_text(values):
+                return [str(value).strip() if value is not None else "" for value in values]
 
             # 改进的表头查找逻辑
-            start_row = 1
-            header_found = False
+            start_row = None
             header_patterns = ["物料名称", "Quaero part", "物料规格", "描述", "版本", "name and specification"]
 
-            for row_idx in range(1, 50):  # 扩大搜索范围
-                row = [str(cell.value).strip() if cell.value is not None else "" for cell in ws[row_idx]]
+            for row_idx, values in enumerate(head_rows, 1):
+                row = row_text(values)
                 if any(any(pattern in cell for pattern in header_patterns) for cell in row):
                     start_row = row_idx
-                    header_found = True
                     break
 
-            if not header_found:
+            if start_row is None:
                 # 尝试更宽松的匹配
-                for row_idx in range(1, 50):
-                    row = [str(cell.value).strip() if cell.value is not None else "" for cell in ws[row_idx]]
+                for row_idx, values in enumerate(head_rows, 1):
+                    row = row_text(values)
                     if "物料" in "".join(row) or "part" in "".join(row).lower():
                         start_row = row_idx
-                        header_found = True
                         break
 
-                if not header_found:
-                    return pd.DataFrame()
-
-            # 使用pandas读取Excel数据
-            df = pd.read_excel(
-                excel_path,
-                header=start_row,
-                keep_default_na=False
-            )
-
-            # 创建新DataFrame，只包含需要的列
-            result_df = pd.DataFrame()
-
-            # 物料名称 -> 第2列 (索引1)
-            if len(df.columns) > 1:
-                result_df["物料名称"] = df.iloc[:, 1].apply(lambda x: str(x).strip() if x != "" else "")
-            else:
-                result_df["物料名称"] = ""
-
-            # 物料规格 -> 第3列 (索引2)
-            if len(df.columns) > 2:
-                result_df["物料规格"] = df.iloc[:, 2].apply(lambda x: str(x).strip() if x != "" else "")
-            else:
-                result_df["物料规格"] = ""
-
-            # 描述 -> 第4列 (索引3)
-            if len(df.columns) > 3:
-                result_df["描述"] = df.iloc[:, 3].apply(lambda x: str(x).strip() if x != "" else "")
-            else:
-                result_df["描述"] = ""
-
-            # 版本 -> 第8列 (索引7)
-            if len(df.columns) > 8:
-                result_df["版本"] = df.iloc[:, 8].apply(lambda x: str(x).strip() if x != "" else "")
-            else:
-                result_df["版本"] = ""
+                if start_row is None:
+                    return None
 
-            # 新增：TITLE -> 第13列 (索引12)
-            if len(df.columns) > 12:
-                result_df["title"] = df.iloc[:, 12].apply(lambda x: str(x).strip() if x != "" else "")
-            else:
-                result_df["title"] = ""
+            # 按表头标签解析列映射（表头行及其下一行的英文表头）
+            column_map = self.resolve_column_mapping(head_rows[start_row - 1:start_row + 1])
+            field_columns = [(field, column_map[field] - 1) for field in self.COLUMN_CONFIG_KEYS]
+            columns = {field: [] for field, _ in field_columns}
+            columns["原始行号"] = []
 
-            # 添加原始行号（Excel中的实际行号）
-            # start_row是表头行索引，所以数据行从start_row+2开始（表头行+1）
-            result_df["原始行号"] = [start_row + 2 + idx for idx in range(len(df))]
+            # 表头下一行为英文表头，数据行从start_row+2开始
+            data_rows = chain(head_rows[start_row + 1:], rows)
+            for offset, values in enumerate(data_rows):
+                record = [self.normalize_cell_value(values[col]) if col < len(values) else ""
+                          for _, col in field_columns]
 
-            # 移除空行
-            result_df = result_df[(result_df["物料名称"] != "") | (result_df["物料规格"] != "")]
+                # 跳过空行（物料名称和物料规格都为空）
+                if not record[0] and not record[1]:
+                    continue
 
-            return result_df
+                for (field, _), value in zip(field_columns, record):
+                    columns[field].append(value)
+                columns["原始行号"].append(start_row + 2 + offset)
 
-        except Exception as e:
-            return pd.DataFrame()
+            return {"columns": columns, "column_map": column_map}
+        finally:
+            wb.close()
 
     def build_excel_index(self, excel_data):
-        """构建Excel数据的索引字典"""
+        """构建Excel数据的索引字典（支持DataFrame或行字典列表）"""
         index = {
             "by_name": {},
             "by_spec": {},
@@ -1676,7 +4936,8 @@ class PDFExcelTool:
             "by_title": {}  # 新增：按TITLE索引
         }
 
-        for idx, row in excel_data.iterrows():
+        rows = excel_data.iterrows() if hasattr(excel_data, "iterrows") else enumerate(excel_data)
+        for idx, row in rows:
             name = row["物料名称"].strip()
             spec = row["物料规格"].strip()
             title = row["title"].strip()  # 新增
@@ -1777,12 +5038,12 @@ class PDFExcelTool:
 
         # 1. 物料名称对比
         excel_name = excel_row["物料名称"] if "物料名称" in excel_row else ""
-        pdf_name = pdf_data["名称"]
+        pdf_name = pdf_data.name
         name_match = excel_name == pdf_name
 
         # 2. 物料规格对比
         excel_spec = excel_row["物料规格"] if "物料规格" in excel_row else ""
-        pdf_spec = pdf_data["图号"]
+        pdf_spec = pdf_data.drawing_no
         spec_match = excel_spec == pdf_spec
 
         # 如果名称和图号都不匹配，返回0级匹配
@@ -1830,14 +5091,14 @@ class PDFExcelTool:
         # 4. 版本对比
         if "版本" in excel_row:
             excel_ver = excel_row["版本"]
-            pdf_ver = pdf_data["版本"]
+            pdf_ver = pdf_data.version
             if excel_ver != pdf_ver:
                 errors.append(f"版本不一致: Excel({excel_ver}) ≠ PDF({pdf_ver})")
 
         # 新增：5. TITLE对比
-        if "title" in excel_row and pdf_data.get("title"):
+        if "title" in excel_row and pdf_data.title:
             excel_title = excel_row["title"]
-            pdf_title = pdf_data["title"]
+            pdf_title = pdf_data.title
             if excel_title != pdf_title:
                 errors.append(f"TITLE不一致: Excel({excel_title}) ≠ PDF({pdf_title})")
 
@@ -1855,8 +5116,8 @@ class PDFExcelTool:
         processed_rows = set()
 
         # 1. 尝试名称+规格完全匹配
-        name = pdf_data["名称"].strip()
-        spec = pdf_data["图号"].strip()
+        name = pdf_data.name.strip()
+        spec = pdf_data.drawing_no.strip()
         if name and spec:
             key = f"{name}|{spec}"
             if key in excel_index["by_name_spec"]:
@@ -1895,7 +5156,7 @@ class PDFExcelTool:
                         return matches
 
         # 新增：4. 尝试TITLE匹配
-        title = pdf_data["title"].strip()
+        title = pdf_data.title.strip()
         if title and title in excel_index["by_title"]:
             for idx, row_no in excel_index["by_title"][title]:
                 if idx not in processed_rows:
@@ -1909,91 +5170,85 @@ class PDFExcelTool:
 
         return matches
 
-    def process_pdf_file_for_comparison(self, pdf_path, excel_data, excel_index, result_queue):
-        """处理单个PDF文件（线程安全）"""
-        try:
-            pdf_data = self.extract_pdf_title_block(pdf_path)
-
-            # 查找匹配的行
-            matches = self.find_matching_rows(excel_data, excel_index, pdf_data)
-
-            # 处理匹配结果
-            errors = []
-            found_match = False
-            best_match = None
-            excel_row_no = "无"  # 默认值
+    def match_pdf_to_excel(self, pdf_data, excel_data, excel_index):
+        """为一个图纸页查找最佳匹配的Excel行，返回 (Excel行号, 错误列表, 匹配类型)"""
+        # 查找匹配的行
+        matches = self.find_matching_rows(excel_data, excel_index, pdf_data)
 
-            # 寻找最佳匹配（最高匹配级别）
-            for match in matches:
-                match_level, match_errors, idx, row_no = match
-                excel_row_no = row_no  # 记录行号
+        # 寻找最佳匹配（最高匹配级别）
+        best_match = None
+        for match in matches:
+            match_level, match_errors, idx, row_no = match
 
-                if not best_match or match_level > best_match[0]:
-                    best_match = (match_level, match_errors, idx, row_no)
+            if not best_match or match_level > best_match[0]:
+                best_match = (match_level, match_errors, idx, row_no)
 
-                if match_level == 2:  # 完全匹配
-                    found_match = True
-                    result_queue.put((pdf_path, row_no, [], "完全匹配"))
-                    break
-
-            if not found_match and best_match:
-                match_level, match_errors, idx, row_no = best_match
-                if match_level == 1:  # 部分匹配
-                    found_match = True
-                    result_queue.put((pdf_path, row_no, match_errors, "部分匹配"))
+            if match_level == 2:  # 完全匹配
+                return row_no, [], "完全匹配"
 
-            if not found_match:
-                result_queue.put((pdf_path, "无", ["未找到匹配的Excel记录"], "无匹配"))
-
-            return True
+        if best_match:
+            match_level, match_errors, idx, row_no = best_match
+            if match_level == 1:  # 部分匹配
+                return row_no, match_errors, "部分匹配"
 
-        except Exception as e:
-            result_queue.put((pdf_path, "错误", [f"处理错误: {str(e)}"], "错误"))
-            return False
+        return "无", ["未找到匹配的Excel记录"], "无匹配"
 
     def process_files_for_comparison(self, excel_path, pdf_folder, progress_queue, log_queue, pdf_files, excel_data,
                                      excel_index):
-        """优化后的文件处理函数，使用线程池管理"""
+        """优化后的文件处理函数：工作线程/进程只提取标题块（任务和结果中只有文件路径和标题块字段，
+        不携带Excel数据），主线程用同一份Excel索引逐个比对"""
         total_pdfs = len(pdf_files)
         log_queue.put(f"开始处理 {total_pdfs} 个PDF文件...\n")
 
         # 创建结果队列
         result_queue = queue.Queue()
 
-        # 使用线程池处理文件
+        # 并行提取文件（线程池或工作进程池）
         processed_count = 0
-        results = []
+        file_results = {}  # 序号 -> 该文件的比对结果（报告按文件顺序输出）
 
-        # 确定线程数（根据文件数量和CPU核心数）
-        cpu_count = os.cpu_count() or 4
-        max_workers = min(cpu_count * 2, 16, total_pdfs)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            futures = []
-            for pdf_file in pdf_files:
-                future = executor.submit(
-                    self.process_pdf_file_for_comparison,
-                    pdf_file, excel_data, excel_index, result_queue
-                )
-                futures.append(future)
+        # 确定并行数（根据文件数量和CPU核心数）
+        max_workers = self.extraction_worker_count(total_pdfs)
 
+        start_time = time.perf_counter()
+        # 按估计耗时从大到小提交任务
+        pool = self.start_extraction(
+            pdf_files,
+            lambda seq, pdf_path, sheets, error: result_queue.put((seq, pdf_path, sheets, error)),
+            max_workers
+        )
+        try:
             # 处理结果和更新进度
             while processed_count < total_pdfs:
                 try:
                     # 获取结果但不阻塞
                     if not result_queue.empty():
-                        results.append(result_queue.get())
+                        seq, pdf_path, sheets, error = result_queue.get()
+                        if error:
+                            file_results[seq] = [(pdf_path, "错误", [error], "错误", None)]
+                        else:
+                            # 比对只在主线程中进行，所有文件共用同一份Excel数据和索引
+                            file_results[seq] = [(pdf_path,) + self.match_pdf_to_excel(pdf_data, excel_data,
+                                                                                       excel_index) + (pdf_data,)
+                                                 for pdf_data in sheets]
+                        if self.journal:
+                            self.journal.record_outcome(self.journal_file_key(pdf_path),
+                                                        [[result[1], result[3]] for result in file_results[seq]])
                         processed_count += 1
                         progress_queue.put(processed_count)
                     else:
                         time.sleep(0.05)
                 except Exception:
                     pass
+        finally:
+            pool.shutdown()
+        self.log_schedule_stats(self.extracted_files, max_workers, time.perf_counter() - start_time, log_queue)
+        self.log_memory_stats(pool, log_queue)
+        results = [result for seq in sorted(file_results) for result in file_results[seq]]
 
         # 收集结果
         all_errors = []
-        for pdf_path, excel_row, errors, match_type in results:
+        for pdf_path, excel_row, errors, match_type, pdf_data in results:
             if match_type != "完全匹配":  # 只记录有问题的匹配
                 # 获取描述信息
                 excel_desc = ""
@@ -2009,16 +5264,16 @@ class PDFExcelTool:
                     except:
                         pass
 
-                if pdf_path != "错误":
+                # 使用比对时已提取的标题块，不再重复解析PDF
+                if pdf_data:
                     try:
-                        pdf_data = self.extract_pdf_title_block(pdf_path)
                         pdf_desc = self.build_pdf_description(pdf_data)
-                        pdf_title = pdf_data["title"] if "title" in pdf_data else ""  # 新增
+                        pdf_title = pdf_data.title  # 新增
                     except:
                         pass
 
                 all_errors.append({
-                    "pdf_file": os.path.basename(pdf_path),  # 只显示文件名
+                    "pdf_file": self.sheet_label(pdf_path, pdf_data) if pdf_data else os.path.basename(pdf_path),  # 只显示文件名
                     "pdf_path": pdf_path,  # 存储完整路径
                     "excel_row": excel_row,
                     "errors": errors,
@@ -2065,15 +5320,774 @@ class PDFExcelTool:
             else:
                 f.write("所有数据对比一致! 没有发现错误。\n")
 
+            if self.duplicate_pdfs:
+                f.write("\n")
+                self.write_duplicate_section(f)
+
         return os.path.abspath(output_file)
 
 
-def main():
-    """主函数"""
+class WatchDaemon:
+    """监视文件夹守护进程：新增或修改的PDF落地后在后台线程池中提取标题栏，结果写入标题栏库"""
+
+    def __init__(self, tool, folders):
+        self.tool = tool
+        self.store = tool.get_title_block_store(create=True)
+        self.settings = tool.extraction_signature()
+        self.executor = ThreadPoolExecutor(max_workers=tool.watch_workers, thread_name_prefix="watch_extract")
+        self.in_flight = {}  # 正在提取的文件 -> 提取期间是否又发生了变化
+        self.lock = threading.Lock()
+        self.extracted = 0
+        known = {}
+        for folder in folders:
+            known.update(self.store.snapshot(folder))
+        self.watcher = FolderWatcher(
+            folders,
+            scan=lambda folder: tool.iter_pdf_files(folder, expand_archives=False),
+            accept=tool.is_pdf_candidate,
+            on_change=self.on_change,
+            on_delete=self.on_delete,
+            known=known,
+            mode=tool.watch_mode,
+            poll_interval=tool.watch_poll_interval,
+            settle_seconds=tool.watch_settle_seconds,
+            log=tool.log_queue.put,
+        )
+
+    def run(self):
+        """运行直到stop（或Ctrl+C）"""
+        self.tool.log_queue.put(f"开始监视: {', '.join(self.watcher.folders)}\n"
+                                f"标题栏库: {self.store.path}（已有 {self.store.count()} 个文件）\n")
+        self.tool.warm_up_extractor()
+        try:
+            self.watcher.run()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.tool.close_title_block_store()
+
+    def stop(self):
+        self.watcher.stop()
+
+    def on_change(self, pdf_path, size, mtime):
+        if self.store.get(pdf_path, size, mtime, self.settings) is not None:
+            return  # 库中已是最新结果
+        with self.lock:
+            if pdf_path in self.in_flight:
+                self.in_flight[pdf_path] = True  # 提取完成后再提取一次
+                return
+            self.in_flight[pdf_path] = False
+        self.executor.submit(self.extract, pdf_path)
+
+    def extract(self, pdf_path):
+        try:
+            stat = os.stat(pdf_path)
+            sheets, error, seconds = self.tool.extract_pdf_task(pdf_path)
+            self.store.put(pdf_path, stat.st_size, stat.st_mtime, self.settings, sheets, error)
+            self.extracted += 1
+            if error:
+                self.tool.log_queue.put(f"提取失败: {pdf_path} - {error}\n")
+            else:
+                drawing_numbers = ", ".join(sheet.drawing_no or "无图号" for sheet in sheets)
+                self.tool.log_queue.put(f"已提取: {pdf_path} ({drawing_numbers}, {seconds:.1f} 秒)\n")
+        except OSError:
+            pass  # 提取前文件已被删除或移走
+        except Exception as e:
+            self.tool.log_queue.put(f"提取 {pdf_path} 时出错: {str(e)}\n")
+        finally:
+            with self.lock:
+                changed_again = self.in_flight.pop(pdf_path, False)
+            if changed_again:
+                try:
+                    stat = os.stat(pdf_path)
+                    self.on_change(pdf_path, stat.st_size, stat.st_mtime)
+                except OSError:
+                    pass
+
+    def on_delete(self, path):
+        self.store.remove(path)
+        self.tool.log_queue.put(f"已移除: {path}\n")
+
+
+class ScheduledJob:
+    """调度任务：参数、优先级、状态、进度和事件（日志/进度/状态变化），事件按序号追加，可按序号续读"""
+
+    MAX_EVENTS = 2000  # 保留的最近事件数（更早的事件丢弃，续读时跳过）
+
+    def __init__(self, job_id, op, params, priority=0):
+        self.id = job_id
+        self.op = op
+        self.params = params
+        self.priority = priority
+        self.state = "queued"  # queued/running/done/failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.total = 0
+        self.done = 0
+        self.result = None
+        self.error = ""
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self.next_seq = 0  # 下一个事件的序号
+        self.condition = threading.Condition()
+
+    def add_event(self, event_type, **fields):
+        with self.condition:
+            self.events.append(dict(fields, seq=self.next_seq, type=event_type))
+            self.next_seq += 1
+            self.condition.notify_all()
+
+    def set_state(self, state, result=None, error=""):
+        with self.condition:
+            self.state = state
+            if state == "running":
+                self.started = time.time()
+            elif state in ("done", "failed"):
+                self.finished = time.time()
+                self.result = result
+                self.error = error
+            # 与状态同时加入事件：读到任务已结束时，结束事件也已读到
+            self.add_event("state", state=state, error=error)
+
+    def wait_events(self, since, timeout=15.0):
+        """等待序号since之后的事件，返回 (新事件列表, 下次续读的序号, 任务是否已结束)"""
+        with self.condition:
+            if self.next_seq <= since and self.finished is None:
+                self.condition.wait(timeout)
+            start = max(0, since - (self.next_seq - len(self.events)))
+            return list(islice(self.events, start, None)), self.next_seq, self.finished is not None
+
+    def to_dict(self, with_result=True):
+        info = {"id": self.id, "op": self.op, "params": self.params, "priority": self.priority,
+                "state": self.state, "total": self.total, "done": self.done, "error": self.error,
+                "created": self.created, "started": self.started, "finished": self.finished}
+        if with_result:
+            info["result"] = self.result
+        return info
+
+
+class JobChannel:
+    """把处理函数写入log_queue/progress_queue的消息转为任务事件"""
+
+    def __init__(self, job, tool, kind):
+        self.job = job
+        self.tool = tool
+        self.kind = kind
+
+    def put(self, value):
+        if self.kind == "log":
+            for line in str(value).splitlines():
+                if line.strip():
+                    self.job.add_event("log", message=line)
+        else:
+            self.job.done = value
+            self.job.total = self.tool.total_pdfs
+            self.job.add_event("progress", done=value, total=self.job.total)
+
+
+class JobScheduler:
+    """多任务调度（界面、命令行和服务共用）：extract、compare、fill任务按优先级（数值大的先处理）和提交顺序排队，
+    若干任务槽（常驻的无界面工具实例）同时处理多个任务。各任务的PDF提取都提交到同一个共享线程池，
+    同优先级的任务平分提取线程，一个任务在遍历文件夹、读取Excel、比对和写报告时，其他任务的文件继续提取；
+    各槽共用BOM、列映射、字体、模板、OCR和耗时记录缓存"""
+
+    OPERATIONS = ("extract", "compare", "fill")
+    KEEP_FINISHED = 200  # 保留的已结束任务数
+    FINISHED_RETENTION = 3600  # 已结束任务（含结果和事件）的保留秒数
+
+    def __init__(self, tools, pool_workers, queue_size=0):
+        self.tools = tools
+        self.pool = SharedExtractionPool(pool_workers)
+        self.queue_size = queue_size  # 等待队列上限（0为不限）
+        self.pending = []  # 等待的任务堆：(-优先级, 任务号, 任务)
+        self.jobs = {}  # 任务号 -> 任务（按提交顺序）
+        self.condition = threading.Condition()
+        self.next_id = 1
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.slots = []
+        self.closed = False
+        first = tools[0]
+        templates = first.load_title_block_templates()
+        pdf_costs = first.load_pdf_costs()
+        for tool in tools:
+            # 同一输入可能被多个任务同时处理，不写运行记录
+            tool.journal_enabled = False
+            tool.shared_pool = self.pool
+            if tool.prefetch_mb > 0:
+                tool.prefetch_mb = max(1, tool.prefetch_mb // len(tools))  # 各槽平分预读内存预算
+            tool._bom_cache = first._bom_cache
+            tool._column_map_cache = first._column_map_cache
+            tool._ocr_cache = first._ocr_cache
+            tool.resource_cache = first.resource_cache
+            tool.title_block_templates = templates
+            tool._template_lock = first._template_lock
+            tool._pdf_costs = pdf_costs
+            tool._pdf_costs_lock = first._pdf_costs_lock
+
+    @classmethod
+    def from_config(cls, first=None, queue_size=0):
+        """按配置[SCHEDULER]创建任务槽（无界面工具实例）和共享提取线程池"""
+        first = first or PDFExcelTool()
+        tools = [first] + [PDFExcelTool() for _ in range(first.scheduler_jobs - 1)]
+        workers = first.scheduler_workers or max(1, min((os.cpu_count() or 4) * 2, 16))
+        return cls(tools, workers, queue_size)
+
+    def warm_up(self):
+        """预加载重量级依赖和CMap（第一个任务不再承担冷启动开销）"""
+        import pandas  # noqa: F401
+        import pdfplumber  # noqa: F401
+        import openpyxl  # noqa: F401
+        self.tools[0].warm_up_extractor()
+
+    def start(self):
+        """启动任务槽线程"""
+        with self.condition:
+            if self.slots:
+                return
+            for i, tool in enumerate(self.tools, 1):
+                slot = threading.Thread(target=self.slot_loop, args=(tool,), daemon=True, name=f"job_slot_{i}")
+                slot.start()
+                self.slots.append(slot)
+
+    def submit(self, op, params, priority=0):
+        """提交任务，返回任务；参数错误时抛出ValueError，等待队列已满时抛出queue.Full"""
+        if op not in self.OPERATIONS:
+            raise ValueError(f"未知的操作: {op}（可用: {', '.join(self.OPERATIONS)}）")
+        pdf_input = params.get("pdf")
+        if not pdf_input or not os.path.exists(pdf_input):
+            raise ValueError(f"图纸路径不存在: {pdf_input}")
+        if op != "extract" and not (params.get("excel") and os.path.isfile(params["excel"])):
+            raise ValueError(f"Excel文件不存在: {params.get('excel')}")
+        priority = int(priority or 0)
+        with self.condition:
+            if self.queue_size and len(self.pending) >= self.queue_size:
+                self.rejected += 1
+                raise queue.Full
+            job = ScheduledJob(str(self.next_id), op, {key: params.get(key) for key in ("pdf", "excel")}, priority)
+            job.add_event("state", state="queued", error="")
+            heapq.heappush(self.pending, (-priority, self.next_id, job))
+            self.next_id += 1
+            self.jobs[job.id] = job
+            self.trim_finished()
+            self.condition.notify()
+        return job
+
+    def trim_finished(self):
+        """删除超过保留时间的已结束任务，已结束任务超过上限时删除最早的（调用时持有condition）"""
+        expire = time.time() - self.FINISHED_RETENTION
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        excess = len(finished) - self.KEEP_FINISHED
+        for i, job_id in enumerate(finished):
+            if i < excess or self.jobs[job_id].finished < expire:
+                del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def status(self):
+        with self.condition:
+            return {"slots": len(self.tools), "workers": self.pool.max_workers, "running": self.running,
+                    "queued": len(self.pending), "queue_size": self.queue_size, "completed": self.completed,
+                    "rejected": self.rejected}
+
+    def wait(self, jobs):
+        """等待任务全部结束"""
+        for job in jobs:
+            with job.condition:
+                while job.finished is None:
+                    job.condition.wait()
+
+    def shutdown(self):
+        """停止任务槽（正在处理的任务继续完成）和共享提取线程池"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for slot in self.slots:
+            slot.join()
+        self.pool.shutdown()
+
+    def slot_loop(self, tool):
+        """任务槽线程：取出优先级最高的等待任务，用本槽的工具实例处理"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                job = heapq.heappop(self.pending)[2]
+                self.running += 1
+            job.set_state("running")
+            try:
+                result = self.run_job(tool, job)
+            except Exception as e:
+                job.set_state("failed", error=str(e))
+            else:
+                job.set_state("done", result=result)
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    self.completed += 1
+                    self.trim_finished()
+
+    def run_job(self, tool, job):
+        """在工具实例上执行任务，日志和进度写入任务事件"""
+        tool.log_queue = JobChannel(job, tool, "log")
+        tool.job_priority = job.priority
+        progress = JobChannel(job, tool, "progress")
+        params = job.params
+        if job.op == "extract":
+            files = tool.extract_package(params["pdf"], progress)
+            return {"files": [{"pdf_path": pdf_path, "error": error, "sheets": [sheet.as_dict() for sheet in sheets]}
+                              for pdf_path, sheets, error in files]}
+        if job.op == "compare":
+            errors, report_path = tool.compare_package(params["excel"], params["pdf"], progress)
+            return {"error_count": len(errors), "errors": errors, "report": report_path}
+        results, report_path, excel_output = tool.fill_package(params["excel"], params["pdf"], progress)
+        return {"sheet_count": len(results), "report": report_path, "excel": excel_output,
+                "problems": [{key: result.get(key) for key in ("pdf_file", "pdf_path", "status", "message")}
+                             for result in results if result["status"] != "成功"]}
+
+
+class JobService:
+    """本地HTTP/JSON服务：任务提交到多任务调度器（等待队列有上限，满时拒绝新任务：HTTP 503），
+    进度以分块传输的JSON行流式输出"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.server = None
+
+    def serve(self, host, port):
+        """启动调度器的任务槽并处理HTTP请求，直到shutdown（或Ctrl+C）"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 进度流使用分块传输
+
+            def log_message(self, format, *args):
+                pass  # 不逐个请求输出访问日志
+
+            def send_json(self, code, data, headers=()):
+                body = json.dumps(data, ensure_ascii=False, default=json_default).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def route(self):
+                parts = [part for part in self.path.split("?")[0].split("/") if part]
+                query = dict(item.split("=", 1) for item in self.path.partition("?")[2].split("&") if "=" in item)
+                return parts, query
+
+            def do_GET(self):
+                parts, query = self.route()
+                if parts == ["health"]:
+                    return self.send_json(200, service.scheduler.status())
+                if len(parts) in (2, 3) and parts[0] == "jobs":
+                    job = service.scheduler.get_job(parts[1])
+                    if job is None:
+                        return self.send_json(404, {"error": f"任务不存在: {parts[1]}"})
+                    if len(parts) == 2:
+                        return self.send_json(200, job.to_dict())
+                    if parts[2] == "events":
+                        try:
+                            since = int(query.get("since", 0))
+                        except ValueError:
+                            return self.send_json(400, {"error": f"since参数必须是整数: {query['since']}"})
+                        return self.stream_events(job, since)
+                self.send_json(404, {"error": f"未知的路径: {self.path}"})
+
+            def do_POST(self):
+                parts, _ = self.route()
+                if parts != ["jobs"]:
+                    return self.send_json(404, {"error": f"未知的路径: {self.path}"})
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    params = json.loads(self.rfile.read(length) or b"{}")
+                    job = service.scheduler.submit(params.get("op"), params, params.get("priority", 0))
+                except (ValueError, TypeError, AttributeError) as e:
+                    return self.send_json(400, {"error": str(e)})
+                except queue.Full:
+                    return self.send_json(503, {"error": "任务队列已满，请稍后重试"}, [("Retry-After", "1")])
+                self.send_json(202, job.to_dict(with_result=False))
+
+            def stream_events(self, job, since):
+                """以分块传输逐行输出任务事件（每行一个JSON），任务结束后最后一行为任务结果"""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    while True:
+                        events, since, finished = job.wait_events(since)
+                        lines = [json.dumps(event, ensure_ascii=False, default=json_default) for event in events]
+                        if finished:
+                            lines.append(json.dumps(dict(job.to_dict(), type="result"), ensure_ascii=False,
+                                                    default=json_default))
+                        if lines:
+                            chunk = ("\n".join(lines) + "\n").encode("utf-8")
+                            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+                            self.wfile.flush()
+                        if finished:
+                            break
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 128  # 大量客户端同时连接时不丢弃连接
+
+        self.server = Server((host, port), RequestHandler)
+        self.scheduler.warm_up()
+        self.scheduler.start()
+        status = self.scheduler.status()
+        print(f"服务已启动: http://{host}:{self.server.server_address[1]}（{status['slots']} 个任务槽，"
+              f"{status['workers']} 个共享提取线程，队列上限 {status['queue_size']}）", flush=True)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+
+
+def json_default(value):
+    """JSON序列化pandas/numpy的数值等其他类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class ServiceBusy(Exception):
+    """服务任务队列已满（HTTP 503）"""
+
+
+class ServiceClient:
+    """服务的本地客户端（供其他工具调用和负载测试）"""
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        import urllib.error
+        import urllib.request
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        request = urllib.request.Request(self.url + path, data=body, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get("error", str(e))
+            if e.code == 503:
+                raise ServiceBusy(message)
+            raise RuntimeError(f"HTTP {e.code}: {message}")
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def submit(self, op, pdf, excel=None):
+        """提交任务，返回任务号；队列已满时抛出ServiceBusy"""
+        return self.request("POST", "/jobs", {"op": op, "pdf": pdf, "excel": excel})["id"]
+
+    def job(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def events(self, job_id, since=0):
+        """逐个产出任务事件，最后一个事件的type为result（任务结果）"""
+        import urllib.request
+        with urllib.request.urlopen(f"{self.url}/jobs/{job_id}/events?since={since}", timeout=self.timeout) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    def run(self, op, pdf, excel=None, on_event=None):
+        """提交任务并跟随进度直到结束，返回任务结果"""
+        job_id = self.submit(op, pdf, excel)
+        for event in self.events(job_id):
+            if event["type"] == "result":
+                return event
+            if on_event:
+                on_event(event)
+        return self.job(job_id)
+
+
+def service_load_test(url, op, pdf, excel, total, concurrency):
+    """负载测试：concurrency个客户端并发提交共total个任务（队列满时等待后重试），输出吞吐量和延迟"""
+    client = ServiceClient(url)
+    try:
+        status = client.health()
+    except OSError as e:
+        print(f"无法连接服务 {url}: {str(e)}")
+        return 1
+    print(f"服务: {status['slots']} 个任务槽，{status['workers']} 个共享提取线程，队列上限 {status['queue_size']}；"
+          f"{concurrency} 个并发客户端提交 {total} 个{op}任务")
+    latencies = []
+    failures = []
+    retries = [0]
+    lock = threading.Lock()
+
+    def one_request(_):
+        start = time.perf_counter()
+        while True:
+            try:
+                result = client.run(op, pdf, excel)
+                break
+            except ServiceBusy:
+                with lock:
+                    retries[0] += 1
+                time.sleep(0.1)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            if result["state"] != "done":
+                failures.append(result.get("error", ""))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, range(total)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    print(f"完成 {total} 个请求，耗时 {wall:.2f} 秒，吞吐量 {total / wall:.2f} 请求/秒")
+    print(f"延迟: 中位 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"95% {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.0f} ms, "
+          f"最长 {latencies[-1] * 1000:.0f} ms；队列满重试 {retries[0]} 次，失败 {len(failures)} 个")
+    if failures:
+        print(f"失败原因（第一个）: {failures[0]}")
+    return 1 if failures else 0
+
+
+def run_job_list(list_file, sequential=False):
+    """批量比对：任务列表文件每行为“BOM路径;图纸路径[;优先级]”（#开头为注释，相对路径相对于列表文件），
+    由多任务调度器同时处理并显示各任务进度；sequential为逐个处理（每个任务单独的提取线程池）"""
+    base_dir = os.path.dirname(os.path.abspath(list_file))
+    entries = []
+    with open(list_file, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = [part.strip() for part in line.split(";")]
+            if len(parts) < 2 or (len(parts) > 2 and parts[2] and not parts[2].lstrip("-").isdigit()):
+                print(f"任务列表第 {line_no} 行格式错误: {line}")
+                return 1
+            excel_path, pdf_input = (os.path.join(base_dir, part) for part in parts[:2])
+            entries.append((excel_path, pdf_input, int(parts[2]) if len(parts) > 2 and parts[2] else 0))
+    if not entries:
+        print("任务列表为空")
+        return 1
+
+    start = time.perf_counter()
+    failed = 0
+    if sequential:
+        tool = PDFExcelTool()
+        tool.log_queue = queue.Queue()  # 不输出逐个文件的日志
+        for job_id, (excel_path, pdf_input, _) in enumerate(entries, 1):
+            job_start = time.perf_counter()
+            try:
+                errors, report_path = tool.compare_package(excel_path, pdf_input)
+            except Exception as e:
+                failed += 1
+                print(f"[任务 {job_id}] 处理失败: {str(e)}")
+                continue
+            print(f"[任务 {job_id}] 比对完成 ({tool.total_pdfs} 个文件, {time.perf_counter() - job_start:.1f} 秒)，"
+                  f"发现 {len(errors)} 个错误，报告: {report_path}")
+    else:
+        scheduler = JobScheduler.from_config()
+        jobs = []
+        for excel_path, pdf_input, priority in entries:
+            try:
+                jobs.append(scheduler.submit("compare", {"excel": excel_path, "pdf": pdf_input}, priority))
+            except ValueError as e:
+                failed += 1
+                print(f"跳过任务（{str(e)}）: {excel_path}; {pdf_input}")
+        status = scheduler.status()
+        print(f"{len(jobs)} 个任务，{status['slots']} 个任务槽，{status['workers']} 个共享提取线程")
+        scheduler.warm_up()
+        scheduler.start()
+        shown = {}
+        while True:
+            for job in jobs:
+                state = (job.state, job.done)
+                if shown.get(job.id) == state:
+                    continue
+                shown[job.id] = state
+                if job.state == "done":
+                    print(f"[任务 {job.id}] 比对完成 ({job.total} 个文件, {job.finished - job.started:.1f} 秒)，"
+                          f"发现 {job.result['error_count']} 个错误，报告: {job.result['report']}")
+                elif job.state == "failed":
+                    failed += 1
+                    print(f"[任务 {job.id}] 处理失败: {job.error}")
+                elif job.state == "running":
+                    print(f"[任务 {job.id}] 进度: {job.done}/{job.total or '?'} (优先级 {job.priority})")
+            if all(job.finished is not None for job in jobs):
+                break
+            time.sleep(1)
+        scheduler.shutdown()
+    print(f"全部 {len(entries)} 个任务结束（失败 {failed} 个），总耗时 {time.perf_counter() - start:.1f} 秒")
+    return 1 if failed else 0
+
+
+# 启动基准测试中检查的重量级依赖（导入本模块时不应加载）
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xlwings", "pdfplumber", "pdfminer")
+
+
+def startup_benchmark(budget_seconds, runs=5):
+    """在新的解释器中多次执行启动过程（导入本模块并创建无界面工具实例、读取配置），
+    最短耗时超过预算或启动时加载了重量级依赖则返回1（可作为自动检查，按退出码判断）"""
+    if getattr(sys, 'frozen', False):
+        print("打包版本不支持启动基准测试，请使用源码运行")
+        return 2
+    module_dir, module_file = os.path.split(os.path.abspath(__file__))
+    code = (f"import sys, time\n"
+            f"sys.path.insert(0, {module_dir!r})\n"
+            f"start = time.perf_counter()\n"
+            f"import {os.path.splitext(module_file)[0]} as module\n"
+            f"imported = time.perf_counter() - start\n"
+            f"tool = module.PDFExcelTool()\n"
+            f"elapsed = time.perf_counter() - start\n"
+            f"tool.log_queue.join()\n"
+            f"loaded = ','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules)\n"
+            f"print('startup', imported, elapsed, loaded)\n")
+    # 在临时目录中运行（使用当前配置文件的副本），不在当前目录留下新建的配置文件
+    work_dir = tempfile.mkdtemp(prefix="startup_benchmark_")
+    try:
+        if os.path.exists("config.ini"):
+            shutil.copy("config.ini", work_dir)
+        import_timings = []
+        timings = []
+        loaded = ""
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, cwd=work_dir)
+            lines = [line for line in result.stdout.splitlines() if line.startswith("startup ")]
+            if result.returncode != 0 or not lines:
+                print(f"启动失败:\n{result.stderr}")
+                return 1
+            _, imported, elapsed, *rest = lines[-1].split(" ")
+            loaded = rest[0] if rest else ""
+            import_timings.append(float(imported))
+            timings.append(float(elapsed))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    import_timings.sort()
+    timings.sort()
+    print(f"启动耗时: 最短 {timings[0] * 1000:.0f} ms, 中位 {timings[len(timings) // 2] * 1000:.0f} ms "
+          f"(其中导入最短 {import_timings[0] * 1000:.0f} ms; 预算 {budget_seconds * 1000:.0f} ms, {runs} 次)")
+    if loaded:
+        print(f"启动时加载了重量级依赖: {loaded}")
+    if timings[0] > budget_seconds or loaded:
+        print("启动基准测试未通过")
+        return 1
+    print("启动基准测试通过")
+    return 0
+
+
+def main(argv=None):
+    """主函数（不带参数时启动图形界面）"""
+    import argparse
+    parser = argparse.ArgumentParser(description="PDF图纸信息提取与BOM填充/比对工具")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="测量启动耗时（导入本模块并创建工具实例），超过预算或加载了重量级依赖时返回非零退出码")
+    parser.add_argument("--import-budget", type=float, default=0.25,
+                        help="启动基准测试的导入耗时预算（秒），默认0.25")
+    parser.add_argument("--watch", nargs="*", metavar="FOLDER",
+                        help="监视文件夹（不指定时使用配置[WATCH] folders），新PDF落地后提取标题栏写入标题栏库")
+    parser.add_argument("--query", metavar="TEXT", help="按图号或名称查询标题栏库")
+    parser.add_argument("--compare", metavar="EXCEL", help="不启动界面，比对BOM与--pdf指定的图纸")
+    parser.add_argument("--pdf", metavar="PATH", help="图纸文件夹或压缩包（与--compare、--load-test一起使用）")
+    parser.add_argument("--serve", action="store_true", help="启动本地HTTP/JSON服务（配置[SERVICE]）")
+    parser.add_argument("--load-test", type=int, metavar="N",
+                        help="对运行中的服务提交N个任务并测量吞吐量（指定--compare时为比对，否则为提取）")
+    parser.add_argument("--concurrency", type=int, default=4, help="负载测试的并发客户端数，默认4")
+    parser.add_argument("--url", help="负载测试的服务地址，默认使用配置[SERVICE]的地址和端口")
+    parser.add_argument("--jobs", metavar="FILE",
+                        help="批量比对：任务列表文件每行为“BOM路径;图纸路径[;优先级]”，由多任务调度器同时处理")
+    parser.add_argument("--sequential", action="store_true", help="与--jobs一起使用：逐个处理（用于对比总耗时）")
+    args = parser.parse_args(argv)
+
+    if args.startup_benchmark:
+        return startup_benchmark(args.import_budget)
+
+    if args.watch is not None:
+        tool = PDFExcelTool()
+        folders = args.watch or tool.watch_folders
+        if not folders:
+            print("没有指定监视的文件夹（命令行参数或配置[WATCH] folders）")
+            return 1
+        daemon = WatchDaemon(tool, folders)
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            daemon.stop()
+        tool.log_queue.join()
+        return 0
+
+    if args.query is not None:
+        store = PDFExcelTool().get_title_block_store()
+        if store is None:
+            print("标题栏库不存在，请先运行 --watch")
+            return 1
+        for pdf_path, sheet in store.find(args.query):
+            print(f"{pdf_path} [第{sheet.page_no}页] 图号: {sheet.drawing_no}  名称: {sheet.name}  "
+                  f"版本: {sheet.version}  材料: {sheet.material}")
+        return 0
+
+    if args.jobs:
+        return run_job_list(args.jobs, args.sequential)
+
+    if args.serve:
+        first = PDFExcelTool()
+        service = JobService(JobScheduler.from_config(first, first.service_queue_size))
+        try:
+            service.serve(first.service_host, first.service_port)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.load_test is not None:
+        if not args.pdf:
+            parser.error("--load-test 需要同时指定 --pdf")
+        url = args.url
+        if not url:
+            tool = PDFExcelTool()
+            url = f"http://{tool.service_host}:{tool.service_port}"
+        return service_load_test(url, "compare" if args.compare else "extract", os.path.abspath(args.pdf),
+                                 os.path.abspath(args.compare) if args.compare else None,
+                                 max(1, args.load_test), max(1, args.concurrency))
+
+    if args.compare:
+        if not args.pdf:
+            parser.error("--compare 需要同时指定 --pdf")
+        tool = PDFExcelTool()
+        try:
+            errors, report_path = tool.compare_package(args.compare, args.pdf)
+        except ValueError as e:
+            tool.log_queue.join()
+            print(f"比对失败: {str(e)}")
+            return 1
+        tool.log_queue.join()
+        print(f"比对完成，发现 {len(errors)} 个错误，报告已保存到: {report_path}")
+        return 0
+
+    if tk is None:
+        print("当前环境没有安装Tk，无法启动图形界面")
+        return 1
     root = tk.Tk()
     app = PDFExcelTool(root)
     root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    multiprocessing.freeze_support()  # 打包版本中启动提取工作进程
+    sys.exit(main())